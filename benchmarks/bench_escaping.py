@@ -0,0 +1,45 @@
+"""
+Benchmark the cost of replacing tabs and line breaks in symbol values, on
+data that holds none of them: generated node converters with and without
+the escaping statements. Arguments: [rows] [columns].
+"""
+
+import io
+from time import perf_counter
+
+from common import makeInput, readArguments
+from kaeru.codegen import compileFactory, generateNodeSource
+from kaeru.node import createNodeSchema
+
+
+def timeConverter(source: str, rows: list) -> float:
+    convert = compileFactory(source)(None)
+    start = perf_counter()
+    for row in rows:
+        convert(row)
+
+    return perf_counter() - start
+
+
+def main():
+    rows, columns = readArguments(200000, 20)
+    data = makeInput(rows, columns)
+    nodeSchema = createNodeSchema(io.StringIO(data), None, scanSubLabels=False)
+    lines = data.splitlines(keepends=True)[1:]
+
+    timings = []
+    for escapeSymbols in (False, True):
+        source = generateNodeSource(
+            nodeSchema, "row", False, escapeSymbols=escapeSymbols
+        )
+        # best of three, to smooth out noise
+        timings.append(min(timeConverter(source, lines) for _ in range(3)))
+
+    overhead = 100 * (timings[1] / timings[0] - 1)
+    print(f"{rows} rows x {columns} columns")
+    print(f"plain:    {timings[0]:.3f}s")
+    print(f"escaping: {timings[1]:.3f}s ({overhead:+.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Benchmark sub label discovery on a wide node file: the full parse of
+createNodeSchema against the label column scan, on one and several cores.
+Arguments: [rows] [columns] [jobs].
+"""
+
+import os
+import tempfile
+from time import perf_counter
+
+from common import readArguments, writeInput
+from kaeru.labelscan import scanLabels
+from kaeru.node import createNodeSchema
+
+
+def main():
+    rows, columns, jobs = readArguments(500000, 40, os.cpu_count())
+
+    with tempfile.TemporaryDirectory() as directory:
+        inputPath = os.path.join(directory, "items.csv")
+        writeInput(inputPath, rows, columns, labels=7)
+
+        start = perf_counter()
+        with open(inputPath, encoding="utf-8") as f:
+            expected = createNodeSchema(f, None).getNodeSubLabels()
+        timings = {"full parse": perf_counter() - start}
+
+        for scanJobs in sorted({1, jobs}):
+            start = perf_counter()
+            labels = scanLabels(inputPath, 1, "|", scanJobs)
+            timings[f"scan, {scanJobs} job(s)"] = perf_counter() - start
+            assert labels == expected
+
+    print(f"{rows} rows x {columns} columns")
+    for name, seconds in timings.items():
+        print(f"{name:<16} {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Benchmark node row conversion on a wide file: the per-cell schema lookups
+used before row plans versus iterNodes running off NodeSchema.getRowPlan.
+Arguments: [rows] [columns].
+"""
+
+import io
+from time import perf_counter
+
+from common import makeInput, readArguments
+from kaeru.node import Node, NodeType, capfirst, createNodeSchema, iterNodes
+
+
+def lookupNodes(inputFile, nodeSchema):
+    # conversion loop as it was before row plans
+    _ = inputFile.readline()
+    for row in inputFile:
+        rowData = row.strip("\n").split("|")
+        node = Node()
+        for position, value in enumerate(rowData):
+            if nodeSchema.getEntryType(position) == NodeType.ID:
+                node.setId(value)
+            elif nodeSchema.getEntryType(position) == NodeType.LABEL:
+                node.setLabel(value)
+            elif nodeSchema.getEntryType(position) == NodeType.PROPERTY:
+                propertyName = nodeSchema.getPropertyName(position)
+                propertyType = nodeSchema.getPropertyType(propertyName)
+                if value == "":
+                    value = "NULL" if propertyType == "symbol" else "0"
+                node.setProperty(propertyName, value)
+        if node.getLabel() == None:
+            node.setLabel(nodeSchema.getNodeGlobalLabel())
+        nodeLabel = node.getLabel()
+        for propertyName in node.getPropertyNames():
+            propertyValue = node.getPropertyValue(propertyName)
+            node.removeProperty(propertyName)
+            node.setProperty(nodeLabel + capfirst(propertyName), propertyValue)
+        yield node
+
+
+def timeConversion(convert, data: str) -> float:
+    nodeSchema = createNodeSchema(io.StringIO(data), None)
+    start = perf_counter()
+    for _ in convert(io.StringIO(data), nodeSchema):
+        pass
+
+    return perf_counter() - start
+
+
+def main():
+    rows, columns = readArguments(2000, 200)
+    data = makeInput(rows, columns, labels=0)
+
+    before = timeConversion(lookupNodes, data)
+    after = timeConversion(iterNodes, data)
+
+    print(f"{rows} rows x {columns} columns")
+    print(f"per-cell lookups: {before:.3f}s")
+    print(f"row plan:         {after:.3f}s")
+    print(f"speedup:          {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
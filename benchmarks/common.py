@@ -0,0 +1,56 @@
+"""
+Module bundling the input generation shared by the benchmarks.
+
+Benchmarks are run from the repository root with kaeru importable, e.g.
+`python benchmarks/bench_row_plan.py 2000 200`, and take their sizes as
+optional positional arguments.
+"""
+
+import sys
+
+
+def readArguments(*defaults: int) -> list:
+    """
+    Returns the integer command line arguments, falling back to defaults
+    for the ones not given
+    """
+
+    values = [int(value) for value in sys.argv[1 : len(defaults) + 1]]
+
+    return values + list(defaults[len(values) :])
+
+
+def makeInput(rows: int, columns: int, labels: int = 2) -> str:
+    """
+    Returns a node file of rows rows and columns columns: an id, a :LABEL
+    column cycling through labels sub labels unless labels is 0, then
+    alternating STRING and INT properties with every 11th cell empty
+    """
+
+    header = ["id:ID(Item)"]
+    if labels:
+        header.append(":LABEL")
+    propertyCount = columns - len(header)
+    for i in range(propertyCount):
+        header.append(f"p{i}:STRING" if i % 2 == 0 else f"p{i}:INT")
+
+    lines = ["|".join(header)]
+    for row in range(rows):
+        values = [str(row)]
+        if labels:
+            values.append(f"Label{row % labels}")
+        for i in range(propertyCount):
+            if (row + i) % 11 == 0:
+                values.append("")
+            elif i % 2 == 0:
+                values.append(f"name{row * i}")
+            else:
+                values.append(str(row * i))
+        lines.append("|".join(values))
+
+    return "\n".join(lines) + "\n"
+
+
+def writeInput(path: str, rows: int, columns: int, labels: int = 2) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(makeInput(rows, columns, labels))
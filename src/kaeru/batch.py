@@ -0,0 +1,124 @@
+"""
+Module bundling functions needed to discover the inputs of a batch conversion
+"""
+
+import json
+import os
+from typing import List
+
+from kaeru.fileio import openInput, stripCompressionSuffix
+
+
+class BatchEntry:
+    def __init__(self, command: str, file: str, label: str, storage: str | None = None):
+        self.command = command  # "node" or "relation"
+        self.file = file  # absolute path of the input file
+        self.label = label
+        self.storage = storage  # optional per-file override of --storage
+        self.size = os.path.getsize(file)
+
+    def getDirectory(self) -> str:
+        return os.path.dirname(self.file)
+
+    def getFileName(self) -> str:
+        return os.path.basename(self.file)
+
+
+def checkLabels(entries: List[BatchEntry]) -> List[BatchEntry]:
+    """
+    Raises if two entries share a label, since their declarations would
+    replace each other in the output directory
+    """
+
+    files = {}
+    for entry in entries:
+        if entry.label in files:
+            raise Exception(
+                f"Error: {files[entry.label]} and {entry.file} both have label "
+                f"{entry.label}."
+            )
+        files[entry.label] = entry.file
+
+    return entries
+
+
+def detectCommand(inputFile: str) -> str | None:
+    """
+    Returns "node" or "relation" depending on the header of a Neo4j import
+    file, or None if the header looks like neither
+    """
+
+    with openInput(inputFile) as f:
+        fileHeader = f.readline()
+
+    if ":START_ID" in fileHeader and ":END_ID" in fileHeader:
+        return "relation"
+    elif ":ID" in fileHeader:
+        return "node"
+
+    return None
+
+
+def discoverEntries(directory: str) -> List[BatchEntry]:
+    """
+    Returns one batch entry per csv file, possibly compressed, found in a
+    Neo4j import directory. The label of each entry is the file name without
+    extension.
+    """
+
+    entries = []
+    for name in sorted(os.listdir(directory)):
+        inputFile = os.path.join(directory, name)
+        csvName = stripCompressionSuffix(name)
+        if not os.path.isfile(inputFile) or not csvName.endswith(".csv"):
+            continue
+
+        command = detectCommand(inputFile)
+        if command is None:
+            continue
+
+        label = name.split(".")[0]
+        entries.append(BatchEntry(command, os.path.abspath(inputFile), label))
+
+    return checkLabels(entries)
+
+
+def readManifest(manifestFile: str) -> List[BatchEntry]:
+    """
+    Returns the batch entries listed in a JSON manifest, for example
+
+    [
+        {"type": "node", "file": "person.csv", "label": "Person", "storage": "col"},
+        {"type": "relation", "file": "knows.csv", "label": "Knows"}
+    ]
+
+    Relative file paths are resolved against the manifest location. "type"
+    is detected from the file header and "label" defaults to the file name
+    when omitted. Labels must be unique.
+    """
+
+    with open(manifestFile, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    baseDirectory = os.path.dirname(os.path.abspath(manifestFile))
+
+    entries = []
+    for item in manifest:
+        inputFile = os.path.join(baseDirectory, item["file"])
+        command = item.get("type") or detectCommand(inputFile)
+        if command not in ("node", "relation"):
+            raise Exception(f"Error: cannot tell the type of input file {inputFile}")
+
+        label = item.get("label") or os.path.basename(inputFile).split(".")[0]
+        entries.append(BatchEntry(command, inputFile, label, item.get("storage")))
+
+    return checkLabels(entries)
+
+
+def scheduleEntries(entries: List[BatchEntry]) -> List[BatchEntry]:
+    """
+    Order entries largest file first, so long conversions start early and
+    small ones fill the gaps at the end of the run
+    """
+
+    return sorted(entries, key=lambda entry: entry.size, reverse=True)
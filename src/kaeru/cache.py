@@ -0,0 +1,145 @@
+"""
+Module bundling the content-addressed cache of conversion outputs
+"""
+
+import hashlib
+import json
+import os
+import shutil
+
+from kaeru import __version__
+from kaeru.fileio import writeAtomically
+
+HASH_BUFFER_SIZE = 1 << 20  # 1 MiB
+APPLIED_FILE = ".kaeru_applied.json"
+
+
+def hashFile(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(HASH_BUFFER_SIZE)
+            if not block:
+                break
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """
+    Remembers the outputs of a conversion under a key hashing the input
+    content, the conversion options and the kaeru version:
+
+    objects/<sha256>   one copy of each output file, named by its hash
+    entries/<key>.json the hash of every output file of a conversion
+
+    Output files are shared between entries, so identical declarations or
+    facts are stored once. Each output directory records in APPLIED_FILE the
+    key last merged into it for each input, so outputs are not appended twice.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.objectsPath = os.path.join(path, "objects")
+        self.entriesPath = os.path.join(path, "entries")
+        os.makedirs(self.objectsPath, exist_ok=True)
+        os.makedirs(self.entriesPath, exist_ok=True)
+
+    def getKey(self, inputFile: str, options: dict) -> str:
+        key = {"version": __version__, "input": hashFile(inputFile), "options": options}
+        text = json.dumps(key, sort_keys=True)
+
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def getEntryFile(self, key: str) -> str:
+        return os.path.join(self.entriesPath, f"{key}.json")
+
+    def getObjectFile(self, fileHash: str) -> str:
+        return os.path.join(self.objectsPath, fileHash)
+
+    def getOutputs(self, key: str) -> dict | None:
+        """
+        Returns the map of output file name to hash of a cached conversion,
+        or None if it is unknown or some of its outputs went missing
+        """
+
+        try:
+            with open(self.getEntryFile(key), encoding="utf-8") as f:
+                outputs = json.load(f)["outputs"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+        for fileHash in outputs.values():
+            if not os.path.exists(self.getObjectFile(fileHash)):
+                return None
+
+        return outputs
+
+    def getAppliedFile(self, outputPath: str) -> str:
+        return os.path.join(outputPath, APPLIED_FILE)
+
+    def readApplied(self, outputPath: str) -> dict:
+        try:
+            with open(self.getAppliedFile(outputPath), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def getMissingOutputs(
+        self, key: str, inputFile: str, outputPath: str
+    ) -> list | None:
+        """
+        Returns the outputs of key gone from outputPath since they were
+        merged into it for inputFile, or None if they never were. Facts files
+        shared with other inputs are never compared, their content depends on
+        every input.
+        """
+
+        applied = self.readApplied(outputPath).get(os.path.abspath(inputFile))
+        if applied is None or applied["key"] != key:
+            return None
+
+        return [
+            name
+            for name in applied["outputs"]
+            if not os.path.exists(os.path.join(outputPath, name))
+        ]
+
+    def markApplied(
+        self, key: str, inputFile: str, outputs: dict, outputPath: str
+    ) -> None:
+        # recorded next to the outputs, so a wiped output directory forgets it
+        applied = self.readApplied(outputPath)
+        applied[os.path.abspath(inputFile)] = {"key": key, "outputs": sorted(outputs)}
+        with writeAtomically(self.getAppliedFile(outputPath)) as f:
+            json.dump(applied, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    def restore(self, outputs: dict, outputPath: str) -> None:
+        for name, fileHash in outputs.items():
+            shutil.copyfile(
+                self.getObjectFile(fileHash), os.path.join(outputPath, name)
+            )
+
+    def store(self, key: str, outputPath: str) -> dict:
+        """
+        Records every file of outputPath, a directory holding nothing but
+        the outputs of the conversion of key, and returns their hashes
+        """
+
+        outputs = {}
+        for name in sorted(os.listdir(outputPath)):
+            outputFile = os.path.join(outputPath, name)
+            fileHash = hashFile(outputFile)
+            objectFile = self.getObjectFile(fileHash)
+            if not os.path.exists(objectFile):
+                with open(outputFile, "rb") as src:
+                    with writeAtomically(objectFile, binary=True) as dst:
+                        shutil.copyfileobj(src, dst)
+            outputs[name] = fileHash
+
+        with writeAtomically(self.getEntryFile(key)) as f:
+            json.dump({"outputs": outputs}, f, indent=2, sort_keys=True)
+
+        return outputs
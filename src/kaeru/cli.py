@@ -3,10 +3,108 @@ Command line interface
 """
 
 import argparse
+import os
 import sys
 
 from kaeru import __title__, __version__
-from kaeru.cli_utils import node_processing_pipeline, relation_processing_pipeline
+from kaeru.cli_utils import (
+    batch_processing_pipeline,
+    node_processing_pipeline,
+    relation_processing_pipeline,
+)
+from kaeru.fileio import ARRAY_DELIMITER, DEFAULT_DELIMITER, DEFAULT_MAX_OPEN_FILES
+from kaeru.sqlitedb import DEFAULT_DBNAME
+
+
+def get_common_parser():
+    """Return a parser holding the output and input options shared by every command"""
+    common = argparse.ArgumentParser(add_help=False)
+
+    common.add_argument(
+        "--id-map",
+        help="Map every (id group, id) pair to a dense unsigned id, persisted in this file and "
+        "shared between node and relationship conversions.",
+    )
+    common.add_argument(
+        "--backend",
+        default="file",
+        choices=["file", "sqlite"],
+        help="Write facts to .facts files or to a SQLite database read with Souffle IO=sqlite.",
+    )
+    common.add_argument(
+        "--dbname",
+        default=DEFAULT_DBNAME,
+        help="Name of the SQLite database in the output directory. Default to kaeru.db.",
+    )
+    common.add_argument(
+        "--compress",
+        action="store_true",
+        help="Write gzip compressed facts, declared with Souffle compress=true.",
+    )
+    common.add_argument(
+        "--max-open-files",
+        type=int,
+        default=DEFAULT_MAX_OPEN_FILES,
+        help="Maximum number of output files kept open at once by each process. Default to 256.",
+    )
+    common.add_argument(
+        "--lock",
+        action="store_true",
+        help="Append facts in blocks of whole lines under fcntl advisory locks, so several kaeru processes can write to the same output directory. Processes converting partitions of a node label share its declaration, which declares the sub labels found by all of them. File backend only, can not be used with --id-map.",
+    )
+    common.add_argument(
+        "--cache",
+        default=None,
+        help="Cache directory remembering the outputs of each input by content hash and options. Unchanged inputs are skipped when their outputs were already merged into the output directory, as listed in its .kaeru_applied.json, else restored from the cache. Can not be used with --id-map.",
+    )
+    common.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Split facts into N shards Label.0.facts to Label.<N-1>.facts by a stable hash of the shard key, each with its own Label.<k>_decl.txt. File backend only. Default to 1.",
+    )
+    common.add_argument(
+        "--delimiter",
+        default=DEFAULT_DELIMITER,
+        help="Field delimiter of the input files. Default to |.",
+    )
+    common.add_argument(
+        "--quote",
+        default=None,
+        help="Quote character of the input files, e.g. '\"' for the default Neo4j CSV export. Quoted input is read with the csv module and can not be split across jobs. Default to no quoting.",
+    )
+    common.add_argument(
+        "--array-delimiter",
+        default=ARRAY_DELIMITER,
+        help="Element delimiter of array properties, e.g. tags:string[]. Elements are written separated by ; in the facts. Default to ;.",
+    )
+
+    return common
+
+
+def get_single_file_parser():
+    """Return a parser holding the options shared by the node and relation commands"""
+    single = argparse.ArgumentParser(add_help=False)
+
+    single.add_argument(
+        "--previous",
+        default=None,
+        help="Previous snapshot of the input file, looked up in the same directory. -t diff writes the facts inserted and deleted since then to <Relation>_insert.facts and <Relation>_delete.facts, declared in <label>_delta_decl.txt.",
+    )
+    single.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Number of worker processes used to convert the input file. Default to 1.",
+    )
+    single.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only convert the rows appended to the input since the last incremental run, resuming from the byte offset kept in <label>_watermark.json next to the outputs. A replaced input, a new header or new options start over once the facts of earlier runs, which may be shared with other inputs, have been removed. Rows without a trailing newline wait for the next run. File backend, uncompressed and unquoted input only.",
+    )
+
+    return single
 
 
 def get_parser():
@@ -22,16 +120,20 @@ def get_parser():
     )
 
     subparsers = parser.add_subparsers(dest="command", help="commands")
+    common = get_common_parser()
+    single = get_single_file_parser()
 
     # node command
     node_parser = subparsers.add_parser(
-        "node", help="Generate Datalog node EDBs from Neo4j node data"
+        "node",
+        help="Generate Datalog node EDBs from Neo4j node data",
+        parents=[common, single],
     )
     node_parser.add_argument(
         "-t",
         "--type",
         help="Specify the type of node EDB to generate",
-        choices=["fact", "schema", "all"],
+        choices=["fact", "schema", "all", "diff"],
         required=True,
     )
     node_parser.add_argument(
@@ -40,7 +142,7 @@ def get_parser():
     node_parser.add_argument(
         "-f",
         "--file",
-        help="Name of the input Neo4j Node file. Support csv file for now",
+        help="Name of the input Neo4j Node file. Support csv file, optionally gzip, bz2 or xz compressed",
         required=True,
     )
     node_parser.add_argument(
@@ -60,17 +162,24 @@ def get_parser():
         choices=["row", "col"],
         help="Specify storage type for node EDB. Support row-based and column-based storage.",
     )
+    node_parser.add_argument(
+        "--shard-key",
+        choices=["id"],
+        default=None,
+        help="Id hashed to pick the shard of a node. Nodes are always sharded by id, so they land in the same shard as the relationships sharded by their start or end id.",
+    )
 
     # relation command
     rel_parser = subparsers.add_parser(
         "relation",
         help="Generate Datalog relationship EDBs from Neo4j relationship data",
+        parents=[common, single],
     )
     rel_parser.add_argument(
         "-t",
         "--type",
         help="Specify the type of relationship EDB to generate",
-        choices=["fact", "schema", "all"],
+        choices=["fact", "schema", "all", "diff"],
         required=True,
     )
     rel_parser.add_argument(
@@ -79,7 +188,7 @@ def get_parser():
     rel_parser.add_argument(
         "-f",
         "--file",
-        help="Name of the input Neo4j relationship file. Support csv file for now",
+        help="Name of the input Neo4j relationship file. Support csv file, optionally gzip, bz2 or xz compressed",
         required=True,
     )
     rel_parser.add_argument(
@@ -92,6 +201,62 @@ def get_parser():
         "--directory",
         help="Directory for input relationship file. Default to current working directory.",
     )
+    rel_parser.add_argument(
+        "--shard-key",
+        choices=["start", "end"],
+        default=None,
+        help="Id hashed to pick the shard of a relationship. Default to start.",
+    )
+
+    # batch command
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Generate Datalog EDBs for every node and relationship file of a Neo4j import directory",
+        parents=[common],
+    )
+    batch_parser.add_argument(
+        "-t",
+        "--type",
+        help="Specify the type of EDB to generate",
+        choices=["fact", "schema", "all"],
+        default="all",
+    )
+    batch_parser.add_argument(
+        "-d",
+        "--directory",
+        help="Neo4j import directory. Node and relationship csv files are detected from their header "
+        "and named after the file. Default to current working directory.",
+    )
+    batch_parser.add_argument(
+        "-m",
+        "--manifest",
+        help="JSON manifest listing the node and relationship files to convert, used instead of --directory.",
+    )
+    batch_parser.add_argument(
+        "-o",
+        "--output",
+        help="Directory for EDB output. Default to current working directory.",
+    )
+    batch_parser.add_argument(
+        "-s",
+        "--storage",
+        default="row",
+        choices=["row", "col"],
+        help="Specify storage type for node EDBs. Support row-based and column-based storage.",
+    )
+    batch_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="Number of input files converted at the same time. Default to the number of CPUs.",
+    )
+    batch_parser.add_argument(
+        "--shard-key",
+        choices=["start", "end"],
+        default=None,
+        help="Id hashed to pick the shard of a relationship, nodes are always sharded by id. Default to start.",
+    )
 
     return parser
 
@@ -113,6 +278,10 @@ def process_args(parser, args):
         relation_processing_pipeline(args)
         exit()
 
+    if args.command == "batch":
+        batch_processing_pipeline(args)
+        exit()
+
     return
 
 
@@ -2,12 +2,17 @@
 Functions dedicated to command-line processing.
 """
 
+import argparse
+import io
 import os
-from time import sleep
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter, sleep
 
 from kaeru.node import (
     createNodeSchema,
-    createNodes,
+    iterNodeRows,
     writeColumnBasedNodeDeclaration,
     writeRowBasedNodeDeclaration,
     writeColumnBasedNodeIdentifierFacts,
@@ -15,9 +20,42 @@ from kaeru.node import (
     writeRowBasedNodeFacts,
 )
 
+from kaeru.batch import discoverEntries, readManifest, scheduleEntries
+from kaeru.cache import ConversionCache
+from kaeru.delta import diffSorted, iterSorted
+from kaeru.codegen import getNodeRowConverter, getRelationRowConverter
+from kaeru.fileio import (
+    FactFormat,
+    InputFormat,
+    WriterPool,
+    getShard,
+    createEmptyFacts,
+    isCompressed,
+    lockedDirectory,
+    openInput,
+    readHeader,
+)
+from kaeru.idmap import IdMap
+from kaeru.labelscan import scanLabels
+from kaeru.parallel import iterLines, mergeParts, runChunks, splitInput, splitRange
+from kaeru.passthrough import (
+    canPassthroughNodes,
+    canPassthroughRelations,
+    passthroughFile,
+)
+from kaeru.sidecar import (
+    getSidecarFile,
+    readSidecar,
+    readSidecarData,
+    writeSidecar,
+    writeSidecarData,
+)
+from kaeru.sqlitedb import SqliteWriterPool
+from kaeru.watermark import Watermark, findCompleteEnd, hashHeader, readWatermark
+
 from kaeru.relation import (
     createRelationSchema,
-    createRelation,
+    iterRelationRows,
     writeRelationDeclation,
     writeRelationFacts,
 )
@@ -25,28 +63,771 @@ from kaeru.relation import (
 # Change me!!
 DEFAULT_DIR = os.getcwd()
 
+# number of chunks handed to each worker process, for load balancing
+CHUNKS_PER_JOB = 4
 
-# ---------- Node processing related functions -----------#
 
+# ---------- Output related functions -----------#
 
-def node_schema_process(input_path, output_path, args) -> None:
+
+def get_fact_format(args, shard=None) -> FactFormat:
+    return FactFormat(
+        compress=args.compress, backend=args.backend, dbname=args.dbname, shard=shard
+    )
+
+
+def get_shard_formats(args) -> list:
+    # one fact format per shard, a single unsharded one by default
+    if args.shards < 1:
+        raise Exception("Error: --shards must be at least 1.")
+    if args.shards == 1:
+        return [get_fact_format(args)]
+
+    return [get_fact_format(args, shard) for shard in range(args.shards)]
+
+
+def get_declaration_file(output_path, factFormat, args):
+    # each shard gets a declaration of its own, e.g. Person.3_decl.txt
+    name = args.label
+    if factFormat.shard is not None:
+        name = f"{name}.{factFormat.shard}"
+
+    return os.path.join(output_path, f"{name}_decl.txt")
+
+
+def create_shard_facts(output_path, names, args) -> None:
+    # every shard is declared, and Souffle stops on a missing input file, so
+    # shards no row was hashed to get an empty facts file
+    if args.backend != "file" or args.shards == 1:
+        return
+
+    for name in names:
+        createEmptyFacts(os.path.join(output_path, name), args.compress)
+
+    return
+
+
+def get_writer_pool(output_path, args):
+    if args.lock and args.id_map:
+        # ids are handed out in memory and saved at the end of each process
+        raise Exception("Error: --lock can not be used with --id-map.")
+    if args.backend == "sqlite":
+        if args.lock:
+            raise Exception("Error: --lock is only supported by the file backend.")
+        # nodes are looked up by id, relationships by start and end id
+        keyColumns = 2 if args.command == "relation" else 1
+        return SqliteWriterPool(
+            os.path.join(output_path, args.dbname), keyColumns=keyColumns
+        )
+
+    return WriterPool(
+        maxOpenFiles=args.max_open_files,
+        compress=args.compress,
+        locking=args.lock,
+    )
+
+
+# ---------- Input related functions -----------#
+
+
+def get_input_format(args) -> InputFormat:
+    return InputFormat(
+        delimiter=args.delimiter, quote=args.quote, arrayDelimiter=args.array_delimiter
+    )
+
+
+def can_split_input(input_file, args) -> bool:
+    # compressed inputs can not be split at byte offsets, nor can quoted
+    # inputs whose fields may hold newlines, and dense ids are handed out in
+    # input order by a single process
+    return (
+        args.jobs > 1
+        and args.quote is None
+        and not isCompressed(input_file)
+        and not args.id_map
+    )
+
+
+def get_fallback_rows(line, inputFormat):
+    # returns the fields of a row the generated converter rejected, quoted
+    # rows are already split
+    if inputFormat.isQuoted():
+        return [line]
+
+    return inputFormat.iterRows([line])
+
+
+def can_passthrough(input_file, args) -> bool:
+    # the passthrough fast path copies plain input bytes to a single plain
+    # .facts file
+    return (
+        args.backend == "file"
+        and args.shards == 1
+        and not args.compress
+        and not args.id_map
+        and not isCompressed(input_file)
+    )
+
+
+# ---------- Cache related functions -----------#
+
+# options that change the declarations or facts of a conversion
+CACHED_OPTIONS = (
+    "command",
+    "label",
+    "type",
+    "storage",
+    "backend",
+    "dbname",
+    "compress",
+    "shards",
+    "shard_key",
+    "delimiter",
+    "quote",
+    "array_delimiter",
+)
+
+
+def get_output_options(args) -> dict:
+    # relation commands have no --storage
+    return {name: getattr(args, name, None) for name in CACHED_OPTIONS}
+
+
+def run_cached_process(process, input_path, part_path, output_path, args):
+    """
+    Converts the input into part_path, or restores its outputs from the
+    cache. Returns the cache key, input file and outputs to mark as applied
+    once merged into output_path, or None when they already were.
+    """
+
+    if args.id_map:
+        raise Exception("Error: --cache can not be used with --id-map.")
+    if args.incremental:
+        raise Exception("Error: --cache can not be used with --incremental.")
+
+    cache = ConversionCache(args.cache)
+    options = get_output_options(args)
     input_file = os.path.join(input_path, args.file)
+    key = cache.getKey(input_file, options)
+    missing = cache.getMissingOutputs(key, input_file, output_path)
+    if missing == []:
+        # facts files may be shared with other inputs, so their content says
+        # nothing about whether these outputs were appended to them
+        return None
+
+    outputs = cache.getOutputs(key)
+    if outputs is None:
+        process(input_path, part_path, args)
+        outputs = cache.store(key, part_path)
+    else:
+        cache.restore(outputs, part_path)
 
-    # create schema
-    inputFile = open(input_file, "r", encoding="utf-8")
-    nodeSchema = createNodeSchema(inputFile, args.label)
+    if missing is not None:
+        # outputs still in place already hold these rows, only the lost ones
+        # are merged again
+        for name in outputs:
+            if name not in missing:
+                os.remove(os.path.join(part_path, name))
+
+    return key, input_file, outputs
+
+
+def mark_cache_applied(cached, output_path, args) -> None:
+    cache = ConversionCache(args.cache)
+    if args.lock:
+        with lockedDirectory(output_path):
+            cache.markApplied(*cached, output_path)
+    else:
+        cache.markApplied(*cached, output_path)
+
+    return
+
+
+def run_process(process, input_path, output_path, args) -> None:
+    if args.cache is None:
+        process(input_path, output_path, args)
+        return
+
+    # outputs are converted or restored into a private directory, then
+    # merged like batch parts so shared facts files are appended to
+    part_path = tempfile.mkdtemp(prefix=".kaeru-", dir=output_path)
+    try:
+        cached = run_cached_process(process, input_path, part_path, output_path, args)
+        if cached is not None:
+            batch_merge_outputs(part_path, output_path, args)
+            mark_cache_applied(cached, output_path, args)
+    finally:
+        shutil.rmtree(part_path, ignore_errors=True)
+
+    return
+
+
+# ---------- Incremental conversion related functions -----------#
+
+
+def get_watermark_file(output_path, args):
+    return os.path.join(output_path, f"{args.label}_watermark.json")
+
+
+def start_incremental(input_file, output_path, args):
+    # returns the header and the watermark to resume from. Watermarks are
+    # byte offsets into a plain file whose rows never span several lines
+    if isCompressed(input_file):
+        raise Exception("Error: --incremental needs an uncompressed input file.")
+    if args.quote is not None:
+        raise Exception("Error: --incremental does not support quoted input.")
+    if args.backend != "file":
+        raise Exception("Error: --incremental is only supported by the file backend.")
+
+    with open(input_file, "rb") as f:
+        header = readHeader(f)
+        dataStart = f.tell()
+
+    options = get_output_options(args)
+    del options["type"]  # fact and all runs write the same facts
+    headerHash = hashHeader(header)
+
+    watermark = readWatermark(get_watermark_file(output_path, args))
+    if watermark is not None and watermark.matches(input_file, headerHash, options):
+        return header, watermark
+
+    # the input was replaced or rewritten, or the options changed: facts of
+    # earlier runs are stale, but may be shared with other inputs writing
+    # the same sub labels, so they are left to the user to remove
+    if watermark is not None:
+        stale = [
+            name
+            for name in watermark.outputs
+            if os.path.exists(os.path.join(output_path, name))
+        ]
+        if stale:
+            raise Exception(
+                f"Error: {args.file} changed since its last incremental run, "
+                f"remove {', '.join(stale)} from {output_path} to convert it again."
+            )
+
+    inode = os.stat(input_file).st_ino
+
+    return header, Watermark(dataStart, headerHash, inode, options)
+
+
+def get_incremental_ranges(input_file, start, end, args):
+    chunkCount = args.jobs * CHUNKS_PER_JOB if can_split_input(input_file, args) else 1
+
+    return splitRange(input_file, start, end, chunkCount)
+
+
+# ---------- Schema sidecar related functions -----------#
+
+
+def get_schema_options(args) -> dict:
+    # options the schema parsed from a header depends on
+    return {
+        "command": args.command,
+        "label": args.label,
+        "delimiter": args.delimiter,
+        "quote": args.quote,
+        "array_delimiter": args.array_delimiter,
+    }
+
+
+def load_schema_sidecar(input_file, output_path, args):
+    # returns the sidecar of the last schema of input_file, None if stale
+    sidecar_file = getSidecarFile(output_path, args.label)
+
+    return readSidecar(sidecar_file, input_file, get_schema_options(args))
+
+
+def save_schema_sidecar(input_file, output_path, args, subLabels=None) -> None:
+    inputFile = openInput(input_file)
+    header = readHeader(inputFile)
     inputFile.close()
 
-    # write schema
-    output_file = os.path.join(output_path, f"{args.label}_decl.txt")
-    outputFile = open(output_file, "w", encoding="utf-8")
+    sidecar_file = getSidecarFile(output_path, args.label)
+    writeSidecar(sidecar_file, input_file, header, get_schema_options(args), subLabels)
+
+    return
+
+
+def get_shared_sub_labels(output_path, header, args) -> list:
+    # sub labels recorded in output_path by any input of the label with the
+    # same header, e.g. another partition converted with --lock
+    sidecar_file = getSidecarFile(output_path, args.label)
+    sidecar = readSidecarData(sidecar_file, get_schema_options(args))
+    if sidecar is None or sidecar["header"] != header:
+        return []
+
+    return sidecar["subLabels"]
+
+
+# ---------- Snapshot diff related functions -----------#
+
+
+def get_snapshot_args(args, file):
+    # a plain conversion of one snapshot into a private directory
+    snapshotArgs = argparse.Namespace(**vars(args))
+    snapshotArgs.file = file
+    snapshotArgs.type = "all"
+    snapshotArgs.backend = "file"
+    snapshotArgs.compress = False
+    snapshotArgs.shards = 1
+    snapshotArgs.lock = False
+
+    return snapshotArgs
+
+
+def diff_process(
+    all_process, get_declarations, keyFields, input_path, output_path, args
+) -> None:
+    # writes the facts inserted and deleted since the --previous snapshot,
+    # keyed on their first keyFields fields, and their declarations
+    if args.previous is None:
+        raise Exception("Error: -t diff needs a --previous snapshot.")
+    if args.backend != "file" or args.shards != 1:
+        raise Exception("Error: -t diff only writes facts files of a single shard.")
+    if args.cache is not None or args.incremental:
+        raise Exception("Error: -t diff can not be used with --cache or --incremental.")
+
+    headers = []
+    for file in (args.previous, args.file):
+        inputFile = openInput(os.path.join(input_path, file))
+        headers.append(readHeader(inputFile).strip())
+        inputFile.close()
+    if headers[0] != headers[1]:
+        raise Exception("Error: both snapshots must have the same header.")
+
+    temp_path = tempfile.mkdtemp(prefix=".kaeru-", dir=output_path)
+    try:
+        snapshot_paths = []
+        subLabels = set()
+        for file in (args.previous, args.file):
+            snapshot_path = os.path.join(temp_path, str(len(snapshot_paths)))
+            os.mkdir(snapshot_path)
+            all_process(input_path, snapshot_path, get_snapshot_args(args, file))
+            snapshot_paths.append(snapshot_path)
+            # sub labels found in either snapshot, e.g. ones gone since
+            sidecar = readSidecarData(
+                getSidecarFile(snapshot_path, args.label), get_schema_options(args)
+            )
+            subLabels.update(sidecar["subLabels"])
+        declarations = get_declarations(headers[1], subLabels, args)
+
+        names = set()
+        for snapshot_path in snapshot_paths:
+            for name in os.listdir(snapshot_path):
+                if name.endswith(".facts"):
+                    names.add(name[: -len(".facts")])
+
+        factFormat = get_fact_format(args)
+        output_file = os.path.join(output_path, f"{args.label}_delta_decl.txt")
+        outputFile = open(output_file, "w", encoding="utf-8")
+        writerPool = WriterPool(compress=args.compress, binary=True)
+        for name in sorted(names):
+            old_file, new_file = [
+                os.path.join(snapshot_path, f"{name}.facts")
+                for snapshot_path in snapshot_paths
+            ]
+            deltaFiles = []
+            for suffix in ("insert", "delete"):
+                delta_file = os.path.join(
+                    output_path, factFormat.getFileName(f"{name}_{suffix}")
+                )
+                # deltas replace those of an older diff instead of growing
+                if os.path.exists(delta_file):
+                    os.remove(delta_file)
+                deltaFiles.append(writerPool.getFile(delta_file))
+
+                outputFile.write(f".decl {name}_{suffix}({declarations[name]})\n")
+                outputFile.write(factFormat.getInputDirective(f"{name}_{suffix}"))
+
+            diffSorted(
+                iterSorted(old_file, keyFields, temp_path),
+                iterSorted(new_file, keyFields, temp_path),
+                keyFields,
+                *deltaFiles,
+            )
+        writerPool.close()
+        outputFile.close()
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+    return
+
+
+# ---------- Id interning related functions -----------#
+
+
+def get_id_interner(idMap, group):
+    if idMap is None:
+        return None
+
+    def internId(rawId):
+        return str(idMap.intern(group, rawId))
+
+    return internId
+
+
+# ---------- Node processing related functions -----------#
+
+
+def create_node_schema(header, args):
+    # sub labels are not scanned, callers collect them while writing facts
+    inputFormat = get_input_format(args)
+    return createNodeSchema(
+        io.StringIO(header), args.label, scanSubLabels=False, inputFormat=inputFormat
+    )
+
+
+def write_node_declaration(nodeSchema, output_path, args) -> None:
+    for factFormat in get_shard_formats(args):
+        output_file = get_declaration_file(output_path, factFormat, args)
+        outputFile = open(output_file, "w", encoding="utf-8")
+
+        if args.storage == "row":
+            writeRowBasedNodeDeclaration(nodeSchema, outputFile, factFormat)
+        elif args.storage == "col":
+            writeColumnBasedNodeDeclaration(nodeSchema, outputFile, factFormat)
+
+        outputFile.close()
+
+    create_shard_facts(output_path, get_node_fact_names(nodeSchema, args), args)
+
+    return
+
+
+def save_node_schema(nodeSchema, input_file, output_path, args) -> None:
+    # with --lock, processes converting partitions of a label into the same
+    # directory share its declaration, so the sub labels declared by the
+    # others are merged in under a lock of the directory
+    if not args.lock:
+        write_node_declaration(nodeSchema, output_path, args)
+        save_schema_sidecar(
+            input_file, output_path, args, nodeSchema.getNodeSubLabels()
+        )
+        return
+
+    inputFile = openInput(input_file)
+    header = readHeader(inputFile)
+    inputFile.close()
+
+    with lockedDirectory(output_path):
+        for subLabel in get_shared_sub_labels(output_path, header, args):
+            nodeSchema.addSubLabel(subLabel)
+        write_node_declaration(nodeSchema, output_path, args)
+        save_schema_sidecar(
+            input_file, output_path, args, nodeSchema.getNodeSubLabels()
+        )
+
+    return
+
+
+def render_node_object(node, nodeSchema, factFormat, output_path, args) -> list:
+    # returns the (output file, facts text) pairs of a node
+    label = node.getLabel()
+    output_file = os.path.join(output_path, factFormat.getFileName(label))
+    outputFile = io.StringIO()
+    rendered = [(output_file, outputFile)]
 
     if args.storage == "row":
-        writeRowBasedNodeDeclaration(nodeSchema, outputFile)
+        writeRowBasedNodeFacts(node, nodeSchema, outputFile)
+
     elif args.storage == "col":
-        writeColumnBasedNodeDeclaration(nodeSchema, outputFile)
+        # write id file
+        writeColumnBasedNodeIdentifierFacts(node, outputFile)
+        # write to property file
+        # rename property if sub labels exist
+        propertyNameList = node.getPropertyNames()
+        for propertyName in propertyNameList:
+            output_file = os.path.join(
+                output_path, factFormat.getFileName(propertyName)
+            )
+            outputFile = io.StringIO()
+            rendered.append((output_file, outputFile))
+            writeColumnBasedNodePropertyFacts(node, propertyName, outputFile)
+
+    return [(path, outputFile.getvalue()) for path, outputFile in rendered]
+
+
+def get_node_output_files(label, nodeSchema, factFormat, output_path, args):
+    if args.storage == "row":
+        return os.path.join(output_path, factFormat.getFileName(label))
+
+    # id file followed by one file per property, renamed after the label
+    names = (label,) + nodeSchema.getRenamedPropertyNames(label)
+
+    return [os.path.join(output_path, factFormat.getFileName(name)) for name in names]
+
+
+def write_node_facts(
+    lines, nodeSchema, output_path, args, collectSubLabels=False
+) -> None:
+    idMap = IdMap(args.id_map) if args.id_map else None
+    idGroup = nodeSchema.getIdGroup()
+    internId = get_id_interner(idMap, idGroup)
+
+    writerPool = get_writer_pool(output_path, args)
+    factFormats = get_shard_formats(args)
+    shardCount = len(factFormats)
+    inputFormat = get_input_format(args)
+
+    convert = getNodeRowConverter(nodeSchema, args.storage, internId, inputFormat)
+    collect = collectSubLabels and nodeSchema.hasSubLabels
+    outputFiles = {}  # a map of (label, shard) to its output file(s)
+
+    if inputFormat.isQuoted():
+        lines = inputFormat.iterRows(lines)
+
+    for line in lines:
+        converted = convert(line)
+
+        if converted is None:
+            # rows whose field count differs from the header go through
+            # the generic node conversion
+            rows = get_fallback_rows(line, inputFormat)
+            for node in iterNodeRows(rows, nodeSchema, collect, inputFormat):
+                if idMap is not None:
+                    node.setId(str(idMap.intern(idGroup, node.getId())))
+                shard = getShard(node.getId(), shardCount) if shardCount > 1 else 0
+                for path, text in render_node_object(
+                    node, nodeSchema, factFormats[shard], output_path, args
+                ):
+                    writerPool.getFile(path).write(text)
+            continue
+
+        label, output = converted
+
+        shard = 0
+        if shardCount > 1:
+            # nodes are sharded by their id, the first field of their facts
+            shard = getShard(output if args.storage == "row" else output[0], shardCount)
+
+        paths = outputFiles.get((label, shard))
+        if paths is None:
+            if collect:
+                nodeSchema.addSubLabel(label)
+            paths = get_node_output_files(
+                label, nodeSchema, factFormats[shard], output_path, args
+            )
+            outputFiles[(label, shard)] = paths
+
+        if args.storage == "row":
+            writerPool.getFile(paths).write(output)
+        else:
+            for path, text in zip(paths, output):
+                writerPool.getFile(path).write(text)
+
+    writerPool.close()
+    if idMap is not None:
+        idMap.save()
+        idMap.close()
+
+    return
+
+
+def node_passthrough_range(input_file, start, end, nodeSchema, output_path, args):
+    label = nodeSchema.getNodeGlobalLabel()
+    output_file = os.path.join(output_path, get_fact_format(args).getFileName(label))
+
+    def fallback(lines):
+        write_node_facts(lines, nodeSchema, output_path, args)
+
+    columnCount = len(nodeSchema.getRowPlan())
+    passthroughFile(
+        input_file,
+        start,
+        end,
+        output_file,
+        columnCount,
+        fallback,
+        args.delimiter,
+        args.lock,
+    )
+
+    return
+
+
+def node_passthrough_process(input_file, output_path, args):
+    # returns the node schema if the fast path converted the file, else None
+    if args.storage != "row" or not can_passthrough(input_file, args):
+        return None
+
+    header, ranges = splitInput(input_file, 1)
+    nodeSchema = create_node_schema(header, args)
+    if not canPassthroughNodes(nodeSchema, get_input_format(args)):
+        return None
+
+    for start, end in ranges:
+        node_passthrough_range(input_file, start, end, nodeSchema, output_path, args)
+
+    return nodeSchema
+
+
+def node_chunk_process(input_file, start, end, part_path, nodeSchema, args) -> set:
+    # runs in a worker process, on a private copy of nodeSchema
+    if (
+        args.storage == "row"
+        and can_passthrough(input_file, args)
+        and canPassthroughNodes(nodeSchema, get_input_format(args))
+    ):
+        node_passthrough_range(input_file, start, end, nodeSchema, part_path, args)
+        return nodeSchema.getNodeSubLabels()
+
+    lines = iterLines(input_file, start, end)
+    write_node_facts(lines, nodeSchema, part_path, args, collectSubLabels=True)
+
+    return nodeSchema.getNodeSubLabels()
+
+
+def node_parallel_process(input_file, output_path, args):
+    header, ranges = splitInput(input_file, args.jobs * CHUNKS_PER_JOB)
+    nodeSchema = create_node_schema(header, args)
+
+    subLabelSets = runChunks(
+        input_file,
+        output_path,
+        ranges,
+        node_chunk_process,
+        (nodeSchema, args),
+        args.jobs,
+        args.lock,
+    )
+    for subLabels in subLabelSets:
+        for subLabel in subLabels:
+            nodeSchema.addSubLabel(subLabel)
+
+    return nodeSchema
+
+
+def get_node_fact_names(nodeSchema, args) -> list:
+    # names of every facts file written for nodeSchema so far
+    if nodeSchema.hasSubLabels:
+        labels = nodeSchema.getNodeSubLabels()
+    else:
+        labels = {nodeSchema.getNodeGlobalLabel()}
+
+    names = []
+    for factFormat in get_shard_formats(args):
+        for label in sorted(labels):
+            files = get_node_output_files(label, nodeSchema, factFormat, "", args)
+            names += [files] if args.storage == "row" else files
+
+    return names
+
 
-    outputFile.close()
+def get_node_fact_declarations(header, subLabels, args) -> dict:
+    # attribute lists of every facts file of a node schema, named like the
+    # facts writers name their files
+    nodeSchema = create_node_schema(header, args)
+    for subLabel in subLabels:
+        nodeSchema.addSubLabel(subLabel)
+
+    if nodeSchema.hasSubLabels:
+        labels = nodeSchema.getNodeSubLabels()
+    else:
+        labels = {nodeSchema.getNodeGlobalLabel()}
+
+    nodeProperty = nodeSchema.getPropertyNameAndType()
+    properties = [nodeProperty[position] for position in sorted(nodeProperty)]
+    declarations = {}
+    for label in labels:
+        if args.storage == "row":
+            attributes = ["id:unsigned"]
+            attributes += [
+                f"{name}:{propertyType}" for name, propertyType in properties
+            ]
+            declarations[label] = ", ".join(attributes)
+            continue
+
+        declarations[label] = "id:unsigned"
+        renamed = nodeSchema.getRenamedPropertyNames(label)
+        for name, (_, propertyType) in zip(renamed, properties):
+            declarations[name] = f"id:unsigned, {name}:{propertyType}"
+
+    return declarations
+
+
+def node_incremental_process(input_file, output_path, args) -> None:
+    # converts the rows appended since the watermark of the last run
+    header, watermark = start_incremental(input_file, output_path, args)
+    nodeSchema = create_node_schema(header, args)
+    for subLabel in watermark.subLabels:
+        nodeSchema.addSubLabel(subLabel)
+    knownSubLabels = set(nodeSchema.getNodeSubLabels())
+
+    end = findCompleteEnd(input_file, watermark.offset)
+    ranges = get_incremental_ranges(input_file, watermark.offset, end, args)
+    if len(ranges) > 1:
+        subLabelSets = runChunks(
+            input_file,
+            output_path,
+            ranges,
+            node_chunk_process,
+            (nodeSchema, args),
+            args.jobs,
+            args.lock,
+        )
+        for subLabels in subLabelSets:
+            for subLabel in subLabels:
+                nodeSchema.addSubLabel(subLabel)
+    else:
+        for start, chunkEnd in ranges:
+            node_chunk_process(
+                input_file, start, chunkEnd, output_path, nodeSchema, args
+            )
+
+    # new sub labels are new relations, the declaration has to follow
+    subLabels = nodeSchema.getNodeSubLabels()
+    if args.type == "all" or subLabels != knownSubLabels:
+        save_node_schema(nodeSchema, input_file, output_path, args)
+
+    watermark.offset = end
+    watermark.subLabels = list(subLabels)
+    watermark.outputs = get_node_fact_names(nodeSchema, args)
+    watermark.save(get_watermark_file(output_path, args))
+
+    return
+
+
+def node_diff_process(input_path, output_path, args) -> None:
+    # nodes are keyed on their id
+    diff_process(
+        node_all_process, get_node_fact_declarations, 1, input_path, output_path, args
+    )
+
+    return
+
+
+def node_schema_process(input_path, output_path, args) -> None:
+    input_file = os.path.join(input_path, args.file)
+
+    # an up to date sidecar spares the scan of the data rows for sub labels
+    sidecar = load_schema_sidecar(input_file, output_path, args)
+    if sidecar is not None:
+        nodeSchema = create_node_schema(sidecar["header"], args)
+        for subLabel in sidecar["subLabels"]:
+            nodeSchema.addSubLabel(subLabel)
+    else:
+        inputFile = openInput(input_file)
+        if args.quote is None and not isCompressed(input_file):
+            # plain files only need their label column scanned, in binary
+            # blocks and over byte ranges in parallel
+            nodeSchema = create_node_schema(readHeader(inputFile), args)
+            if nodeSchema.hasSubLabels:
+                subLabels = scanLabels(
+                    input_file, nodeSchema.subLabelsPosition, args.delimiter, args.jobs
+                )
+                for subLabel in subLabels:
+                    nodeSchema.addSubLabel(subLabel)
+        else:
+            # create schema
+            inputFormat = get_input_format(args)
+            nodeSchema = createNodeSchema(
+                inputFile, args.label, inputFormat=inputFormat
+            )
+        inputFile.close()
+
+    # write schema
+    save_node_schema(nodeSchema, input_file, output_path, args)
 
     return
 
@@ -54,46 +835,70 @@ def node_schema_process(input_path, output_path, args) -> None:
 def node_fact_process(input_path, output_path, args) -> None:
     input_file = os.path.join(input_path, args.file)
 
-    # create schema
-    inputFile = open(input_file, "r", encoding="utf-8")
-    nodeSchema = createNodeSchema(inputFile, args.label)
-    inputFile.close()
+    if args.incremental:
+        node_incremental_process(input_file, output_path, args)
+        return
+
+    if can_split_input(input_file, args):
+        node_parallel_process(input_file, output_path, args)
+        return
+
+    if node_passthrough_process(input_file, output_path, args) is not None:
+        return
 
-    # create nodes
-    inputFile = open(input_file, "r", encoding="utf-8")
-    nodeList = createNodes(inputFile, nodeSchema)
+    # sub labels are not needed to write facts, so only the header is read
+    # before streaming nodes from the same handle
+    inputFile = openInput(input_file)
+    nodeSchema = create_node_schema(readHeader(inputFile), args)
+    write_node_facts(inputFile, nodeSchema, output_path, args)
     inputFile.close()
 
-    # write nodes
+    return
 
-    if args.storage == "row":
-        for node in nodeList:
-            label = node.getLabel()
-            output_file = os.path.join(output_path, f"{label}.facts")
-            outputFile = open(output_file, "a", encoding="utf-8")
-            writeRowBasedNodeFacts(node, nodeSchema, outputFile)
-            outputFile.close()
 
-    elif args.storage == "col":
-        for node in nodeList:
-            # write id file
-            label = node.getLabel()
-            output_file = os.path.join(output_path, f"{label}.facts")
-            outputFile = open(output_file, "a", encoding="utf-8")
-            writeColumnBasedNodeIdentifierFacts(node, outputFile)
-            outputFile.close()
-            # write to property file
-            # rename property if sub labels exist
-            propertyNameList = node.getPropertyNames()
-            for propertyName in propertyNameList:
-                output_file = os.path.join(output_path, f"{propertyName}.facts")
-                outputFile = open(output_file, "a", encoding="utf-8")
-                writeColumnBasedNodePropertyFacts(node, propertyName, outputFile)
-                outputFile.close()
+def node_all_process(input_path, output_path, args) -> None:
+    input_file = os.path.join(input_path, args.file)
+
+    if args.incremental:
+        node_incremental_process(input_file, output_path, args)
+        return
+
+    # single pass: collect sub labels while writing facts, then write the
+    # declaration once the whole file has been seen
+    if can_split_input(input_file, args):
+        nodeSchema = node_parallel_process(input_file, output_path, args)
+    else:
+        nodeSchema = node_passthrough_process(input_file, output_path, args)
+
+    if nodeSchema is None:
+        inputFile = openInput(input_file)
+        nodeSchema = create_node_schema(readHeader(inputFile), args)
+        write_node_facts(
+            inputFile, nodeSchema, output_path, args, collectSubLabels=True
+        )
+        inputFile.close()
+
+    save_node_schema(nodeSchema, input_file, output_path, args)
 
     return
 
 
+def get_node_process(args):
+    if args.type == "schema":
+        process = node_schema_process
+
+    elif args.type == "fact":
+        process = node_fact_process
+
+    elif args.type == "all":
+        process = node_all_process
+
+    elif args.type == "diff":
+        process = node_diff_process
+
+    return process
+
+
 def node_processing_pipeline(args) -> None:
     if args.directory == None:
         input_path = DEFAULT_DIR
@@ -105,35 +910,251 @@ def node_processing_pipeline(args) -> None:
     else:
         output_path = args.output
 
-    if args.type == "schema":
-        node_schema_process(input_path, output_path, args)
+    run_process(get_node_process(args), input_path, output_path, args)
 
-    elif args.type == "fact":
-        node_fact_process(input_path, output_path, args)
+    return
+
+
+# --------------- Relation processing related functions -----------------#
+
+
+def create_relation_schema(header, args):
+    inputFormat = get_input_format(args)
+    return createRelationSchema(io.StringIO(header), args.label, inputFormat)
 
-    elif args.type == "all":
-        node_schema_process(input_path, output_path, args)
-        node_fact_process(input_path, output_path, args)
+
+def write_relation_declaration(relationSchema, output_path, args) -> None:
+    for factFormat in get_shard_formats(args):
+        output_file = get_declaration_file(output_path, factFormat, args)
+        outputFile = open(output_file, "w", encoding="utf-8")
+        writeRelationDeclation(relationSchema, outputFile, factFormat)
+        outputFile.close()
+
+    label = relationSchema.getGlobalLabel()
+    names = [factFormat.getFileName(label) for factFormat in get_shard_formats(args)]
+    create_shard_facts(output_path, names, args)
 
     return
 
 
-# --------------- Relation processing related functions -----------------#
+def write_relation_facts(lines, relationSchema, output_path, args) -> None:
+    idMap = IdMap(args.id_map) if args.id_map else None
+    sourceGroup = relationSchema.getSourceGroup()
+    targetGroup = relationSchema.getTargetGroup()
+    internSource = get_id_interner(idMap, sourceGroup)
+    internTarget = get_id_interner(idMap, targetGroup)
+
+    writerPool = get_writer_pool(output_path, args)
+    factFormats = get_shard_formats(args)
+    shardCount = len(factFormats)
+    # relations are sharded by their start id, the first field of their
+    # facts, or by their end id, the second one
+    shardField = 1 if args.shard_key == "end" else 0
+
+    inputFormat = get_input_format(args)
+
+    convert = getRelationRowConverter(
+        relationSchema, internSource, internTarget, inputFormat
+    )
+    label = relationSchema.getGlobalLabel()
+    output_files = [
+        os.path.join(output_path, factFormat.getFileName(label))
+        for factFormat in factFormats
+    ]
+    output_file = output_files[0]
+
+    if inputFormat.isQuoted():
+        lines = inputFormat.iterRows(lines)
+
+    for line in lines:
+        output = convert(line)
+
+        if output is None:
+            # rows whose field count differs from the header go through
+            # the generic relation conversion
+            rows = get_fallback_rows(line, inputFormat)
+            for relation in iterRelationRows(rows, relationSchema, inputFormat):
+                if idMap is not None:
+                    sourceId = idMap.intern(sourceGroup, relation.getSourceId())
+                    targetId = idMap.intern(targetGroup, relation.getTargetId())
+                    relation.setSourceId(str(sourceId))
+                    relation.setTargetId(str(targetId))
+                outputFile = io.StringIO()
+                writeRelationFacts(relation, outputFile)
+                text = outputFile.getvalue()
+                if shardCount > 1:
+                    output_file = output_files[getShard(text, shardCount, shardField)]
+                writerPool.getFile(output_file).write(text)
+            continue
+
+        if shardCount > 1:
+            output_file = output_files[getShard(output, shardCount, shardField)]
+        writerPool.getFile(output_file).write(output)
+
+    writerPool.close()
+    if idMap is not None:
+        idMap.save()
+        idMap.close()
+
+    return
+
+
+def relation_passthrough_range(
+    input_file, start, end, relationSchema, output_path, args
+):
+    label = relationSchema.getGlobalLabel()
+    output_file = os.path.join(output_path, get_fact_format(args).getFileName(label))
+
+    def fallback(lines):
+        write_relation_facts(lines, relationSchema, output_path, args)
+
+    columnCount = len(relationSchema.getRowPlan())
+    passthroughFile(
+        input_file,
+        start,
+        end,
+        output_file,
+        columnCount,
+        fallback,
+        args.delimiter,
+        args.lock,
+    )
+
+    return
+
+
+def relation_passthrough_process(input_file, output_path, args):
+    # returns the relation schema if the fast path converted the file, else None
+    if not can_passthrough(input_file, args):
+        return None
+
+    header, ranges = splitInput(input_file, 1)
+    relationSchema = create_relation_schema(header, args)
+    if not canPassthroughRelations(relationSchema, get_input_format(args)):
+        return None
+
+    for start, end in ranges:
+        relation_passthrough_range(
+            input_file, start, end, relationSchema, output_path, args
+        )
+
+    return relationSchema
+
+
+def relation_chunk_process(input_file, start, end, part_path, relationSchema, args):
+    # runs in a worker process
+    if can_passthrough(input_file, args) and canPassthroughRelations(
+        relationSchema, get_input_format(args)
+    ):
+        relation_passthrough_range(
+            input_file, start, end, relationSchema, part_path, args
+        )
+        return
+
+    lines = iterLines(input_file, start, end)
+    write_relation_facts(lines, relationSchema, part_path, args)
+
+    return
+
+
+def relation_parallel_process(input_file, output_path, args):
+    header, ranges = splitInput(input_file, args.jobs * CHUNKS_PER_JOB)
+    relationSchema = create_relation_schema(header, args)
+
+    runChunks(
+        input_file,
+        output_path,
+        ranges,
+        relation_chunk_process,
+        (relationSchema, args),
+        args.jobs,
+        args.lock,
+    )
+
+    return relationSchema
+
+
+def get_relation_fact_declarations(header, subLabels, args) -> dict:
+    # relationships have no sub labels, a single facts file holds them all
+    relationSchema = create_relation_schema(header, args)
+    attributes = [
+        f"{relationSchema.getSourceName()}:unsigned",
+        f"{relationSchema.getTargetName()}:unsigned",
+    ]
+    for propertyName in relationSchema.getPropertyNames():
+        propertyType = relationSchema.getPropertyTypeByName(propertyName)
+        attributes.append(f"{propertyName}:{propertyType}")
+
+    return {relationSchema.getGlobalLabel(): ", ".join(attributes)}
+
+
+def relation_incremental_process(input_file, output_path, args) -> None:
+    # converts the rows appended since the watermark of the last run
+    header, watermark = start_incremental(input_file, output_path, args)
+    relationSchema = create_relation_schema(header, args)
+
+    end = findCompleteEnd(input_file, watermark.offset)
+    ranges = get_incremental_ranges(input_file, watermark.offset, end, args)
+    if len(ranges) > 1:
+        runChunks(
+            input_file,
+            output_path,
+            ranges,
+            relation_chunk_process,
+            (relationSchema, args),
+            args.jobs,
+            args.lock,
+        )
+    else:
+        for start, chunkEnd in ranges:
+            relation_chunk_process(
+                input_file, start, chunkEnd, output_path, relationSchema, args
+            )
+
+    if args.type == "all":
+        write_relation_declaration(relationSchema, output_path, args)
+
+    label = relationSchema.getGlobalLabel()
+    watermark.offset = end
+    watermark.outputs = [
+        factFormat.getFileName(label) for factFormat in get_shard_formats(args)
+    ]
+    watermark.save(get_watermark_file(output_path, args))
+
+    return
+
+
+def relation_diff_process(input_path, output_path, args) -> None:
+    # relations are keyed on their start and end ids
+    diff_process(
+        relation_all_process,
+        get_relation_fact_declarations,
+        2,
+        input_path,
+        output_path,
+        args,
+    )
+
+    return
 
 
 def relation_schema_process(input_path, output_path, args) -> None:
     input_file = os.path.join(input_path, args.file)
 
-    # Create schema
-    inputFile = open(input_file, "r", encoding="utf-8")
-    relationSchema = createRelationSchema(inputFile, args.label)
-    inputFile.close()
+    # Create schema, from the header kept by the sidecar when up to date
+    sidecar = load_schema_sidecar(input_file, output_path, args)
+    if sidecar is not None:
+        relationSchema = create_relation_schema(sidecar["header"], args)
+    else:
+        inputFile = openInput(input_file)
+        relationSchema = createRelationSchema(
+            inputFile, args.label, get_input_format(args)
+        )
+        inputFile.close()
+        save_schema_sidecar(input_file, output_path, args)
 
     # Write schema to output file
-    output_file = os.path.join(output_path, f"{args.label}_decl.txt")
-    outputFile = open(output_file, "w", encoding="utf-8")
-    writeRelationDeclation(relationSchema, outputFile)
-    outputFile.close()
+    write_relation_declaration(relationSchema, output_path, args)
 
     return
 
@@ -141,27 +1162,68 @@ def relation_schema_process(input_path, output_path, args) -> None:
 def relation_fact_process(input_path, output_path, args) -> None:
     input_file = os.path.join(input_path, args.file)
 
-    # Create schema
-    inputFile = open(input_file, "r", encoding="utf-8")
-    relationSchema = createRelationSchema(inputFile, args.label)
-    inputFile.close()
+    if args.incremental:
+        relation_incremental_process(input_file, output_path, args)
+        return
+
+    if can_split_input(input_file, args):
+        relation_parallel_process(input_file, output_path, args)
+        return
 
-    # Create a list of relation objects
-    inputFile = open(input_file, "r", encoding="utf-8")
-    relationList = createRelation(inputFile, relationSchema)
+    if relation_passthrough_process(input_file, output_path, args) is not None:
+        return
+
+    # Create schema from the header, then stream relations from the same handle
+    inputFile = openInput(input_file)
+    relationSchema = create_relation_schema(readHeader(inputFile), args)
+    write_relation_facts(inputFile, relationSchema, output_path, args)
     inputFile.close()
 
-    # Write relation facts
-    for relation in relationList:
-        label = relation.getLabel()
-        output_file = os.path.join(output_path, f"{label}.facts")
-        outputFile = open(output_file, "a", encoding="utf-8")
-        writeRelationFacts(relation, outputFile)
-        outputFile.close()
+    return
+
+
+def relation_all_process(input_path, output_path, args) -> None:
+    # The relation schema only depends on the header, so the fact pass
+    # already has everything the declaration needs
+    input_file = os.path.join(input_path, args.file)
+
+    if args.incremental:
+        relation_incremental_process(input_file, output_path, args)
+        return
+
+    if can_split_input(input_file, args):
+        relationSchema = relation_parallel_process(input_file, output_path, args)
+    else:
+        relationSchema = relation_passthrough_process(input_file, output_path, args)
+
+    if relationSchema is None:
+        inputFile = openInput(input_file)
+        relationSchema = create_relation_schema(readHeader(inputFile), args)
+        write_relation_facts(inputFile, relationSchema, output_path, args)
+        inputFile.close()
+
+    write_relation_declaration(relationSchema, output_path, args)
+    save_schema_sidecar(input_file, output_path, args)
 
     return
 
 
+def get_relation_process(args):
+    if args.type == "schema":
+        process = relation_schema_process
+
+    elif args.type == "fact":
+        process = relation_fact_process
+
+    elif args.type == "all":
+        process = relation_all_process
+
+    elif args.type == "diff":
+        process = relation_diff_process
+
+    return process
+
+
 def relation_processing_pipeline(args) -> None:
     if args.directory == None:
         input_path = DEFAULT_DIR
@@ -173,14 +1235,157 @@ def relation_processing_pipeline(args) -> None:
     else:
         output_path = args.output
 
-    if args.type == "schema":
-        relation_schema_process(input_path, output_path, args)
+    run_process(get_relation_process(args), input_path, output_path, args)
 
-    elif args.type == "fact":
-        relation_fact_process(input_path, output_path, args)
+    return
 
-    elif args.type == "all":
-        relation_schema_process(input_path, output_path, args)
-        relation_fact_process(input_path, output_path, args)
+
+# --------------- Batch processing related functions -----------------#
+
+
+def batch_entry_process(entryArgs, part_path, output_path) -> tuple:
+    # runs in a worker process, writing to a private output directory.
+    # Returns the conversion time and, with --cache, the cache key and
+    # outputs to mark as applied once merged into output_path
+    start = perf_counter()
+
+    if entryArgs.command == "node":
+        process = get_node_process(entryArgs)
+    elif entryArgs.command == "relation":
+        process = get_relation_process(entryArgs)
+
+    cached = None
+    if entryArgs.cache is None:
+        process(entryArgs.directory, part_path, entryArgs)
+    else:
+        cached = run_cached_process(
+            process, entryArgs.directory, part_path, output_path, entryArgs
+        )
+
+    return perf_counter() - start, cached
+
+
+def batch_merge_node_declaration(part_path, output_path, args) -> None:
+    # rewrites the declaration in part_path with the sub labels declared in
+    # output_path by other partitions of the label
+    sidecar_file = getSidecarFile(part_path, args.label)
+    sidecar = readSidecarData(sidecar_file, get_schema_options(args))
+    if sidecar is None:
+        return
+
+    subLabels = set(sidecar["subLabels"])
+    sharedSubLabels = get_shared_sub_labels(output_path, sidecar["header"], args)
+    if subLabels.issuperset(sharedSubLabels):
+        return
+
+    nodeSchema = create_node_schema(sidecar["header"], args)
+    for subLabel in subLabels.union(sharedSubLabels):
+        nodeSchema.addSubLabel(subLabel)
+    write_node_declaration(nodeSchema, part_path, args)
+    sidecar["subLabels"] = sorted(nodeSchema.getNodeSubLabels())
+    writeSidecarData(sidecar_file, sidecar)
+
+    return
+
+
+def batch_replace_schema_outputs(part_path, output_path) -> None:
+    for name in os.listdir(part_path):
+        if name.endswith("_decl.txt") or name.endswith("_schema.json"):
+            os.replace(os.path.join(part_path, name), os.path.join(output_path, name))
+
+    return
+
+
+def batch_merge_outputs(part_path, output_path, args) -> None:
+    # declarations and schema sidecars belong to a single input and replace
+    # older ones, facts may be shared between inputs and are appended.
+    # Under --lock the declaration of a node label is shared by the
+    # processes converting its partitions and declares all their sub labels.
+    if args.lock and args.command == "node":
+        with lockedDirectory(output_path):
+            batch_merge_node_declaration(part_path, output_path, args)
+            batch_replace_schema_outputs(part_path, output_path)
+    else:
+        batch_replace_schema_outputs(part_path, output_path)
+
+    mergeParts(part_path, output_path, args.lock)
+
+    return
+
+
+def batch_print_summary(timings, elapsed) -> None:
+    print(f"{'file':<40} {'type':<9} {'label':<20} {'MB':>10} {'seconds':>9}")
+    for entry, seconds in timings:
+        print(
+            f"{entry.getFileName():<40} {entry.command:<9} {entry.label:<20} "
+            f"{entry.size / 2**20:>10.1f} {seconds:>9.2f}"
+        )
+    print(f"{len(timings)} files converted in {elapsed:.2f} seconds")
+
+    return
+
+
+def batch_processing_pipeline(args) -> None:
+    if args.output == None:
+        output_path = DEFAULT_DIR
+    else:
+        output_path = args.output
+
+    if args.manifest:
+        entries = readManifest(args.manifest)
+    elif args.directory:
+        entries = discoverEntries(args.directory)
+    else:
+        entries = discoverEntries(DEFAULT_DIR)
+
+    entries = scheduleEntries(entries)
+    jobs = args.jobs
+    if args.id_map:
+        # a shared id map is updated by one conversion at a time, and nodes
+        # go first so relations find the ids they refer to
+        entries.sort(key=lambda entry: entry.command != "node")
+        jobs = 1
+
+    start = perf_counter()
+    timings = []
+    temp_path = tempfile.mkdtemp(prefix=".kaeru-", dir=output_path)
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for index, entry in enumerate(entries):
+                part_path = os.path.join(temp_path, str(index))
+                os.mkdir(part_path)
+
+                entryArgs = argparse.Namespace(**vars(args))
+                entryArgs.command = entry.command
+                entryArgs.label = entry.label
+                entryArgs.file = entry.getFileName()
+                entryArgs.directory = entry.getDirectory()
+                entryArgs.output = part_path
+                entryArgs.storage = entry.storage or args.storage
+                entryArgs.jobs = 1
+                # watermarks would be left behind in the private directory
+                entryArgs.incremental = False
+
+                future = executor.submit(
+                    batch_entry_process, entryArgs, part_path, output_path
+                )
+                futures[future] = (entry, part_path, entryArgs)
+
+            # merge outputs in the parent as soon as each file is done, so
+            # concurrent conversions never append to the same facts file
+            for future in as_completed(futures):
+                entry, part_path, entryArgs = futures[future]
+                seconds, cached = future.result()
+                timings.append((entry, seconds))
+                batch_merge_outputs(part_path, output_path, entryArgs)
+                if cached is not None:
+                    mark_cache_applied(cached, output_path, entryArgs)
+
+    finally:
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+    batch_print_summary(timings, perf_counter() - start)
 
     return
@@ -0,0 +1,242 @@
+"""
+Module bundling the code generation of row converters specialised to a schema
+"""
+
+from typing import Callable
+
+from kaeru.fileio import (
+    ARRAY_DELIMITER,
+    DEFAULT_INPUT_FORMAT,
+    SYMBOL_ESCAPE_TABLE,
+    InputFormat,
+)
+from kaeru.node import NodeSchema, NodeType
+from kaeru.relation import RelationSchema, RelationType
+
+# compiled converter factories keyed by header signature and options
+converterCache = {}
+
+
+def compileFactory(source: str) -> Callable:
+    namespace = {"ESCAPE": SYMBOL_ESCAPE_TABLE}
+    exec(compile(source, "<kaeru-codegen>", "exec"), namespace)
+
+    return namespace["factory"]
+
+
+def cellExpression(field, position: int, inputFormat) -> str:
+    if field.nullValue is None:
+        return f"f[{position}]"
+
+    cell = f"f[{position}]"
+    if field.isArray and inputFormat.rewritesArrays():
+        cell += f".replace({inputFormat.arrayDelimiter!r}, {ARRAY_DELIMITER!r})"
+
+    # empty cells are replaced by the null value of their type
+    return f"({cell} or {field.nullValue!r})"
+
+
+def convertStatements(inputFormat: InputFormat) -> list:
+    """
+    Returns the generated header of convert. Quoted rows are split by the
+    csv reader beforehand, so their converter takes the list of fields.
+    """
+
+    if inputFormat.isQuoted():
+        return ["    def convert(f):"]
+
+    return [
+        "    def convert(line):",
+        '        s = line.strip("\\n")',
+        f"        f = s.split({inputFormat.delimiter!r})",
+    ]
+
+
+def escapeStatements(symbolPositions: list, inputFormat: InputFormat) -> list:
+    """
+    Tabs and line breaks in symbol cells are replaced through a translate
+    table. Unquoted lines are scanned once and only rows holding one of
+    them pay for the translation.
+    """
+
+    if not symbolPositions:
+        return []
+
+    escapes = [f"f[{p}] = f[{p}].translate(ESCAPE)" for p in symbolPositions]
+    if inputFormat.isQuoted():
+        # quoted fields may hold line breaks of their own
+        return ["        " + statement for statement in escapes]
+
+    statements = ['        if "\\t" in s or "\\r" in s:']
+    statements += ["            " + statement for statement in escapes]
+
+    return statements
+
+
+def generateNodeSource(
+    nodeSchema: NodeSchema,
+    storage: str,
+    internIds: bool,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+    escapeSymbols: bool = True,
+) -> str:
+    rowPlan = nodeSchema.getRowPlan()
+
+    idPosition = None
+    labelPosition = None
+    properties = []
+    symbolPositions = []
+    for position, field in enumerate(rowPlan):
+        if field.kind == NodeType.ID:
+            idPosition = position
+        elif field.kind == NodeType.LABEL:
+            labelPosition = position
+        else:
+            properties.append(cellExpression(field, position, inputFormat))
+            if field.type == "symbol":
+                symbolPositions.append(position)
+
+    if idPosition is None:
+        raise Exception("Error: no :ID column found in the input data file.")
+
+    if labelPosition is None:
+        label = repr(nodeSchema.getNodeGlobalLabel())
+    else:
+        label = f"f[{labelPosition}]"
+
+    identifier = f"internId(f[{idPosition}])" if internIds else f"f[{idPosition}]"
+
+    lines = ["def factory(internId):"]
+    lines += convertStatements(inputFormat)
+    lines += [
+        f"        if len(f) != {len(rowPlan)}:",
+        "            return None",
+    ]
+    if escapeSymbols:
+        lines += escapeStatements(symbolPositions, inputFormat)
+    lines.append(f"        i = {identifier}")
+    if storage == "row":
+        cells = ", ".join(["i"] + properties)
+        lines.append(f'        return {label}, "\\t".join(({cells},)) + "\\n"')
+    else:
+        cells = ['i + "\\n"']
+        cells += [f'i + "\\t" + {cell} + "\\n"' for cell in properties]
+        lines.append(f"        return {label}, ({', '.join(cells)},)")
+    lines += ["    return convert", ""]
+
+    return "\n".join(lines)
+
+
+def generateRelationSource(
+    relationSchema: RelationSchema,
+    internIds: bool,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+    escapeSymbols: bool = True,
+) -> str:
+    rowPlan = relationSchema.getRowPlan()
+
+    startPosition = None
+    endPosition = None
+    properties = []
+    symbolPositions = []
+    for position, field in enumerate(rowPlan):
+        if field.kind == RelationType.START_ID:
+            startPosition = position
+        elif field.kind == RelationType.END_ID:
+            endPosition = position
+        else:
+            properties.append(cellExpression(field, position, inputFormat))
+            if field.type == "symbol":
+                symbolPositions.append(position)
+
+    if startPosition is None or endPosition is None:
+        raise Exception("Error: :START_ID or :END_ID column missing in input file.")
+
+    if internIds:
+        startId = f"internSource(f[{startPosition}])"
+        endId = f"internTarget(f[{endPosition}])"
+    else:
+        startId = f"f[{startPosition}]"
+        endId = f"f[{endPosition}]"
+
+    cells = ", ".join([startId, endId] + properties)
+
+    lines = ["def factory(internSource, internTarget):"]
+    lines += convertStatements(inputFormat)
+    lines += [
+        f"        if len(f) != {len(rowPlan)}:",
+        "            return None",
+    ]
+    if escapeSymbols:
+        lines += escapeStatements(symbolPositions, inputFormat)
+    lines += [
+        f'        return "\\t".join(({cells},)) + "\\n"',
+        "    return convert",
+        "",
+    ]
+
+    return "\n".join(lines)
+
+
+def getNodeRowConverter(
+    nodeSchema: NodeSchema,
+    storage: str = "row",
+    internId: Callable | None = None,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> Callable:
+    """
+    Returns a function compiled for nodeSchema that turns a raw data line
+    straight into (label, output), without building a Node object. output is
+    the facts line in row storage, and the tuple of the id line followed by
+    one line per property in col storage. The function returns None for rows
+    whose field count differs from the header, which callers must convert
+    through iterNodes instead. Converters of quoted input take the fields
+    split by the csv reader.
+    """
+
+    key = (
+        "node",
+        nodeSchema.getRowPlan(),
+        nodeSchema.getNodeGlobalLabel(),
+        storage,
+        internId is not None,
+        inputFormat.getKey(),
+    )
+    factory = converterCache.get(key)
+    if factory is None:
+        source = generateNodeSource(
+            nodeSchema, storage, internId is not None, inputFormat
+        )
+        factory = compileFactory(source)
+        converterCache[key] = factory
+
+    return factory(internId)
+
+
+def getRelationRowConverter(
+    relationSchema: RelationSchema,
+    internSource: Callable | None = None,
+    internTarget: Callable | None = None,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> Callable:
+    """
+    Returns a function compiled for relationSchema that turns a raw data
+    line straight into its facts line, without building a Relation object.
+    Like node converters, it returns None for rows whose field count differs
+    from the header.
+    """
+
+    internIds = internSource is not None
+    key = (
+        "relation",
+        relationSchema.getRowPlan(),
+        internIds,
+        inputFormat.getKey(),
+    )
+    factory = converterCache.get(key)
+    if factory is None:
+        source = generateRelationSource(relationSchema, internIds, inputFormat)
+        factory = compileFactory(source)
+        converterCache[key] = factory
+
+    return factory(internSource, internTarget)
@@ -0,0 +1,81 @@
+"""
+Module bundling the typed column container behind NodeTable and EdgeTable
+"""
+
+import sys
+from array import array
+from typing import Any, Iterator, List, Sequence
+
+
+class Column:
+    """
+    A contiguous column of values.
+
+    unsigned columns are stored as an array of uint64 and switch to a list
+    of strings the first time a value is not the canonical text of an
+    unsigned integer, e.g. "007" or "+5", so values are always written back
+    exactly as read. symbol columns are lists of interned strings, so
+    repeated values share one string object.
+    """
+
+    def __init__(self, columnType: str):
+        self.type = columnType
+        self.isNumeric = columnType == "unsigned"
+        self.values = array("Q") if self.isNumeric else []
+
+    def append(self, value: str) -> None:
+        if self.isNumeric:
+            try:
+                number = int(value)
+                if str(number) == value:
+                    self.values.append(number)
+                    return
+            except (ValueError, OverflowError):
+                pass
+            self.values = [str(v) for v in self.values]
+            self.isNumeric = False
+
+        self.values.append(sys.intern(value))
+
+    def getText(self, index: int) -> str:
+        return str(self.values[index])
+
+    def iterText(self) -> Iterator[str]:
+        if self.isNumeric:
+            return map(str, self.values)
+
+        return iter(self.values)
+
+    def getTexts(self, indexes: Sequence[int]) -> List[str]:
+        """
+        Returns the text of the values at indexes, selected and converted
+        in bulk rather than one getText call per cell
+        """
+
+        values = map(self.values.__getitem__, indexes)
+        if self.isNumeric:
+            return list(map(str, values))
+
+        return list(values)
+
+    def toNumpy(self) -> Any:
+        """
+        Returns the column as a NumPy array, without copying unsigned values.
+        NumPy is optional and only imported here.
+        """
+
+        try:
+            import numpy
+        except ImportError:
+            raise Exception("Error: numpy is required to export table columns.")
+
+        if self.isNumeric:
+            return numpy.frombuffer(self.values, dtype=numpy.uint64)
+
+        return numpy.array(self.values, dtype=object)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __getitem__(self, index: int) -> Any:
+        return self.values[index]
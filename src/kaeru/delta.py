@@ -0,0 +1,126 @@
+"""
+Module bundling the external sort-merge diff of two snapshots of facts
+"""
+
+import heapq
+import os
+import tempfile
+from typing import Any, Iterator, List
+
+DEFAULT_RUN_SIZE = 1 << 26  # 64 MiB of facts sorted in memory at once
+
+
+def getSortKey(keyFields: int):
+    # facts are ordered by their key fields, then by the whole line, so that
+    # both snapshots agree on the order of lines sharing a key
+    def sortKey(line: bytes):
+        return line.split(b"\t", keyFields)[:keyFields], line
+
+    return sortKey
+
+
+def writeSortedRuns(
+    inputFile: str, keyFields: int, tempPath: str, runSize: int = DEFAULT_RUN_SIZE
+) -> List[str]:
+    """
+    Sorts inputFile in runs of about runSize bytes, each written to a file
+    of its own in tempPath, and returns the paths of the runs
+    """
+
+    sortKey = getSortKey(keyFields)
+    runs = []
+
+    def writeRun(lines: list) -> None:
+        lines.sort(key=sortKey)
+        handle, path = tempfile.mkstemp(suffix=".run", dir=tempPath)
+        with os.fdopen(handle, "wb") as f:
+            f.writelines(lines)
+        runs.append(path)
+
+    with open(inputFile, "rb") as f:
+        lines = []
+        size = 0
+        for line in f:
+            if not line.endswith(b"\n"):
+                line += b"\n"
+            lines.append(line)
+            size += len(line)
+            if size >= runSize:
+                writeRun(lines)
+                lines = []
+                size = 0
+        if lines:
+            writeRun(lines)
+
+    return runs
+
+
+def iterSorted(
+    inputFile: str | None,
+    keyFields: int,
+    tempPath: str,
+    runSize: int = DEFAULT_RUN_SIZE,
+) -> Iterator[bytes]:
+    """
+    Yield the lines of inputFile in key order, merging sorted runs so that
+    memory stays bounded by runSize. A missing file has no lines.
+    """
+
+    if inputFile is None or not os.path.exists(inputFile):
+        return
+
+    runFiles = [
+        open(path, "rb")
+        for path in writeSortedRuns(inputFile, keyFields, tempPath, runSize)
+    ]
+    try:
+        yield from heapq.merge(*runFiles, key=getSortKey(keyFields))
+    finally:
+        for runFile in runFiles:
+            runFile.close()
+            os.remove(runFile.name)
+
+
+def diffSorted(
+    oldLines: Iterator[bytes],
+    newLines: Iterator[bytes],
+    keyFields: int,
+    insertFile: Any,
+    deleteFile: Any,
+) -> tuple:
+    """
+    Merge joins two key ordered streams of facts lines. Lines only found in
+    newLines are written to insertFile and lines only found in oldLines to
+    deleteFile, so a changed row is a delete followed by an insert. Returns
+    the numbers of inserted and deleted lines.
+    """
+
+    sortKey = getSortKey(keyFields)
+    inserted = deleted = 0
+    old = next(oldLines, None)
+    new = next(newLines, None)
+    while old is not None and new is not None:
+        oldKey = sortKey(old)
+        newKey = sortKey(new)
+        if oldKey == newKey:
+            old = next(oldLines, None)
+            new = next(newLines, None)
+        elif oldKey < newKey:
+            deleteFile.write(old)
+            deleted += 1
+            old = next(oldLines, None)
+        else:
+            insertFile.write(new)
+            inserted += 1
+            new = next(newLines, None)
+
+    while old is not None:
+        deleteFile.write(old)
+        deleted += 1
+        old = next(oldLines, None)
+    while new is not None:
+        insertFile.write(new)
+        inserted += 1
+        new = next(newLines, None)
+
+    return inserted, deleted
@@ -0,0 +1,438 @@
+"""
+Module bundling file handling helpers shared by node and relation conversion
+"""
+
+import bz2
+import csv
+import gzip
+import io
+import lzma
+import os
+import tempfile
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List
+
+DEFAULT_MAX_OPEN_FILES = 256
+DEFAULT_BUFFER_SIZE = 1 << 20  # 1 MiB per output handle
+DEFAULT_COMPRESS_LEVEL = 6
+
+# magic bytes of the supported compressed input formats
+COMPRESSION_MAGIC = {
+    b"\x1f\x8b": gzip,
+    b"BZh": bz2,
+    b"\xfd7zXZ\x00": lzma,
+}
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz")
+
+DEFAULT_DELIMITER = "|"
+ARRAY_DELIMITER = ";"  # separator of array elements in facts, as in Neo4j
+
+# tabs and line breaks would break the tab separated facts, so they are
+# replaced by spaces in symbol values
+SYMBOL_ESCAPE_TABLE = str.maketrans("\t\n\r", "   ")
+
+
+def detectCompression(path: str) -> Any:
+    """
+    Returns the stdlib module able to decompress the file at path, or None
+    if the file is not compressed
+    """
+
+    with open(path, "rb") as f:
+        head = f.read(6)
+
+    for magic, module in COMPRESSION_MAGIC.items():
+        if head.startswith(magic):
+            return module
+
+    return None
+
+
+def isCompressed(path: str) -> bool:
+    return detectCompression(path) is not None
+
+
+def openInput(path: str) -> Any:
+    """
+    Open an input data file for reading text, streaming it through the
+    matching decompressor if it is gzip, bz2 or xz compressed
+    """
+
+    module = detectCompression(path)
+    if module is None:
+        return open(path, "r", encoding="utf-8")
+
+    return module.open(path, "rt", encoding="utf-8")
+
+
+def readHeader(inputFile: Any) -> str:
+    """
+    Returns the decoded header line of a text or binary input handle,
+    without its line ending, leaving the handle on the first data row
+    """
+
+    header = inputFile.readline()
+    if isinstance(header, bytes):
+        header = header.decode("utf-8")
+
+    # binary handles keep the \r of \r\n line endings
+    return header.rstrip("\r\n")
+
+
+def stripCompressionSuffix(name: str) -> str:
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+
+    return name
+
+
+class InputFormat:
+    """
+    Describes how the fields of input rows are delimited and quoted.
+
+    Unquoted rows are split with str.split. Quoted rows, such as Neo4j's
+    default comma separated export, go through the C reader of the csv
+    module, which handles delimiters and newlines inside quoted fields.
+    Elements of array properties are rewritten to be separated by
+    ARRAY_DELIMITER in the facts.
+    """
+
+    def __init__(
+        self,
+        delimiter: str = DEFAULT_DELIMITER,
+        quote: str | None = None,
+        arrayDelimiter: str = ARRAY_DELIMITER,
+    ):
+        if len(delimiter) != 1 or delimiter in "\r\n":
+            raise Exception("Error: the delimiter must be a single character.")
+        if quote is not None and (len(quote) != 1 or quote == delimiter):
+            raise Exception("Error: the quote must be a single character.")
+        if len(arrayDelimiter) != 1 or arrayDelimiter == delimiter:
+            raise Exception(
+                "Error: the array delimiter must differ from the delimiter."
+            )
+
+        self.delimiter = delimiter
+        self.quote = quote  # None when fields are never quoted
+        self.arrayDelimiter = arrayDelimiter
+
+    def isQuoted(self) -> bool:
+        return self.quote is not None
+
+    def rewritesArrays(self) -> bool:
+        return self.arrayDelimiter != ARRAY_DELIMITER
+
+    def getKey(self) -> tuple:
+        return (self.delimiter, self.quote, self.arrayDelimiter)
+
+    def iterRows(self, lines: Iterable[str]) -> Iterator[List[str]]:
+        """
+        Yield the fields of every row of lines, a text file or any iterable
+        of lines
+        """
+
+        if self.quote is None:
+            delimiter = self.delimiter
+            return (line.strip("\n").split(delimiter) for line in lines)
+
+        return csv.reader(lines, delimiter=self.delimiter, quotechar=self.quote)
+
+    def splitRow(self, line: str) -> List[str]:
+        return next(self.iterRows([line]), [""])
+
+    def rewriteArray(self, value: str) -> str:
+        return value.replace(self.arrayDelimiter, ARRAY_DELIMITER)
+
+
+DEFAULT_INPUT_FORMAT = InputFormat()
+
+
+class FactFormat:
+    """
+    Describes how facts are laid out on disk, so that declarations and fact
+    writers agree on file names and Souffle IO options. A sharded format
+    names the files of one shard, e.g. Person.3.facts.
+    """
+
+    def __init__(
+        self,
+        compress: bool = False,
+        backend: str = "file",
+        dbname: str | None = None,
+        shard: int | None = None,
+    ):
+        if backend == "sqlite" and compress:
+            raise Exception("Error: compressed facts are not supported by sqlite.")
+        if backend == "sqlite" and shard is not None:
+            raise Exception("Error: sharded facts are not supported by sqlite.")
+
+        self.compress = compress  # gzip facts, loaded with Souffle compress=true
+        self.backend = backend  # "file" for .facts files, "sqlite" for a database
+        self.dbname = dbname  # database file name of the sqlite backend
+        self.shard = shard  # shard number, None when facts are not sharded
+
+    def getFileName(self, relationName: str) -> str:
+        if self.backend == "sqlite":
+            # facts go to the table of the same name
+            return relationName
+
+        if self.shard is not None:
+            relationName = f"{relationName}.{self.shard}"
+
+        if self.compress:
+            return f"{relationName}.facts.gz"
+
+        return f"{relationName}.facts"
+
+    def getInputDirective(self, relationName: str) -> str:
+        if self.backend == "sqlite":
+            return f'.input {relationName}(IO=sqlite, dbname="{self.dbname}")\n'
+
+        fileName = self.getFileName(relationName)
+        if self.compress:
+            return f'.input {relationName}(IO=file, filename="{fileName}", compress=true)\n'
+
+        return f'.input {relationName}(IO=file, filename="{fileName}")\n'
+
+
+DEFAULT_FACT_FORMAT = FactFormat()
+
+
+def getShard(factsLine: str | bytes, shardCount: int, field: int = 0) -> int:
+    """
+    Returns the shard of a facts line, a crc32 hash of one of its fields,
+    so that every run, process and machine agrees on it
+    """
+
+    if isinstance(factsLine, str):
+        factsLine = factsLine.encode("utf-8")
+
+    key = factsLine.rstrip(b"\n").split(b"\t", field + 1)[field]
+
+    return zlib.crc32(key) % shardCount
+
+
+def getUmask() -> int:
+    # the umask can only be read by replacing it
+    umask = os.umask(0)
+    os.umask(umask)
+
+    return umask
+
+
+@contextmanager
+def writeAtomically(path: str, binary: bool = False) -> Iterator[Any]:
+    """
+    Yields a new file that replaces the one at path once fully written, so
+    neither concurrent readers nor a crash ever see half of it. Unlike the
+    owner-only files of mkstemp, it gets the permissions the umask gives any
+    other output.
+    """
+
+    handle, temporary = tempfile.mkstemp(
+        prefix=".tmp-", dir=os.path.dirname(path) or "."
+    )
+    try:
+        os.chmod(temporary, 0o666 & ~getUmask())
+        encoding = None if binary else "utf-8"
+        with os.fdopen(handle, "wb" if binary else "w", encoding=encoding) as f:
+            yield f
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def getFcntl() -> Any:
+    # fcntl only exists on POSIX systems, so it is imported on demand
+    try:
+        import fcntl
+    except ImportError:
+        raise Exception("Error: output file locking needs fcntl (POSIX only).")
+
+    return fcntl
+
+
+def lockFile(outputFile: Any) -> None:
+    # exclusive advisory lock, writers in other processes following the same
+    # protocol wait for it
+    fcntl = getFcntl()
+    fcntl.flock(outputFile.fileno(), fcntl.LOCK_EX)
+
+
+def unlockFile(outputFile: Any) -> None:
+    outputFile.flush()
+    fcntl = getFcntl()
+    fcntl.flock(outputFile.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def lockedDirectory(path: str) -> Iterator[None]:
+    """
+    Holds an exclusive fcntl lock on the directory at path, serialising the
+    read and rewrite of outputs shared by concurrent kaeru processes
+    """
+
+    fcntl = getFcntl()
+    handle = os.open(path, os.O_RDONLY)
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        yield
+    finally:
+        # closing the descriptor releases the lock
+        os.close(handle)
+
+
+def appendLocked(outputFile: Any, data: bytes) -> None:
+    # outputFile must be opened in binary append mode
+    lockFile(outputFile)
+    try:
+        outputFile.write(data)
+    finally:
+        unlockFile(outputFile)
+
+
+class LockedAppendFile:
+    """
+    File-like output handle for facts shared with other processes.
+
+    Writes are buffered in memory and appended to path in whole blocks
+    under an exclusive fcntl lock, so lines written by concurrent kaeru
+    processes are never interleaved. Callers must write whole lines.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        bufferSize: int = DEFAULT_BUFFER_SIZE,
+        compress: bool = False,
+        binary: bool = False,
+    ):
+        getFcntl()
+        self.path = path
+        self.bufferSize = bufferSize
+        self.compress = compress
+        self.binary = binary
+        self.chunks = []
+        self.size = 0
+
+    def write(self, text: str | bytes) -> None:
+        self.chunks.append(text)
+        self.size += len(text)
+        if self.size >= self.bufferSize:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.chunks:
+            return
+
+        if self.binary:
+            data = b"".join(self.chunks)
+        else:
+            data = "".join(self.chunks).encode("utf-8")
+        if self.compress:
+            # every block is a gzip member of its own
+            data = gzip.compress(data, compresslevel=DEFAULT_COMPRESS_LEVEL)
+        self.chunks = []
+        self.size = 0
+
+        with open(self.path, "ab") as outputFile:
+            appendLocked(outputFile, data)
+
+    def close(self) -> None:
+        self.flush()
+
+    def __enter__(self) -> "LockedAppendFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def createEmptyFacts(path: str, compress: bool = False) -> None:
+    # appends nothing, so facts a concurrent writer just created are kept,
+    # and an empty gzip member is still a valid compressed file
+    if os.path.exists(path):
+        return
+
+    if compress:
+        gzip.GzipFile(path, "ab").close()
+    else:
+        open(path, "ab").close()
+
+
+class WriterPool:
+    """
+    A pool of buffered output handles keyed by output path.
+
+    Handles stay open for the whole run instead of being reopened for every
+    row. When more than maxOpenFiles paths are in use, the least recently
+    used handle is flushed and closed, and is transparently reopened in
+    append mode the next time its path is requested. Binary pools hand out
+    handles taking already encoded bytes. Locking pools hand out
+    LockedAppendFile handles, for outputs shared with other processes.
+    """
+
+    def __init__(
+        self,
+        maxOpenFiles: int = DEFAULT_MAX_OPEN_FILES,
+        bufferSize: int = DEFAULT_BUFFER_SIZE,
+        compress: bool = False,
+        binary: bool = False,
+        locking: bool = False,
+    ):
+        if maxOpenFiles < 1:
+            raise Exception("Error: writer pool needs at least one open file.")
+
+        self.maxOpenFiles = maxOpenFiles
+        self.bufferSize = bufferSize
+        self.compress = compress
+        self.binary = binary
+        self.locking = locking
+        self.openFiles = OrderedDict()  # an ordered map of path to file handle
+
+    def getFile(self, path: str) -> Any:
+        outputFile = self.openFiles.get(path)
+        if outputFile is not None:
+            self.openFiles.move_to_end(path)
+            return outputFile
+
+        if len(self.openFiles) >= self.maxOpenFiles:
+            _, evicted = self.openFiles.popitem(last=False)
+            evicted.close()
+
+        if self.locking:
+            outputFile = LockedAppendFile(
+                path, self.bufferSize, self.compress, self.binary
+            )
+        elif self.compress:
+            # every reopen appends a new gzip member, which decompressors
+            # read back as a single stream
+            gzipFile = gzip.GzipFile(path, "ab", compresslevel=DEFAULT_COMPRESS_LEVEL)
+            outputFile = io.BufferedWriter(gzipFile, self.bufferSize)
+            if not self.binary:
+                outputFile = io.TextIOWrapper(outputFile, encoding="utf-8")
+        elif self.binary:
+            outputFile = open(path, "ab", buffering=self.bufferSize)
+        else:
+            outputFile = open(path, "a", encoding="utf-8", buffering=self.bufferSize)
+        self.openFiles[path] = outputFile
+
+        return outputFile
+
+    def write(self, path: str, text: str | bytes) -> None:
+        self.getFile(path).write(text)
+
+    def close(self) -> None:
+        while self.openFiles:
+            _, outputFile = self.openFiles.popitem(last=False)
+            outputFile.close()
+
+    def __enter__(self) -> "WriterPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,152 @@
+"""
+Module bundling the persistent mapping of Neo4j ids to dense unsigned ids
+"""
+
+import heapq
+import mmap
+import os
+from array import array
+from typing import Iterator, Tuple
+
+from kaeru.fileio import writeAtomically
+
+MAGIC = b"KAERUID1"
+HEADER_SIZE = 16  # magic followed by the number of entries as uint64
+ITEM_SIZE = 8
+
+
+def makeKey(group: str, rawId: str) -> bytes:
+    # NUL can not appear in csv text, so it safely separates the two parts
+    return group.encode("utf-8") + b"\x00" + rawId.encode("utf-8")
+
+
+class IdMap:
+    """
+    Maps every (group, raw id) pair to a dense unsigned integer.
+
+    Ids are handed out in order of first appearance and stay stable across
+    runs through a compact file, read through mmap without loading it:
+
+    MAGIC | count | offsets[count + 1] | ids[count] | keys
+
+    Integers are native uint64. offsets locate each key inside the keys
+    blob and keys are sorted, so lookups are a binary search. Pairs seen for
+    the first time are kept in memory until save() merges them into a new
+    file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.added = {}  # a map of key to newly assigned id
+        self.file = None
+        self.buffer = None
+        self.offsets = None
+        self.ids = None
+        self.keysStart = 0
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            self.load()
+
+    def load(self) -> None:
+        self.file = open(self.path, "rb")
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.buffer[:8] != MAGIC:
+            raise Exception(f"Error: {self.path} is not a kaeru id map file.")
+
+        view = memoryview(self.buffer)
+        self.count = view[8:HEADER_SIZE].cast("Q")[0]
+        offsetsEnd = HEADER_SIZE + (self.count + 1) * ITEM_SIZE
+        idsEnd = offsetsEnd + self.count * ITEM_SIZE
+        self.offsets = view[HEADER_SIZE:offsetsEnd].cast("Q")
+        self.ids = view[offsetsEnd:idsEnd].cast("Q")
+        self.keysStart = idsEnd
+
+    def getStoredKey(self, index: int) -> bytes:
+        start = self.keysStart + self.offsets[index]
+        end = self.keysStart + self.offsets[index + 1]
+        return self.buffer[start:end]
+
+    def findStored(self, key: bytes) -> int | None:
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self.getStoredKey(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.count and self.getStoredKey(low) == key:
+            return self.ids[low]
+
+        return None
+
+    def intern(self, group: str, rawId: str) -> int:
+        key = makeKey(group, rawId)
+
+        identifier = self.added.get(key)
+        if identifier is not None:
+            return identifier
+
+        identifier = self.findStored(key)
+        if identifier is not None:
+            return identifier
+
+        identifier = self.count + len(self.added)
+        self.added[key] = identifier
+
+        return identifier
+
+    def __len__(self) -> int:
+        return self.count + len(self.added)
+
+    def iterItems(self) -> Iterator[Tuple[bytes, int]]:
+        stored = ((self.getStoredKey(i), self.ids[i]) for i in range(self.count))
+        added = iter(sorted(self.added.items()))
+
+        return heapq.merge(stored, added)
+
+    def save(self) -> None:
+        """
+        Write stored and newly added pairs to a new file, then atomically
+        replace the old one
+        """
+
+        if not self.added and self.file is not None:
+            return
+
+        total = len(self)
+        # the old file stays mapped until the new one replaced it
+        with writeAtomically(self.path, binary=True) as f:
+            f.write(MAGIC)
+            array("Q", [total]).tofile(f)
+
+            # offsets and ids are fixed size, reserve them and fill in later
+            tableStart = f.tell()
+            f.seek(tableStart + (2 * total + 1) * ITEM_SIZE)
+
+            offsets = array("Q", [0])
+            ids = array("Q")
+            for key, identifier in self.iterItems():
+                f.write(key)
+                offsets.append(offsets[-1] + len(key))
+                ids.append(identifier)
+
+            f.seek(tableStart)
+            offsets.tofile(f)
+            ids.tofile(f)
+
+        self.close()
+        self.added = {}
+        self.load()
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.offsets.release()
+            self.ids.release()
+            self.offsets = None
+            self.ids = None
+            self.buffer.close()
+            self.file.close()
+            self.file = None
+            self.buffer = None
@@ -0,0 +1,81 @@
+"""
+Module bundling the scan of the :LABEL column of node files, reading large
+binary blocks and splitting each row no further than its label field
+"""
+
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from typing import Set
+
+from kaeru.parallel import splitInput
+from kaeru.passthrough import BLOCK_SIZE, iterBlocks
+
+
+def scanLabelBlock(block: bytes, position: int, delimiter: bytes) -> Set[bytes]:
+    # split on \n, \r\n and \r like the text readers of the slow path
+    lines = block.splitlines()
+    try:
+        labels = {
+            line.split(delimiter, position + 1)[position] for line in lines if line
+        }
+    except IndexError:
+        # short rows hold no label
+        labels = set()
+        for line in lines:
+            fields = line.split(delimiter, position + 1)
+            if len(fields) > position:
+                labels.add(fields[position])
+
+    return labels
+
+
+def scanLabelRange(
+    inputFile: str, start: int, end: int, position: int, delimiter: str
+) -> Set[str]:
+    """
+    Returns the distinct values of the field at position over the rows of
+    inputFile in the byte range [start, end)
+    """
+
+    delimiter = delimiter.encode("utf-8")
+    labels = set()
+    if start >= end:
+        return labels
+
+    with open(inputFile, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for block in iterBlocks(buffer, start, end, BLOCK_SIZE):
+                labels |= scanLabelBlock(block, position, delimiter)
+        finally:
+            buffer.close()
+
+    return {label.decode("utf-8") for label in labels}
+
+
+def scanLabels(
+    inputFile: str, position: int, delimiter: str, jobs: int = 1
+) -> Set[str]:
+    """
+    Returns the distinct sub labels of a plain, unquoted node file, whose
+    :LABEL column is at position. With jobs above one, byte ranges of the
+    file are scanned in a pool of processes.
+    """
+
+    _, ranges = splitInput(inputFile, jobs)
+    if jobs <= 1 or len(ranges) <= 1:
+        labels = set()
+        for start, end in ranges:
+            labels |= scanLabelRange(inputFile, start, end, position, delimiter)
+        return labels
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(scanLabelRange, inputFile, start, end, position, delimiter)
+            for start, end in ranges
+        ]
+        labels = set()
+        for future in futures:
+            labels |= future.result()
+
+    return labels
@@ -3,10 +3,22 @@ Module bundling all functions needed to extract Node schema and facts
 """
 
 
-from typing import Set, Mapping, List, Any
+from typing import Set, Mapping, List, Any, Iterable, Iterator, NamedTuple, Tuple
+import os
 import re
 from enum import Enum
 from collections import OrderedDict
+from array import array
+
+from kaeru.columns import Column
+from kaeru.fileio import (
+    DEFAULT_FACT_FORMAT,
+    DEFAULT_INPUT_FORMAT,
+    SYMBOL_ESCAPE_TABLE,
+    FactFormat,
+    InputFormat,
+    WriterPool,
+)
 
 
 # field type
@@ -16,6 +28,15 @@ class NodeType(Enum):
     PROPERTY = 3
 
 
+# precompiled description of one input column
+class FieldPlan(NamedTuple):
+    kind: NodeType
+    name: str | None  # property name, None for id and label columns
+    type: str | None  # souffle type, None for id and label columns
+    nullValue: str | None  # value written for an empty cell
+    isArray: bool = False  # array property, e.g. `tags:string[]`
+
+
 # schema
 class NodeSchema:
     def __init__(self):
@@ -25,19 +46,42 @@ class NodeSchema:
         self.nodeProperty = {}  # a map of tuple (key: position, value : (name, type))
         self.hasSubLabels = False
         self.subLabelsPosition = None
+        self.idGroup = ""  # neo4j id space of the `:ID(Group)` column
+        self.arrayProperties = set()  # positions of array properties
+        self.rowPlan = None  # cached by getRowPlan, reset when entries change
+        self.renamedProperties = {}  # a map of label to its renamed properties
 
     def addEntry(self, position: int, fieldType: NodeType) -> None:
         self.entryToField[position] = fieldType
-
-    def addProperty(self, position: int, propertyName: str, propertyType: str) -> None:
+        self.rowPlan = None
+
+    def addProperty(
+        self,
+        position: int,
+        propertyName: str,
+        propertyType: str,
+        isArray: bool = False,
+    ) -> None:
         self.nodeProperty[position] = (propertyName, propertyType)
+        if isArray:
+            self.arrayProperties.add(position)
+        self.rowPlan = None
+        self.renamedProperties = {}
 
     def addSubLabel(self, label: str) -> None:
-        self.nodeSubLabels.add(label)
+        if label not in self.nodeSubLabels:
+            self.nodeSubLabels.add(label)
+            self.getRenamedPropertyNames(label)
 
     def setGlobalLabel(self, label: str) -> None:
         self.nodeGlobalLabel = label
 
+    def setIdGroup(self, group: str) -> None:
+        self.idGroup = group
+
+    def getIdGroup(self) -> str:
+        return self.idGroup
+
     def setSubLabelPosition(self, position: int) -> None:
         self.hasSubLabels = True
         self.subLabelsPosition = position
@@ -64,6 +108,48 @@ class NodeSchema:
 
         raise Exception(f"property {propertyName} not found in node schema")
 
+    def getRenamedPropertyNames(self, label: str) -> Tuple[str, ...]:
+        """
+        Returns the property names of nodes with the given label, renamed to
+        label + capitalised property name, in column order. Names are built
+        once per label, when the label is first seen.
+        """
+
+        renamed = self.renamedProperties.get(label)
+        if renamed is None:
+            renamed = tuple(
+                label + capfirst(self.nodeProperty[position][0])
+                for position in sorted(self.nodeProperty)
+            )
+            self.renamedProperties[label] = renamed
+
+        return renamed
+
+    def getRowPlan(self) -> Tuple[FieldPlan, ...]:
+        """
+        Returns one immutable FieldPlan per input column, in column order,
+        so row conversion never has to look anything up per cell
+        """
+
+        if self.rowPlan is None:
+            plan = []
+            for position in range(len(self.entryToField)):
+                fieldType = self.entryToField[position]
+                if fieldType == NodeType.PROPERTY:
+                    propertyName, propertyType = self.nodeProperty[position]
+                    nullValue = getNullValue(propertyType)
+                    isArray = position in self.arrayProperties
+                    plan.append(
+                        FieldPlan(
+                            fieldType, propertyName, propertyType, nullValue, isArray
+                        )
+                    )
+                else:
+                    plan.append(FieldPlan(fieldType, None, None, None))
+            self.rowPlan = tuple(plan)
+
+        return self.rowPlan
+
 
 class Node:
     def __init__(self):
@@ -80,6 +166,11 @@ class Node:
     def setProperty(self, propertyName: str, propertyValue: str) -> None:
         self.property[propertyName] = propertyValue
 
+    def setProperties(
+        self, propertyNames: Tuple[str, ...], propertyValues: List[str]
+    ) -> None:
+        self.property = OrderedDict(zip(propertyNames, propertyValues))
+
     def getId(self) -> str:
         return self.id
 
@@ -99,6 +190,70 @@ class Node:
         self.property.pop(propertyName)
 
 
+class NodeTable:
+    """
+    Columnar container of all nodes of a file: one id column, one label
+    code per row and one typed Column per property, in column order. Ids
+    are kept as the strings read.
+    """
+
+    def __init__(self, nodeSchema: NodeSchema):
+        self.schema = nodeSchema
+        self.ids = Column("symbol")
+        self.labelCodes = array("I")
+        self.labelNames = []  # label of each label code
+        self.labelIndex = {}  # a map of label to its label code
+        self.rowIndexes = None  # row indexes of each label code, built lazily
+
+        nodeProperty = nodeSchema.getPropertyNameAndType()
+        positions = sorted(nodeProperty)
+        self.propertyNames = [nodeProperty[position][0] for position in positions]
+        self.columns = [Column(nodeProperty[position][1]) for position in positions]
+
+    def appendRow(self, identifier: str, label: str, propertyValues: List[str]) -> None:
+        labelCode = self.labelIndex.get(label)
+        if labelCode is None:
+            labelCode = len(self.labelNames)
+            self.labelNames.append(label)
+            self.labelIndex[label] = labelCode
+
+        self.ids.append(identifier)
+        self.labelCodes.append(labelCode)
+        self.rowIndexes = None
+        for column, value in zip(self.columns, propertyValues):
+            column.append(value)
+
+    def getIds(self) -> Column:
+        return self.ids
+
+    def getLabel(self, index: int) -> str:
+        return self.labelNames[self.labelCodes[index]]
+
+    def getLabels(self) -> List[str]:
+        return list(self.labelNames)
+
+    def getColumn(self, propertyName: str) -> Column:
+        return self.columns[self.propertyNames.index(propertyName)]
+
+    def getColumns(self) -> List[Column]:
+        return self.columns
+
+    def getRowIndexes(self, label: str) -> Any:
+        if len(self.labelNames) == 1:
+            return range(len(self))
+
+        if self.rowIndexes is None:
+            # one sweep over the label codes serves every label
+            self.rowIndexes = [array("Q") for _ in self.labelNames]
+            for i, code in enumerate(self.labelCodes):
+                self.rowIndexes[code].append(i)
+
+        return self.rowIndexes[self.labelIndex[label]]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
 # --------- Helper functions ---------#
 def mapToSouffleType(propertyType):
     if propertyType == "STRING":
@@ -111,13 +266,28 @@ def mapToSouffleType(propertyType):
         return "symbol"
 
 
+def getNullValue(propertyType: str) -> str:
+    # value can be NULL, if type is string, give "NULL", if type is number, give 0
+    if propertyType == "symbol":
+        return "NULL"
+
+    return "0"
+
+
 def capfirst(s: str) -> str:
     return s[:1].upper() + s[1:]
 
 
-def createNodeSchema(inputFile: Any, label: str | None) -> NodeSchema:
+def createNodeSchema(
+    inputFile: Any,
+    label: str | None,
+    scanSubLabels: bool = True,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> NodeSchema:
     """
-    Returns a node schema object given an input neo4j data file
+    Returns a node schema object given an input neo4j data file.
+    With scanSubLabels set to False only the header is consumed and sub labels
+    are left for the caller to collect, e.g. through iterNodes.
     """
 
     schema = NodeSchema()
@@ -126,7 +296,7 @@ def createNodeSchema(inputFile: Any, label: str | None) -> NodeSchema:
         schema.setGlobalLabel(label)
 
     # read header
-    fileHeader = inputFile.readline().strip("\n").split("|")
+    fileHeader = inputFormat.splitRow(inputFile.readline())
     for position, attribute in enumerate(fileHeader):
         if ":ID" in attribute:
             schema.addEntry(position, NodeType.ID)
@@ -134,6 +304,7 @@ def createNodeSchema(inputFile: Any, label: str | None) -> NodeSchema:
             groupLabel = re.findall("\(([^)]+)\)", attribute)
             if len(groupLabel) == 1:
                 schema.setGlobalLabel(groupLabel[0])
+                schema.setIdGroup(groupLabel[0])
             else:
                 raise Exception("Error: too many (LABEL) found in the input data file")
 
@@ -147,80 +318,158 @@ def createNodeSchema(inputFile: Any, label: str | None) -> NodeSchema:
             schema.addEntry(position, NodeType.PROPERTY)
 
             # get property name and property type
+            isArray = False
             if ":" in attribute:
                 propertyName = attribute.split(":")[0]
                 propertyType = mapToSouffleType(attribute.split(":")[1])
+                isArray = attribute.split(":")[1].endswith("[]")
 
             else:
                 # property type not specified, defaults to int
                 propertyName = attribute
                 propertyType = "unsigned"
 
-            schema.addProperty(position, propertyName, propertyType)
+            schema.addProperty(position, propertyName, propertyType, isArray)
 
-    if schema.hasSubLabels:
+    if schema.hasSubLabels and scanSubLabels:
         # keep scanning data file to collect all sub labels
         labelPos = schema.subLabelsPosition
-        for row in inputFile.readlines():
-            subLabel = row.strip("\n").split("|")[labelPos]
-            schema.addSubLabel(subLabel)
+        for rowData in inputFormat.iterRows(inputFile):
+            # short rows hold no label, conversion rejects them
+            if len(rowData) > labelPos:
+                schema.addSubLabel(rowData[labelPos])
 
     return schema
 
 
-def createNodes(inputFile: Any, nodeSchema: NodeSchema) -> List[Node]:
-    nodeList = []
+def iterNodes(
+    inputFile: Any,
+    nodeSchema: NodeSchema,
+    skipHeader: bool = True,
+    collectSubLabels: bool = False,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> Iterator[Node]:
+    """
+    Lazily yield one node object per data row of an input neo4j data file,
+    so that only a single row is held in memory at a time.
+    With collectSubLabels set, sub labels seen along the way are added to
+    nodeSchema, which lets a single pass produce both facts and schema.
+    """
+
+    if skipHeader:
+        _ = inputFile.readline()
 
-    # skip header
-    _ = inputFile.readline()
+    rows = inputFormat.iterRows(inputFile)
+    yield from iterNodeRows(rows, nodeSchema, collectSubLabels, inputFormat)
+
+
+def iterNodeRows(
+    rows: Iterable[List[str]],
+    nodeSchema: NodeSchema,
+    collectSubLabels: bool = False,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> Iterator[Node]:
+    """
+    Yield one node object per row of already split fields, see iterNodes
+    """
+
+    rowPlan = nodeSchema.getRowPlan()
+    columnCount = len(rowPlan)
+    rewriteArrays = inputFormat.rewritesArrays()
+
+    for rowData in rows:
+        if len(rowData) > columnCount:
+            raise Exception("Error: row has more fields than the file header.")
+        if len(rowData) < columnCount:
+            raise Exception("Error: row has fewer fields than the file header.")
 
-    # loop over rows in the data file
-    for row in inputFile.readlines():
-        rowData = row.strip("\n").split("|")
         node = Node()
+        propertyValues = []
 
-        for position, value in enumerate(rowData):
-            if nodeSchema.getEntryType(position) == NodeType.ID:
+        for field, value in zip(rowPlan, rowData):
+            kind = field.kind
+            if kind is NodeType.PROPERTY:
+                if value == "":
+                    value = field.nullValue
+                elif field.type == "symbol":
+                    # tabs and line breaks would break the tab separated facts
+                    value = value.translate(SYMBOL_ESCAPE_TABLE)
+                    if rewriteArrays and field.isArray:
+                        value = inputFormat.rewriteArray(value)
+                propertyValues.append(value)
+
+            elif kind is NodeType.ID:
                 # value can not be NULL
                 node.setId(value)
 
-            elif nodeSchema.getEntryType(position) == NodeType.LABEL:
+            else:
                 # value can not be NULL
                 node.setLabel(value)
 
-            elif nodeSchema.getEntryType(position) == NodeType.PROPERTY:
-                # get property name from schema
-                # value can be NULL, if type is string, give "NULL", if type is number, give 0
-                # temporary workaround
-                propertyName = nodeSchema.getPropertyName(position)
-                propertyType = nodeSchema.getPropertyType(propertyName)
+        if node.getLabel() == None:
+            node.setLabel(nodeSchema.getNodeGlobalLabel())
+        elif collectSubLabels:
+            nodeSchema.addSubLabel(node.getLabel())
+
+        # properties are named after the node label, names come from the
+        # rename cache of the schema
+        propertyNames = nodeSchema.getRenamedPropertyNames(node.getLabel())
+        node.setProperties(propertyNames, propertyValues)
 
-                if value == "":
-                    if propertyType == "symbol":
-                        value = "NULL"
-                    else:
-                        value = 0
+        yield node
 
-                node.setProperty(propertyName, value)
 
-            else:
-                raise Exception("Error: Unknown Node Type detected.")
+def createNodes(
+    inputFile: Any,
+    nodeSchema: NodeSchema,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> List[Node]:
+    return list(iterNodes(inputFile, nodeSchema, inputFormat=inputFormat))
 
-        if node.getLabel() == None:
-            node.setLabel(nodeSchema.getNodeGlobalLabel())
 
-        nodeLabel = node.getLabel()
-        propertyNameList = node.getPropertyNames()
-        for propertyName in propertyNameList:
-            newPropertyName = nodeLabel + capfirst(propertyName)
-            propertyValue = node.getPropertyValue(propertyName)
-            # remove old property and set newly named property
-            node.removeProperty(propertyName)
-            node.setProperty(newPropertyName, propertyValue)
+def createNodeTable(
+    inputFile: Any,
+    nodeSchema: NodeSchema,
+    skipHeader: bool = True,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> NodeTable:
+    """
+    Returns a columnar node table holding every data row of an input neo4j
+    data file. Rows must have exactly as many fields as the header.
+    """
+
+    if skipHeader:
+        _ = inputFile.readline()
+
+    nodeTable = NodeTable(nodeSchema)
+    rowPlan = nodeSchema.getRowPlan()
+    globalLabel = nodeSchema.getNodeGlobalLabel()
+
+    for rowData in inputFormat.iterRows(inputFile):
+        if len(rowData) > len(rowPlan):
+            raise Exception("Error: row has more fields than the file header.")
+        if len(rowData) < len(rowPlan):
+            raise Exception("Error: row has fewer fields than the file header.")
+
+        identifier = None
+        label = globalLabel
+        propertyValues = []
+        for position, field in enumerate(rowPlan):
+            value = rowData[position]
+            if field.kind is NodeType.PROPERTY:
+                if value and field.type == "symbol":
+                    value = value.translate(SYMBOL_ESCAPE_TABLE)
+                    if field.isArray:
+                        value = inputFormat.rewriteArray(value)
+                propertyValues.append(value or field.nullValue)
+            elif field.kind is NodeType.ID:
+                identifier = value
+            else:
+                label = value
 
-        nodeList.append(node)
+        nodeTable.appendRow(identifier, label, propertyValues)
 
-    return nodeList
+    return nodeTable
 
 
 # ---------- Property rename helper functions ----------#
@@ -230,7 +479,9 @@ def createNodes(inputFile: Any, nodeSchema: NodeSchema) -> List[Node]:
 
 
 def writeColumnBasedNodePropertyDeclHelper(
-    nodeSchema: NodeSchema, outputFile: Any
+    nodeSchema: NodeSchema,
+    outputFile: Any,
+    factFormat: FactFormat = DEFAULT_FACT_FORMAT,
 ) -> None:
     nodeProperty = nodeSchema.getPropertyNameAndType()
     for _, valueTuple in nodeProperty.items():
@@ -246,9 +497,7 @@ def writeColumnBasedNodePropertyDeclHelper(
                 outputFile.write(
                     f".decl {newPropertyName}(id:unsigned, {newPropertyName}:{propertyType})\n"
                 )
-                outputFile.write(
-                    f'.input {newPropertyName}(IO=file, filename="{newPropertyName}.facts")\n'
-                )
+                outputFile.write(factFormat.getInputDirective(newPropertyName))
                 outputFile.write("\n")
 
         elif nodeSchema.getNodeGlobalLabel().lower() not in propertyName.lower():
@@ -259,18 +508,14 @@ def writeColumnBasedNodePropertyDeclHelper(
             outputFile.write(
                 f".decl {nodeLabel}{propertyName}(id:unsigned, {nodeLabel}{propertyName}:{propertyType})\n"
             )
-            outputFile.write(
-                f'.input {nodeLabel}{propertyName}(IO=file, filename="{nodeLabel}{propertyName}.facts")\n'
-            )
+            outputFile.write(factFormat.getInputDirective(nodeLabel + propertyName))
             outputFile.write("\n")
 
         else:
             outputFile.write(
                 f".decl {propertyName}(id:unsigned, {propertyName}:{propertyType})\n"
             )
-            outputFile.write(
-                f'.input {propertyName}(IO=file, filename="{propertyName}.facts")\n'
-            )
+            outputFile.write(factFormat.getInputDirective(propertyName))
             outputFile.write("\n")
 
     return
@@ -304,7 +549,11 @@ def writeColumnBasedNodePropertyUnionDeclHelper(
     return
 
 
-def writeColumnBasedNodeIdDeclHelper(nodeSchema: NodeSchema, outputFile: Any) -> None:
+def writeColumnBasedNodeIdDeclHelper(
+    nodeSchema: NodeSchema,
+    outputFile: Any,
+    factFormat: FactFormat = DEFAULT_FACT_FORMAT,
+) -> None:
     # Node identifier
     if nodeSchema.hasSubLabels:
         nodeLabelSets = nodeSchema.getNodeSubLabels()
@@ -314,7 +563,7 @@ def writeColumnBasedNodeIdDeclHelper(nodeSchema: NodeSchema, outputFile: Any) ->
 
     for label in nodeLabelSets:
         outputFile.write(f".decl {label}(id:unsigned)\n")
-        outputFile.write(f'.input {label}(IO=file, filename="{label}.facts")\n')
+        outputFile.write(factFormat.getInputDirective(label))
         outputFile.write("\n")
 
     # Node group union of identifier
@@ -332,7 +581,11 @@ def writeColumnBasedNodeIdDeclHelper(nodeSchema: NodeSchema, outputFile: Any) ->
 # ------- Output functions ------#
 
 
-def writeColumnBasedNodeDeclaration(nodeSchema: NodeSchema, outputFile: Any) -> None:
+def writeColumnBasedNodeDeclaration(
+    nodeSchema: NodeSchema,
+    outputFile: Any,
+    factFormat: FactFormat = DEFAULT_FACT_FORMAT,
+) -> None:
     """
     Generate column-based Datalog Node schema given Neo4j property graph
     schema and write to a file at filePath.
@@ -345,16 +598,20 @@ def writeColumnBasedNodeDeclaration(nodeSchema: NodeSchema, outputFile: Any) ->
     """
 
     # Node identifier
-    writeColumnBasedNodeIdDeclHelper(nodeSchema, outputFile)
+    writeColumnBasedNodeIdDeclHelper(nodeSchema, outputFile, factFormat)
     # Node property plus property rename
-    writeColumnBasedNodePropertyDeclHelper(nodeSchema, outputFile)
+    writeColumnBasedNodePropertyDeclHelper(nodeSchema, outputFile, factFormat)
     # Add node property union declarations
     writeColumnBasedNodePropertyUnionDeclHelper(nodeSchema, outputFile)
 
     return
 
 
-def writeRowBasedNodeDeclaration(nodeSchema: NodeSchema, outputFile: Any) -> None:
+def writeRowBasedNodeDeclaration(
+    nodeSchema: NodeSchema,
+    outputFile: Any,
+    factFormat: FactFormat = DEFAULT_FACT_FORMAT,
+) -> None:
     """
     Generate row-based Datalog Node schema given Neo4j property graph
     schema and write to a file at filePath
@@ -382,7 +639,7 @@ def writeRowBasedNodeDeclaration(nodeSchema: NodeSchema, outputFile: Any) -> Non
         output += ")\n"
 
         outputFile.write(output)
-        outputFile.write(f'.input {label}(IO=file, filename="{label}.facts")\n')
+        outputFile.write(factFormat.getInputDirective(label))
         outputFile.write("\n")
 
     # Node union sub labels with global labels declaration
@@ -460,3 +717,63 @@ def writeRowBasedNodeFacts(node: Node, nodeSchema: NodeSchema, outputFile: Any)
     outputFile.write(output)
 
     return
+
+
+def writeRowBasedNodeTableFacts(
+    nodeTable: NodeTable,
+    outputPath: str,
+    factFormat: FactFormat = DEFAULT_FACT_FORMAT,
+) -> None:
+    """
+    Generate row-based Datalog Node facts straight from the columns of a
+    node table, one facts file per label in directory outputPath
+    """
+
+    ids = nodeTable.getIds()
+    columns = nodeTable.getColumns()
+
+    with WriterPool(compress=factFormat.compress) as writerPool:
+        for label in nodeTable.getLabels():
+            outputFile = writerPool.getFile(
+                os.path.join(outputPath, factFormat.getFileName(label))
+            )
+            rowIndexes = nodeTable.getRowIndexes(label)
+            cells = [ids.getTexts(rowIndexes)]
+            cells += [column.getTexts(rowIndexes) for column in columns]
+            outputFile.write("\n".join(map("\t".join, zip(*cells))) + "\n")
+
+    return
+
+
+def writeColumnBasedNodeTableFacts(
+    nodeTable: NodeTable,
+    outputPath: str,
+    factFormat: FactFormat = DEFAULT_FACT_FORMAT,
+) -> None:
+    """
+    Generate column-based Datalog Node facts straight from the columns of a
+    node table, writing each column in one sweep per label
+    """
+
+    ids = nodeTable.getIds()
+    nodeSchema = nodeTable.schema
+
+    with WriterPool(compress=factFormat.compress) as writerPool:
+        for label in nodeTable.getLabels():
+            rowIndexes = nodeTable.getRowIndexes(label)
+            labelIds = ids.getTexts(rowIndexes)
+
+            outputFile = writerPool.getFile(
+                os.path.join(outputPath, factFormat.getFileName(label))
+            )
+            outputFile.writelines(identifier + "\n" for identifier in labelIds)
+
+            propertyNames = nodeSchema.getRenamedPropertyNames(label)
+            for propertyName, column in zip(propertyNames, nodeTable.getColumns()):
+                outputFile = writerPool.getFile(
+                    os.path.join(outputPath, factFormat.getFileName(propertyName))
+                )
+                cells = zip(labelIds, column.getTexts(rowIndexes))
+                outputFile.write("\n".join(map("\t".join, cells)) + "\n")
+
+    return
@@ -0,0 +1,146 @@
+"""
+Module bundling helpers to convert a single large input file on several cores
+"""
+
+import io
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, List, Tuple
+
+from kaeru.fileio import lockFile, unlockFile
+from kaeru.sqlitedb import isSqliteDatabase, mergeSqliteDatabase
+
+COPY_BUFFER_SIZE = 1 << 24  # 16 MiB
+
+
+def splitInput(inputFile: str, chunkCount: int) -> Tuple[str, List[Tuple[int, int]]]:
+    """
+    Returns the decoded header line of inputFile, without its line ending,
+    together with a list of (start, end) byte ranges covering the data rows.
+    Every range starts at the beginning of a row and ends right after a
+    newline (or at end of file), so no row is ever split between two chunks.
+    """
+
+    with open(inputFile, "rb") as f:
+        header = f.readline()
+        dataStart = f.tell()
+
+    ranges = splitRange(inputFile, dataStart, os.path.getsize(inputFile), chunkCount)
+
+    return header.decode("utf-8").rstrip("\r\n"), ranges
+
+
+def splitRange(
+    inputFile: str, start: int, end: int, chunkCount: int
+) -> List[Tuple[int, int]]:
+    """
+    Returns a list of (start, end) byte ranges covering the rows of
+    inputFile in [start, end), where start is the beginning of a row and end
+    is right after a newline or the end of file
+    """
+
+    with open(inputFile, "rb") as f:
+        chunkSize = max(1, (end - start) // max(1, chunkCount))
+        ranges = []
+        while start < end:
+            f.seek(min(start + chunkSize, end))
+            # move forward to the next row boundary
+            f.readline()
+            chunkEnd = min(f.tell(), end)
+            ranges.append((start, chunkEnd))
+            start = chunkEnd
+
+    return ranges
+
+
+def iterLines(inputFile: str, start: int, end: int) -> Iterator[str]:
+    """
+    Yield the decoded rows of inputFile lying in the byte range [start, end)
+    """
+
+    with open(inputFile, "rb") as f:
+        f.seek(start)
+        position = start
+        while position < end:
+            line = f.readline()
+            if not line:
+                break
+            position += len(line)
+            text = line.decode("utf-8")
+            if "\r" in text:
+                # split and translate newlines like a text mode file does
+                yield from io.StringIO(text, newline=None)
+            else:
+                yield text
+
+
+def mergeParts(partPath: str, outputPath: str, locking: bool = False) -> None:
+    """
+    Append every part file found in partPath to the file of the same name
+    in outputPath. SQLite databases are merged table by table. With locking
+    set, each part file is appended as a whole under an fcntl lock, for
+    outputs shared with other processes.
+    """
+
+    for name in sorted(os.listdir(partPath)):
+        partFile = os.path.join(partPath, name)
+        if isSqliteDatabase(partFile):
+            mergeSqliteDatabase(partFile, os.path.join(outputPath, name))
+            continue
+
+        with open(partFile, "rb") as src, open(
+            os.path.join(outputPath, name), "ab"
+        ) as dst:
+            if not locking:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+                continue
+
+            lockFile(dst)
+            try:
+                shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+            finally:
+                unlockFile(dst)
+
+
+def runChunks(
+    inputFile: str,
+    outputPath: str,
+    ranges: List[Tuple[int, int]],
+    worker: Callable,
+    workerArgs: Tuple,
+    jobs: int,
+    locking: bool = False,
+) -> List[Any]:
+    """
+    Convert every byte range of inputFile in a pool of jobs processes.
+
+    worker is called as worker(inputFile, start, end, partPath, *workerArgs)
+    and must write its outputs to the private directory partPath. Part files
+    are appended to outputPath in chunk order, so the merged output keeps the
+    row order of the input. The worker results are returned in chunk order.
+    """
+
+    tempPath = tempfile.mkdtemp(prefix=".kaeru-", dir=outputPath)
+    try:
+        partPaths = []
+        for index in range(len(ranges)):
+            partPath = os.path.join(tempPath, str(index))
+            os.mkdir(partPath)
+            partPaths.append(partPath)
+
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(worker, inputFile, start, end, partPath, *workerArgs)
+                for (start, end), partPath in zip(ranges, partPaths)
+            ]
+            results = [future.result() for future in futures]
+
+        for partPath in partPaths:
+            mergeParts(partPath, outputPath, locking)
+
+    finally:
+        shutil.rmtree(tempPath, ignore_errors=True)
+
+    return results
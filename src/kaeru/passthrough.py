@@ -0,0 +1,178 @@
+"""
+Module bundling the passthrough fast path, converting clean row-mode input
+in large binary blocks instead of row by row
+"""
+
+import io
+import mmap
+from functools import lru_cache
+from typing import Any, Callable, Iterator, List
+
+from kaeru.fileio import DEFAULT_INPUT_FORMAT, InputFormat, LockedAppendFile
+from kaeru.node import NodeSchema, NodeType
+from kaeru.relation import RelationSchema, RelationType
+
+BLOCK_SIZE = 1 << 24  # 16 MiB
+SUB_BLOCK_SIZE = 1 << 16  # 64 KiB, granularity of the fallback
+
+
+def canCopyFields(rowPlan: tuple, inputFormat: InputFormat) -> bool:
+    # quoted fields, multibyte delimiters and array elements to rewrite need
+    # the slow path
+    if inputFormat.isQuoted() or len(inputFormat.delimiter.encode("utf-8")) != 1:
+        return False
+
+    return not (inputFormat.rewritesArrays() and any(f.isArray for f in rowPlan))
+
+
+def canPassthroughNodes(
+    nodeSchema: NodeSchema, inputFormat: InputFormat = DEFAULT_INPUT_FORMAT
+) -> bool:
+    """
+    Row-based node facts are the input columns in input order when the id
+    comes first and there is no :LABEL column to route rows on
+    """
+
+    rowPlan = nodeSchema.getRowPlan()
+    return (
+        len(rowPlan) > 0
+        and rowPlan[0].kind == NodeType.ID
+        and all(field.kind == NodeType.PROPERTY for field in rowPlan[1:])
+        and canCopyFields(rowPlan, inputFormat)
+    )
+
+
+def canPassthroughRelations(
+    relationSchema: RelationSchema, inputFormat: InputFormat = DEFAULT_INPUT_FORMAT
+) -> bool:
+    """
+    Relation facts are the input columns in input order when the start and
+    end ids are the first two columns
+    """
+
+    rowPlan = relationSchema.getRowPlan()
+    return (
+        len(rowPlan) > 1
+        and rowPlan[0].kind == RelationType.START_ID
+        and rowPlan[1].kind == RelationType.END_ID
+        and canCopyFields(rowPlan, inputFormat)
+    )
+
+
+@lru_cache(maxsize=None)
+def getLayoutDeletions(delimiter: bytes) -> bytes:
+    # every byte but the delimiter and the newline
+    return bytes(byte for byte in range(256) if byte not in delimiter + b"\n")
+
+
+def isCleanBlock(block: bytes, columnCount: int, delimiter: bytes = b"|") -> bool:
+    """
+    A block can be copied with only the delimiter translated when no field
+    is empty (empty fields need a NULL value) and every row has exactly
+    columnCount fields. All checks run at C speed over the whole block.
+    """
+
+    if block.startswith(delimiter) or delimiter * 2 in block:
+        return False
+    if b"\n" + delimiter in block or delimiter + b"\n" in block:
+        return False
+    if block.endswith(delimiter) or b"\n\n" in block:
+        return False
+    # carriage returns are newlines to the text readers of the slow path, and
+    # tabs in values need to be replaced
+    if b"\r" in block or (delimiter != b"\t" and b"\t" in block):
+        return False
+
+    # stripped of everything but delimiters and newlines, a block of rows of
+    # columnCount fields is the same row layout repeated
+    layout = block.translate(None, getLayoutDeletions(delimiter))
+    if not layout.endswith(b"\n"):
+        layout += b"\n"
+    rowLayout = delimiter * (columnCount - 1) + b"\n"
+
+    return layout == rowLayout * layout.count(b"\n")
+
+
+def iterBlocks(buffer: Any, start: int, end: int, blockSize: int) -> Iterator[bytes]:
+    """
+    Yield consecutive blocks of about blockSize bytes of buffer[start:end],
+    each cut right after a newline
+    """
+
+    position = start
+    while position < end:
+        blockEnd = buffer.find(b"\n", position + blockSize - 1, end)
+        blockEnd = end if blockEnd == -1 else blockEnd + 1
+        yield buffer[position:blockEnd]
+        position = blockEnd
+
+
+def passthroughFile(
+    inputFile: str,
+    start: int,
+    end: int,
+    outputFile: str,
+    columnCount: int,
+    fallback: Callable[[List[str]], None],
+    delimiter: str = "|",
+    locking: bool = False,
+) -> None:
+    """
+    Append the rows of inputFile in the byte range [start, end) to outputFile,
+    swapping the single byte delimiter for tab in large blocks. A block
+    holding empty fields or malformed rows is rechecked in small sub-blocks,
+    and only the dirty sub-blocks are decoded and handed to fallback as a
+    list of lines, split like a text mode file would. fallback must append
+    the conversion of those lines to outputFile itself. With locking set,
+    blocks are appended under an fcntl lock, for outputs shared with other
+    processes.
+    """
+
+    if start >= end:
+        return
+
+    delimiter = delimiter.encode("utf-8")
+    if len(delimiter) != 1:
+        raise Exception("Error: passthrough needs a single byte delimiter.")
+    delimiterTable = bytes.maketrans(delimiter, b"\t")
+
+    if locking:
+        out = LockedAppendFile(outputFile, BLOCK_SIZE, binary=True)
+    else:
+        out = open(outputFile, "ab")
+
+    with open(inputFile, "rb") as f, out:
+
+        def writeClean(block: bytes) -> None:
+            # a single write of whole lines, locked writers may flush after it
+            block = block.translate(delimiterTable)
+            if not block.endswith(b"\n"):
+                block += b"\n"
+            out.write(block)
+
+        def writeDirty(block: bytes) -> None:
+            out.flush()
+            text = block.decode("utf-8")
+            fallback(list(io.StringIO(text, newline=None)))
+
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for block in iterBlocks(buffer, start, end, BLOCK_SIZE):
+                if isCleanBlock(block, columnCount, delimiter):
+                    writeClean(block)
+                    continue
+
+                # consecutive dirty sub-blocks go to fallback in one call
+                dirty = []
+                for subBlock in iterBlocks(block, 0, len(block), SUB_BLOCK_SIZE):
+                    if isCleanBlock(subBlock, columnCount, delimiter):
+                        if dirty:
+                            writeDirty(b"".join(dirty))
+                            dirty = []
+                        writeClean(subBlock)
+                    else:
+                        dirty.append(subBlock)
+                if dirty:
+                    writeDirty(b"".join(dirty))
+        finally:
+            buffer.close()
@@ -3,9 +3,20 @@ Module bundling all functions needed to extract relationship schema and facts
 """
 from enum import Enum
 from collections import OrderedDict
+import os
 import re
 
-from typing import Any, List, Mapping
+from typing import Any, Iterable, Iterator, List, Mapping, NamedTuple, Tuple
+
+from kaeru.columns import Column
+from kaeru.fileio import (
+    DEFAULT_FACT_FORMAT,
+    DEFAULT_INPUT_FORMAT,
+    SYMBOL_ESCAPE_TABLE,
+    FactFormat,
+    InputFormat,
+    WriterPool,
+)
 
 
 # field type
@@ -15,18 +26,40 @@ class RelationType(Enum):
     PROPERTY = 3
 
 
+# precompiled description of one input column
+class FieldPlan(NamedTuple):
+    kind: RelationType
+    name: str | None  # property name, None for start and end id columns
+    type: str | None  # souffle type, None for start and end id columns
+    nullValue: str | None  # value written for an empty cell
+    isArray: bool = False  # array property, e.g. `tags:string[]`
+
+
 class RelationSchema:
     def __init__(self):
         self.entryToField = {}
         self.relationGlobalLabel = None
         self.relationProperty = {}
         self.sourceName = {}  # name/type of start and end node
+        self.idGroup = {}  # neo4j id space of start and end node
+        self.arrayProperties = set()  # positions of array properties
+        self.rowPlan = None  # cached by getRowPlan, reset when entries change
 
     def addEntry(self, position: int, fieldType: RelationType) -> None:
         self.entryToField[position] = fieldType
-
-    def addProperty(self, position: int, propertyName: str, propertyType: str) -> None:
+        self.rowPlan = None
+
+    def addProperty(
+        self,
+        position: int,
+        propertyName: str,
+        propertyType: str,
+        isArray: bool = False,
+    ) -> None:
         self.relationProperty[position] = (propertyName, propertyType)
+        if isArray:
+            self.arrayProperties.add(position)
+        self.rowPlan = None
 
     def setGlobalLabel(self, label: str) -> None:
         self.relationGlobalLabel = label
@@ -46,6 +79,18 @@ class RelationSchema:
     def getTargetName(self) -> str:
         return self.sourceName["target"]
 
+    def setSourceGroup(self, group: str) -> None:
+        self.idGroup["start"] = group
+
+    def setTargetGroup(self, group: str) -> None:
+        self.idGroup["target"] = group
+
+    def getSourceGroup(self) -> str:
+        return self.idGroup.get("start", "")
+
+    def getTargetGroup(self) -> str:
+        return self.idGroup.get("target", "")
+
     def getGlobalLabel(self) -> str:
         return self.relationGlobalLabel
 
@@ -68,6 +113,31 @@ class RelationSchema:
     def getPropertyTypeByPosition(self, position: int) -> str:
         return self.relationProperty[position][1]
 
+    def getRowPlan(self) -> Tuple[FieldPlan, ...]:
+        """
+        Returns one immutable FieldPlan per input column, in column order,
+        so row conversion never has to look anything up per cell
+        """
+
+        if self.rowPlan is None:
+            plan = []
+            for position in range(len(self.entryToField)):
+                fieldType = self.entryToField[position]
+                if fieldType == RelationType.PROPERTY:
+                    propertyName, propertyType = self.relationProperty[position]
+                    nullValue = getNullValue(propertyType)
+                    isArray = position in self.arrayProperties
+                    plan.append(
+                        FieldPlan(
+                            fieldType, propertyName, propertyType, nullValue, isArray
+                        )
+                    )
+                else:
+                    plan.append(FieldPlan(fieldType, None, None, None))
+            self.rowPlan = tuple(plan)
+
+        return self.rowPlan
+
 
 class Relation:
     def __init__(self):
@@ -101,6 +171,54 @@ class Relation:
         return self.property
 
 
+class EdgeTable:
+    """
+    Columnar container of all relations of a file: start and end id columns
+    and one typed Column per property, in column order. Every edge of a
+    file shares the relation label.
+    """
+
+    def __init__(self, relationSchema: RelationSchema):
+        self.schema = relationSchema
+        self.label = relationSchema.getGlobalLabel()
+        # ids are kept as the strings read
+        self.startIds = Column("symbol")
+        self.endIds = Column("symbol")
+
+        positions = sorted(relationSchema.relationProperty)
+        self.propertyNames = [
+            relationSchema.getPropertyName(position) for position in positions
+        ]
+        self.columns = [
+            Column(relationSchema.getPropertyTypeByPosition(position))
+            for position in positions
+        ]
+
+    def appendRow(self, startId: str, endId: str, propertyValues: List[str]) -> None:
+        self.startIds.append(startId)
+        self.endIds.append(endId)
+        for column, value in zip(self.columns, propertyValues):
+            column.append(value)
+
+    def getLabel(self) -> str:
+        return self.label
+
+    def getSourceIds(self) -> Column:
+        return self.startIds
+
+    def getTargetIds(self) -> Column:
+        return self.endIds
+
+    def getColumn(self, propertyName: str) -> Column:
+        return self.columns[self.propertyNames.index(propertyName)]
+
+    def getColumns(self) -> List[Column]:
+        return self.columns
+
+    def __len__(self) -> int:
+        return len(self.startIds)
+
+
 # ------------ functions for creating schema and fact object -------#
 
 
@@ -115,7 +233,23 @@ def mapToSouffleType(propertyType):
         return "symbol"
 
 
-def createRelationSchema(inputFile: Any, label: str | None) -> RelationSchema:
+def getNullValue(propertyType: str) -> str:
+    # Handel Null case:
+    if propertyType == "symbol":
+        return "NULL"
+    elif propertyType == "unsigned":
+        return "0"
+    else:
+        raise Exception(
+            f"Warning: Unknown property type {propertyType} found in relation schema"
+        )
+
+
+def createRelationSchema(
+    inputFile: Any,
+    label: str | None,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> RelationSchema:
     """
     Returns a relation schema object given an Neo4j input relation data file
     """
@@ -128,13 +262,14 @@ def createRelationSchema(inputFile: Any, label: str | None) -> RelationSchema:
         raise Exception("Error: please supply relation label through cli option.")
 
     # Read header from input file
-    fileHeader = inputFile.readline().strip("\n").split("|")
+    fileHeader = inputFormat.splitRow(inputFile.readline())
     for position, attribute in enumerate(fileHeader):
         if "START_ID" in attribute:
             schema.addEntry(position, RelationType.START_ID)
             sourceName = re.findall("\(([^)]+)\)", attribute)
             if len(sourceName) == 1:
                 schema.setSourceName(sourceName[0] + "Id")
+                schema.setSourceGroup(sourceName[0])
             else:
                 schema.setSourceName("startId")
 
@@ -143,76 +278,154 @@ def createRelationSchema(inputFile: Any, label: str | None) -> RelationSchema:
             targetName = re.findall("\(([^)]+)\)", attribute)
             if len(targetName) == 1:
                 schema.setTargetName(targetName[0] + "Id")
+                schema.setTargetGroup(targetName[0])
             else:
-                schema.setSourceName("endId")
+                schema.setTargetName("endId")
 
         else:
             schema.addEntry(position, RelationType.PROPERTY)
             # Get property name and optionally, type
+            isArray = False
             if ":" in attribute:
                 propertyName = attribute.split(":")[0]
                 propertyType = mapToSouffleType(attribute.split(":")[1])
+                isArray = attribute.split(":")[1].endswith("[]")
 
             else:
                 propertyName = attribute
                 propertyType = "unsigned"  # default type set to integer
 
-            schema.addProperty(position, propertyName, propertyType)
+            schema.addProperty(position, propertyName, propertyType, isArray)
 
     return schema
 
 
-def createRelation(inputFile: Any, relationSchema: RelationSchema) -> List[Relation]:
-    relationList = []
+def iterRelations(
+    inputFile: Any,
+    relationSchema: RelationSchema,
+    skipHeader: bool = True,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> Iterator[Relation]:
+    """
+    Lazily yield one relation object per data row of an Neo4j input relation
+    data file, so that only a single edge is held in memory at a time
+    """
+
+    # Skip header, unless the caller already consumed it to build the schema
+    if skipHeader:
+        _ = inputFile.readline()
+
+    rows = inputFormat.iterRows(inputFile)
+    yield from iterRelationRows(rows, relationSchema, inputFormat)
+
+
+def iterRelationRows(
+    rows: Iterable[List[str]],
+    relationSchema: RelationSchema,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> Iterator[Relation]:
+    """
+    Yield one relation object per row of already split fields, see iterRelations
+    """
 
-    # Skip header
-    _ = inputFile.readline()
+    rowPlan = relationSchema.getRowPlan()
+    columnCount = len(rowPlan)
+    rewriteArrays = inputFormat.rewritesArrays()
 
     # Iterate rows
-    for row in inputFile.readlines():
-        rowData = row.strip("\n").split("|")
+    for rowData in rows:
+        if len(rowData) > columnCount:
+            raise Exception("Error: row has more fields than the file header.")
+        if len(rowData) < columnCount:
+            raise Exception("Error: row has fewer fields than the file header.")
+
         relation = Relation()
 
-        for position, value in enumerate(rowData):
-            if relationSchema.getEntryType(position) == RelationType.START_ID:
+        for field, value in zip(rowPlan, rowData):
+            kind = field.kind
+            if kind is RelationType.PROPERTY:
+                if value == "":
+                    value = field.nullValue
+                elif field.type == "symbol":
+                    # tabs and line breaks would break the tab separated facts
+                    value = value.translate(SYMBOL_ESCAPE_TABLE)
+                    if rewriteArrays and field.isArray:
+                        value = inputFormat.rewriteArray(value)
+                relation.setProperty(field.name, value)
+
+            elif kind is RelationType.START_ID:
                 relation.setSourceId(value)
 
-            elif relationSchema.getEntryType(position) == RelationType.END_ID:
+            else:
                 relation.setTargetId(value)
 
-            elif relationSchema.getEntryType(position) == RelationType.PROPERTY:
-                # Get property name
-                propertyName = relationSchema.getPropertyName(position)
-                propertyType = relationSchema.getPropertyTypeByPosition(position)
+        if relation.getLabel() == None:
+            relation.setLabel(relationSchema.getGlobalLabel())
 
-                # Handel Null case:
-                if value == "":
-                    if propertyType == "symbol":
-                        value = "NULL"
-                    elif propertyType == "unsigned":
-                        value = 0
-                    else:
-                        raise Exception(
-                            f"Warning: Unknown property type {propertyType} found in relation schema"
-                        )
+        yield relation
 
-                relation.setProperty(propertyName, value)
 
-            else:
-                raise Exception("Error: Unknown Relation Type detected.")
+def createRelation(
+    inputFile: Any,
+    relationSchema: RelationSchema,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> List[Relation]:
+    return list(iterRelations(inputFile, relationSchema, inputFormat=inputFormat))
 
-        if relation.getLabel() == None:
-            relation.setLabel(relationSchema.getGlobalLabel())
 
-        relationList.append(relation)
+def createEdgeTable(
+    inputFile: Any,
+    relationSchema: RelationSchema,
+    skipHeader: bool = True,
+    inputFormat: InputFormat = DEFAULT_INPUT_FORMAT,
+) -> EdgeTable:
+    """
+    Returns a columnar edge table holding every data row of an Neo4j input
+    relation data file. Rows must have exactly as many fields as the
+    header.
+    """
 
-    return relationList
+    if skipHeader:
+        _ = inputFile.readline()
+
+    edgeTable = EdgeTable(relationSchema)
+    rowPlan = relationSchema.getRowPlan()
+
+    for rowData in inputFormat.iterRows(inputFile):
+        if len(rowData) > len(rowPlan):
+            raise Exception("Error: row has more fields than the file header.")
+        if len(rowData) < len(rowPlan):
+            raise Exception("Error: row has fewer fields than the file header.")
+
+        startId = None
+        endId = None
+        propertyValues = []
+        for position, field in enumerate(rowPlan):
+            value = rowData[position]
+            if field.kind is RelationType.PROPERTY:
+                if value and field.type == "symbol":
+                    value = value.translate(SYMBOL_ESCAPE_TABLE)
+                    if field.isArray:
+                        value = inputFormat.rewriteArray(value)
+                propertyValues.append(value or field.nullValue)
+            elif field.kind is RelationType.START_ID:
+                startId = value
+            else:
+                endId = value
+
+        edgeTable.appendRow(startId, endId, propertyValues)
+
+    return edgeTable
 
 
 # ----------- functions for writing relation declarations and facts ------#
 
 
-def writeRelationDeclation(relationSchema: RelationSchema, outputFile: Any) -> None:
+def writeRelationDeclation(
+    relationSchema: RelationSchema,
+    outputFile: Any,
+    factFormat: FactFormat = DEFAULT_FACT_FORMAT,
+) -> None:
     """
     Write Datalog equivalent relation declaration to outputFile given a relation schema object
     """
@@ -237,7 +450,7 @@ def writeRelationDeclation(relationSchema: RelationSchema, outputFile: Any) -> N
             output += f", {propertyName}:{propertyType}"
 
     output += ")\n"
-    output += f'.input {globalLabel}(IO=file, filename="{globalLabel}.facts")\n'
+    output += factFormat.getInputDirective(globalLabel)
 
     outputFile.write(output)
 
@@ -267,3 +480,27 @@ def writeRelationFacts(relation: Relation, outputFile: Any) -> None:
     outputFile.write(output)
 
     return
+
+
+def writeRelationTableFacts(
+    edgeTable: EdgeTable,
+    outputPath: str,
+    factFormat: FactFormat = DEFAULT_FACT_FORMAT,
+) -> None:
+    """
+    Write Datalog relation facts straight from the columns of an edge table
+    to the facts file of its label in directory outputPath
+    """
+
+    columns = [edgeTable.getSourceIds(), edgeTable.getTargetIds()]
+    columns += edgeTable.getColumns()
+    label = edgeTable.getLabel()
+
+    with WriterPool(compress=factFormat.compress) as writerPool:
+        outputFile = writerPool.getFile(
+            os.path.join(outputPath, factFormat.getFileName(label))
+        )
+        rows = zip(*(column.iterText() for column in columns))
+        outputFile.writelines("\t".join(cells) + "\n" for cells in rows)
+
+    return
@@ -0,0 +1,96 @@
+"""
+Module bundling the schema sidecars written next to declarations, so that
+later runs rebuild a schema without rescanning its input file
+"""
+
+import hashlib
+import json
+import os
+
+from kaeru.fileio import openInput, readHeader, writeAtomically
+
+SIDECAR_VERSION = 1
+
+
+def getSidecarFile(outputPath: str, label: str) -> str:
+    return os.path.join(outputPath, f"{label}_schema.json")
+
+
+def getInputStamp(inputFile: str, header: str) -> dict:
+    stat = os.stat(inputFile)
+    return {
+        "headerHash": hashlib.sha256(header.encode("utf-8")).hexdigest(),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+    }
+
+
+def writeSidecar(
+    sidecarFile: str,
+    inputFile: str,
+    header: str,
+    options: dict,
+    subLabels: set | None = None,
+) -> None:
+    """
+    Records what a schema is made of: the header it was parsed from, the
+    options it was parsed with and the sub labels found in the data rows,
+    stamped with the header hash, size and mtime of inputFile
+    """
+
+    data = {
+        "version": SIDECAR_VERSION,
+        "input": getInputStamp(inputFile, header),
+        "options": options,
+        "header": header,
+        "subLabels": sorted(subLabels or []),
+    }
+    writeSidecarData(sidecarFile, data)
+
+
+def writeSidecarData(sidecarFile: str, data: dict) -> None:
+    with writeAtomically(sidecarFile) as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+
+def readSidecarData(sidecarFile: str, options: dict) -> dict | None:
+    """
+    Returns the content of sidecarFile if it was written by this version of
+    kaeru with options, whatever input it describes, else None
+    """
+
+    try:
+        with open(sidecarFile, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if data.get("version") != SIDECAR_VERSION or data.get("options") != options:
+        return None
+
+    return data
+
+
+def readSidecar(sidecarFile: str, inputFile: str, options: dict) -> dict | None:
+    """
+    Returns the content of sidecarFile if it still describes inputFile read
+    with options, else None. Size and mtime are checked first, so a stale
+    sidecar costs a stat and an unchanged one the read of the header line.
+    """
+
+    data = readSidecarData(sidecarFile, options)
+    if data is None:
+        return None
+
+    stat = os.stat(inputFile)
+    stamp = data["input"]
+    if stamp["size"] != stat.st_size or stamp["mtime"] != stat.st_mtime_ns:
+        return None
+
+    with openInput(inputFile) as f:
+        header = readHeader(f)
+    if getInputStamp(inputFile, header) != stamp or header != data["header"]:
+        return None
+
+    return data
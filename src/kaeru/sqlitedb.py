@@ -0,0 +1,183 @@
+"""
+Module bundling the SQLite output backend, loaded by Souffle with IO=sqlite
+"""
+
+import os
+import sqlite3
+from typing import Any, List
+
+DEFAULT_DBNAME = "kaeru.db"
+DEFAULT_BATCH_SIZE = 100000  # rows buffered per table before a bulk insert
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+
+def isSqliteDatabase(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+
+
+def quoteName(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def createTable(connection: Any, tableName: str, columnCount: int) -> None:
+    # Souffle reads columns by position, their names do not matter
+    columns = ", ".join(f"c{i}" for i in range(columnCount))
+    connection.execute(f"CREATE TABLE IF NOT EXISTS {quoteName(tableName)} ({columns})")
+
+
+def createIndexes(connection: Any, tableName: str, keyColumns: int) -> None:
+    # one index per key column, node ids or relationship start and end ids,
+    # built once the table is loaded
+    table = quoteName(tableName)
+    for i in range(keyColumns):
+        index = quoteName(f"{tableName}_c{i}")
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} (c{i})")
+
+
+def connect(path: str) -> Any:
+    connection = sqlite3.connect(path)
+    # bulk load: no rollback journal and no fsync, the file is rebuilt on failure
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+
+    return connection
+
+
+class SqliteTableWriter:
+    """
+    File-like writer turning tab separated facts lines into rows of a
+    SQLite table, inserted with executemany in large batches
+    """
+
+    def __init__(
+        self, connection: Any, tableName: str, batchSize: int, keyColumns: int = 1
+    ):
+        self.connection = connection
+        self.tableName = tableName
+        self.batchSize = batchSize
+        self.keyColumns = keyColumns  # leading columns indexed on close
+        self.columnCount = 0
+        self.rows = []
+        self.insertStatement = None
+
+    def write(self, text: str) -> None:
+        for line in text.rstrip("\n").split("\n"):
+            self.rows.append(line.split("\t"))
+
+        if len(self.rows) >= self.batchSize:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self.rows:
+            return
+
+        if self.insertStatement is None:
+            self.columnCount = len(self.rows[0])
+            createTable(self.connection, self.tableName, self.columnCount)
+            placeholders = ", ".join("?" * self.columnCount)
+            self.insertStatement = (
+                f"INSERT INTO {quoteName(self.tableName)} VALUES ({placeholders})"
+            )
+
+        self.connection.executemany(self.insertStatement, self.rows)
+        self.rows = []
+
+    def close(self) -> None:
+        self.flush()
+        if self.insertStatement is not None:
+            keyColumns = min(self.keyColumns, self.columnCount)
+            createIndexes(self.connection, self.tableName, keyColumns)
+
+
+class SqliteWriterPool:
+    """
+    Drop-in replacement of WriterPool writing every facts file into one
+    SQLite database. The table name is the base name of the requested path.
+    All rows of a run are inserted in a single transaction, then the first
+    keyColumns columns of every table are indexed.
+    """
+
+    def __init__(
+        self,
+        databaseFile: str,
+        batchSize: int = DEFAULT_BATCH_SIZE,
+        keyColumns: int = 1,
+    ):
+        self.connection = connect(databaseFile)
+        self.batchSize = batchSize
+        self.keyColumns = keyColumns
+        self.tables = {}  # a map of table name to its writer
+
+    def getFile(self, path: str) -> SqliteTableWriter:
+        tableName = os.path.basename(path)
+        writer = self.tables.get(tableName)
+        if writer is None:
+            writer = SqliteTableWriter(
+                self.connection, tableName, self.batchSize, self.keyColumns
+            )
+            self.tables[tableName] = writer
+
+        return writer
+
+    def write(self, path: str, text: str) -> None:
+        self.getFile(path).write(text)
+
+    def close(self) -> None:
+        for writer in self.tables.values():
+            writer.close()
+        self.connection.commit()
+        self.connection.close()
+        self.tables = {}
+
+    def __enter__(self) -> "SqliteWriterPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def getTableNames(connection: Any, schema: str = "main") -> List[str]:
+    cursor = connection.execute(
+        f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'"
+    )
+
+    return [row[0] for row in cursor]
+
+
+def getIndexes(connection: Any, schema: str = "main") -> dict:
+    # a map of index name to the statement creating it
+    cursor = connection.execute(
+        f"SELECT name, sql FROM {schema}.sqlite_master WHERE type = 'index'"
+    )
+
+    return dict(cursor.fetchall())
+
+
+def mergeSqliteDatabase(sourceFile: str, targetFile: str) -> None:
+    """
+    Append every table of the database sourceFile to the table of the same
+    name in targetFile, creating missing tables along with their indexes
+    """
+
+    connection = connect(targetFile)
+    connection.execute("ATTACH DATABASE ? AS source", (sourceFile,))
+
+    existingTables = set(getTableNames(connection))
+    for tableName in getTableNames(connection, "source"):
+        table = quoteName(tableName)
+        if tableName not in existingTables:
+            connection.execute(f"CREATE TABLE {table} AS SELECT * FROM source.{table}")
+        else:
+            connection.execute(f"INSERT INTO {table} SELECT * FROM source.{table}")
+
+    # CREATE TABLE AS SELECT copies no index
+    existingIndexes = getIndexes(connection)
+    for indexName, statement in getIndexes(connection, "source").items():
+        if indexName not in existingIndexes and statement is not None:
+            connection.execute(statement)
+
+    connection.commit()
+    connection.execute("DETACH DATABASE source")
+    connection.close()
@@ -0,0 +1,98 @@
+"""
+Module bundling the watermarks of incremental conversions of append-only inputs
+"""
+
+import hashlib
+import json
+import mmap
+import os
+
+from kaeru.fileio import writeAtomically
+
+
+def hashHeader(header: str) -> str:
+    return hashlib.sha256(header.encode("utf-8")).hexdigest()
+
+
+def findCompleteEnd(inputFile: str, start: int) -> int:
+    """
+    Returns the offset right after the last newline of inputFile past start,
+    or start if there is none. A row still being appended is left for the
+    next run.
+    """
+
+    fileSize = os.path.getsize(inputFile)
+    if fileSize <= start:
+        return start
+
+    with open(inputFile, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            position = buffer.rfind(b"\n", start, fileSize)
+        finally:
+            buffer.close()
+
+    return start if position == -1 else position + 1
+
+
+class Watermark:
+    """
+    Records how far an input file has been converted. The offset is only
+    trusted while the file keeps its inode, its header and the conversion
+    options, and has not shrunk below it.
+    """
+
+    def __init__(
+        self,
+        offset: int,
+        headerHash: str,
+        inode: int,
+        options: dict,
+        subLabels: list | None = None,
+        outputs: list | None = None,
+    ):
+        self.offset = offset  # byte offset of the first row not converted yet
+        self.headerHash = headerHash
+        self.inode = inode
+        self.options = options  # conversion options the outputs were written with
+        self.subLabels = subLabels or []  # node sub labels seen so far
+        self.outputs = outputs or []  # names of the files written so far
+
+    def matches(self, inputFile: str, headerHash: str, options: dict) -> bool:
+        stat = os.stat(inputFile)
+        return (
+            stat.st_ino == self.inode
+            and stat.st_size >= self.offset
+            and headerHash == self.headerHash
+            and options == self.options
+        )
+
+    def save(self, path: str) -> None:
+        data = {
+            "offset": self.offset,
+            "headerHash": self.headerHash,
+            "inode": self.inode,
+            "options": self.options,
+            "subLabels": sorted(self.subLabels),
+            "outputs": sorted(self.outputs),
+        }
+        with writeAtomically(path) as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+
+
+def readWatermark(path: str) -> Watermark | None:
+    if not os.path.exists(path):
+        return None
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    return Watermark(
+        data["offset"],
+        data["headerHash"],
+        data["inode"],
+        data["options"],
+        data.get("subLabels"),
+        data.get("outputs"),
+    )
@@ -0,0 +1,44 @@
+"""
+Testing the discovery of batch entries
+"""
+
+import json
+
+import pytest
+
+from kaeru.batch import discoverEntries, readManifest
+
+NODE_HEADER = "id:ID(Person)|name:STRING\n1|alice\n"
+
+
+def test_discover_entries_rejects_duplicate_labels(tmp_path):
+    (tmp_path / "person.csv").write_text(NODE_HEADER)
+    (tmp_path / "person.v2.csv").write_text(NODE_HEADER)
+
+    with pytest.raises(Exception, match="both have label person"):
+        discoverEntries(str(tmp_path))
+
+
+def test_read_manifest_rejects_duplicate_labels(tmp_path):
+    (tmp_path / "a.csv").write_text(NODE_HEADER)
+    (tmp_path / "b.csv").write_text(NODE_HEADER)
+    manifest = tmp_path / "manifest.json"
+    manifest.write_text(
+        json.dumps(
+            [{"file": "a.csv", "label": "Person"}, {"file": "b.csv", "label": "Person"}]
+        )
+    )
+
+    with pytest.raises(Exception, match="both have label Person"):
+        readManifest(str(manifest))
+
+
+def test_discover_entries_labels_files(tmp_path):
+    (tmp_path / "person.csv").write_text(NODE_HEADER)
+    (tmp_path / "knows.csv").write_text(":START_ID|:END_ID\n1|2\n")
+
+    entries = discoverEntries(str(tmp_path))
+    assert [(e.command, e.label) for e in entries] == [
+        ("relation", "knows"),
+        ("node", "person"),
+    ]
@@ -0,0 +1,697 @@
+"""
+Testing whole conversions driven by command line arguments
+"""
+
+import bz2
+import gzip
+import io
+import json
+import lzma
+import os
+import re
+import sqlite3
+
+import pytest
+
+from kaeru import cli_utils, node
+from kaeru.cli import get_parser
+from kaeru.cli_utils import node_processing_pipeline, relation_processing_pipeline
+from kaeru.fileio import getShard
+from kaeru.node import createNodeSchema, writeRowBasedNodeDeclaration
+
+
+def runKaeru(*argv):
+    args = get_parser().parse_args([str(arg) for arg in argv])
+    if args.command == "node":
+        node_processing_pipeline(args)
+    else:
+        relation_processing_pipeline(args)
+
+
+def readOutput(outputPath, name):
+    return (outputPath / name).read_text(encoding="utf-8")
+
+
+def test_crlf_header_types(tmp_path):
+    (tmp_path / "q.csv").write_bytes(b"id:ID(Q)|name:STRING|a:INT\r\n1|x|3\r\n")
+
+    # passthrough, parallel and incremental runs all read the header raw
+    runs = ([], ["-j", "2"], ["--incremental"])
+    for index, options in enumerate(runs):
+        outputPath = tmp_path / f"out{index}"
+        outputPath.mkdir()
+        runKaeru(
+            "node",
+            "-t",
+            "all",
+            "-l",
+            "Q",
+            "-f",
+            "q.csv",
+            "-d",
+            tmp_path,
+            "-o",
+            outputPath,
+            *options,
+        )
+
+        declaration = readOutput(outputPath, "Q_decl.txt")
+        assert ".decl Q(id:unsigned, name:symbol, a:unsigned)" in declaration
+        assert readOutput(outputPath, "Q.facts") == "1\tx\t3\n"
+
+
+def test_lock_merges_partition_sub_labels(tmp_path):
+    header = "id:ID(P)|:LABEL|name:STRING\n"
+    (tmp_path / "p0.csv").write_text(header + "1|A|x\n", encoding="utf-8")
+    (tmp_path / "p1.csv").write_text(header + "2|B|y\n", encoding="utf-8")
+
+    # partitions converted directly and through the cache share a declaration
+    for options in ([], ["--cache", tmp_path / "cache"]):
+        outputPath = tmp_path / f"out{len(options)}"
+        outputPath.mkdir()
+        for file in ("p0.csv", "p1.csv"):
+            runKaeru(
+                "node",
+                "-t",
+                "all",
+                "-l",
+                "P",
+                "-f",
+                file,
+                "-d",
+                tmp_path,
+                "-o",
+                outputPath,
+                "--lock",
+                *options,
+            )
+
+        declaration = readOutput(outputPath, "P_decl.txt")
+        assert "P(id, name):- A(id, name)." in declaration
+        assert "P(id, name):- B(id, name)." in declaration
+        assert readOutput(outputPath, "A.facts") == "1\tx\n"
+        assert readOutput(outputPath, "B.facts") == "2\ty\n"
+
+
+def test_lock_rejects_id_map(tmp_path):
+    (tmp_path / "p.csv").write_text("id:ID(P)|name:STRING\n1|x\n", encoding="utf-8")
+
+    with pytest.raises(Exception, match="--lock can not be used with --id-map"):
+        runKaeru(
+            "node",
+            "-t",
+            "fact",
+            "-l",
+            "P",
+            "-f",
+            "p.csv",
+            "-d",
+            tmp_path,
+            "-o",
+            tmp_path,
+            "--lock",
+            "--id-map",
+            tmp_path / "ids.map",
+        )
+
+
+def test_cache_skips_applied_outputs(tmp_path):
+    header = "id:ID(Person)|:LABEL\n"
+    (tmp_path / "a.csv").write_text(header + "1|Student\n", encoding="utf-8")
+    (tmp_path / "b.csv").write_text(header + "2|Student\n", encoding="utf-8")
+    cachePath = tmp_path / "cache"
+
+    # both inputs append to Student.facts, which never matches either cache
+    # entry, nor does the SQLite database merging the tables of both inputs
+    for options in ([], ["--backend", "sqlite"]):
+        outputPath = tmp_path / f"out{len(options)}"
+        outputPath.mkdir()
+        for _ in range(3):
+            for label, file in (("A", "a.csv"), ("B", "b.csv")):
+                runKaeru(
+                    "node",
+                    "-t",
+                    "all",
+                    "-l",
+                    label,
+                    "-f",
+                    file,
+                    "-d",
+                    tmp_path,
+                    "-o",
+                    outputPath,
+                    "--cache",
+                    cachePath,
+                    *options,
+                )
+
+        if options:
+            database = sqlite3.connect(outputPath / "kaeru.db")
+            rows = database.execute('SELECT * FROM "Student"').fetchall()
+            database.close()
+            assert sorted(rows) == [("1",), ("2",)]
+        else:
+            assert readOutput(outputPath, "Student.facts") == "1\n2\n"
+
+
+def test_cache_restores_outputs(tmp_path, monkeypatch):
+    (tmp_path / "p.csv").write_text(
+        "id:ID(Person)|name:STRING|:LABEL\n1|x|Student\n", encoding="utf-8"
+    )
+    argv = ["node", "-t", "all", "-l", "P", "-f", "p.csv", "-d", tmp_path]
+    argv += ["--cache", tmp_path / "cache"]
+
+    first = tmp_path / "first"
+    first.mkdir()
+    runKaeru(*argv, "-o", first)
+
+    # a fresh output directory gets the cached outputs without a conversion
+    def convert(input_path, output_path, args):
+        raise AssertionError("converted instead of restored")
+
+    monkeypatch.setattr(cli_utils, "node_all_process", convert)
+    second = tmp_path / "second"
+    second.mkdir()
+    runKaeru(*argv, "-o", second)
+
+    for name in ("P_decl.txt", "P_schema.json", "Student.facts"):
+        assert readOutput(second, name) == readOutput(first, name)
+
+
+def runIncremental(tmp_path, label, file, command="node", *options):
+    runKaeru(
+        command,
+        "-t",
+        "all",
+        "-l",
+        label,
+        "-f",
+        file,
+        "-d",
+        tmp_path,
+        "-o",
+        tmp_path / "out",
+        "--incremental",
+        *options,
+    )
+
+
+def test_incremental_resumes_after_complete_rows(tmp_path):
+    (tmp_path / "out").mkdir()
+    inputFile = tmp_path / "p.csv"
+    inputFile.write_text("id:ID(P)|:LABEL\n1|Student\n2|Stu", encoding="utf-8")
+
+    # the row without a trailing newline waits for the next run
+    runIncremental(tmp_path, "P", "p.csv")
+    assert readOutput(tmp_path / "out", "Student.facts") == "1\n"
+
+    with open(inputFile, "a", encoding="utf-8") as f:
+        f.write("dent\n3|Teacher\n")
+    runIncremental(tmp_path, "P", "p.csv")
+    runIncremental(tmp_path, "P", "p.csv")
+    assert readOutput(tmp_path / "out", "Student.facts") == "1\n2\n"
+    assert readOutput(tmp_path / "out", "Teacher.facts") == "3\n"
+    assert "P(id):- Teacher(id)." in readOutput(tmp_path / "out", "P_decl.txt")
+
+
+def test_incremental_restart_keeps_shared_facts(tmp_path):
+    (tmp_path / "out").mkdir()
+    (tmp_path / "a.csv").write_text("id:ID(A)|:LABEL\n1|Student\n", encoding="utf-8")
+    (tmp_path / "b.csv").write_text("id:ID(B)|:LABEL\n2|Student\n", encoding="utf-8")
+    runIncremental(tmp_path, "A", "a.csv")
+    runIncremental(tmp_path, "B", "b.csv")
+
+    # a rewritten input never deletes facts other inputs appended to
+    (tmp_path / "a.csv").write_text("id:ID(A)|:LABEL|x:INT\n5|Student|1\n")
+    with pytest.raises(Exception, match="remove Student.facts"):
+        runIncremental(tmp_path, "A", "a.csv")
+    assert readOutput(tmp_path / "out", "Student.facts") == "1\n2\n"
+
+    # once the user removed them, the input is converted from the start
+    (tmp_path / "out" / "Student.facts").unlink()
+    runIncremental(tmp_path, "A", "a.csv")
+    assert readOutput(tmp_path / "out", "Student.facts") == "5\t1\n"
+
+
+def test_incremental_replaced_input_starts_over(tmp_path):
+    (tmp_path / "out").mkdir()
+    (tmp_path / "p.csv").write_text("id:ID(P)|:LABEL\n1|Student\n")
+    runIncremental(tmp_path, "P", "p.csv")
+
+    # same header and a longer file, but a new inode: the offset is unusable
+    (tmp_path / "q.csv").write_text("id:ID(P)|:LABEL\n7|Student\n8|Student\n")
+    os.replace(tmp_path / "q.csv", tmp_path / "p.csv")
+    with pytest.raises(Exception, match="p.csv changed since its last"):
+        runIncremental(tmp_path, "P", "p.csv")
+
+    (tmp_path / "out" / "Student.facts").unlink()
+    runIncremental(tmp_path, "P", "p.csv")
+    assert readOutput(tmp_path / "out", "Student.facts") == "7\n8\n"
+
+
+@pytest.mark.parametrize(
+    "command, header",
+    [
+        ("node", "id:ID(P)|name:STRING|:LABEL"),
+        ("relation", ":START_ID(P)|:END_ID(P)|name:STRING"),
+    ],
+)
+def test_incremental_appends_match_full_run(tmp_path, command, header):
+    (tmp_path / "out").mkdir()
+    inputFile = tmp_path / "p.csv"
+    rows = [f"{i}|{i + 1}|Student" if i % 3 else f"{i}|x|Teacher" for i in range(60)]
+    inputFile.write_text(header + "\n")
+
+    # rows arrive in batches converted in parallel chunks, ending mid-row
+    text = "".join(row + "\n" for row in rows)
+    written = 0
+    for end in (0, 100, 101, 350, len(text)):
+        with open(inputFile, "a", encoding="utf-8") as f:
+            f.write(text[written:end])
+        written = end
+        runIncremental(tmp_path, "P", "p.csv", command, "-j", "2")
+
+    (tmp_path / "full").mkdir()
+    runKaeru(
+        command,
+        "-t",
+        "all",
+        "-l",
+        "P",
+        "-f",
+        "p.csv",
+        "-d",
+        tmp_path,
+        "-o",
+        tmp_path / "full",
+    )
+
+    # chunks append in any order, and sub labels are declared in set order
+    incremental = readOutputs(tmp_path / "out")
+    for name, text in readOutputs(tmp_path / "full").items():
+        if name.endswith(".facts"):
+            separator = "\n"
+        elif name.endswith("_decl.txt"):
+            separator = "\n\n"
+        else:
+            continue
+        assert sorted(incremental[name].split(separator)) == sorted(
+            text.split(separator)
+        )
+
+
+def runDiff(tmp_path, command, label, *options):
+    runKaeru(
+        command,
+        "-t",
+        "diff",
+        "-l",
+        label,
+        "-f",
+        "new.csv",
+        "--previous",
+        "old.csv",
+        "-d",
+        tmp_path,
+        "-o",
+        tmp_path,
+        *options,
+    )
+
+
+def test_diff_declares_every_delta(tmp_path):
+    header = "id:ID(City)|cityName:STRING|:LABEL\n"
+    (tmp_path / "old.csv").write_text(header + "1|a|Town\n2|b|Town\n")
+    (tmp_path / "new.csv").write_text(header + "1|a|Town\n2|c|Town\n3|d|Village\n")
+
+    # row storage, one relation per sub label
+    runDiff(tmp_path, "node", "City")
+    declaration = readOutput(tmp_path, "City_delta_decl.txt")
+    assert ".decl Town_insert(id:unsigned, cityName:symbol)" in declaration
+    assert ".decl Village_delete(id:unsigned, cityName:symbol)" in declaration
+    assert readOutput(tmp_path, "Town_insert.facts") == "2\tc\n"
+    assert readOutput(tmp_path, "Town_delete.facts") == "2\tb\n"
+    assert readOutput(tmp_path, "Village_insert.facts") == "3\td\n"
+
+    # column storage, properties named after the label like their facts files
+    runDiff(tmp_path, "node", "City", "-s", "col")
+    declaration = readOutput(tmp_path, "City_delta_decl.txt")
+    assert ".decl Town_insert(id:unsigned)" in declaration
+    assert ".decl TownCityName_insert(id:unsigned, TownCityName:symbol)" in declaration
+    assert readOutput(tmp_path, "TownCityName_insert.facts") == "2\tc\n"
+    assert readOutput(tmp_path, "VillageCityName_insert.facts") == "3\td\n"
+
+    # without sub labels, properties are still renamed after the label
+    header = "id:ID(City)|cityName:STRING\n"
+    (tmp_path / "old.csv").write_text(header + "1|a\n")
+    (tmp_path / "new.csv").write_text(header + "1|b\n")
+    runDiff(tmp_path, "node", "City", "-s", "col")
+    declaration = readOutput(tmp_path, "City_delta_decl.txt")
+    assert ".decl CityCityName_delete(id:unsigned, CityCityName:symbol)" in declaration
+    assert readOutput(tmp_path, "CityCityName_delete.facts") == "1\ta\n"
+
+    header = ":START_ID(City)|:END_ID(Port)|km:INT\n"
+    (tmp_path / "old.csv").write_text(header + "1|2|5\n")
+    (tmp_path / "new.csv").write_text(header + "1|2|6\n")
+    runDiff(tmp_path, "relation", "ROAD")
+    declaration = readOutput(tmp_path, "ROAD_delta_decl.txt")
+    assert (
+        ".decl ROAD_insert(CityId:unsigned, PortId:unsigned, km:unsigned)"
+        in declaration
+    )
+    assert readOutput(tmp_path, "ROAD_insert.facts") == "1\t2\t6\n"
+    assert readOutput(tmp_path, "ROAD_delete.facts") == "1\t2\t5\n"
+
+
+def test_schema_reuses_sidecar(tmp_path, monkeypatch):
+    inputFile = tmp_path / "p.csv"
+    inputFile.write_text("id:ID(P)|:LABEL\n1|A\n2|B\n", encoding="utf-8")
+    argv = ["node", "-t", "schema", "-l", "P", "-f", "p.csv", "-d", tmp_path]
+    argv += ["-o", tmp_path]
+    runKaeru(*argv)
+    declaration = readOutput(tmp_path, "P_decl.txt")
+
+    # an unchanged input is not scanned again
+    def scan(*args):
+        raise AssertionError("scanned instead of reusing the sidecar")
+
+    monkeypatch.setattr(cli_utils, "scanLabels", scan)
+    runKaeru(*argv)
+    assert readOutput(tmp_path, "P_decl.txt") == declaration
+
+    # a changed one is
+    with open(inputFile, "a", encoding="utf-8") as f:
+        f.write("3|C\n")
+    with pytest.raises(AssertionError, match="scanned instead"):
+        runKaeru(*argv)
+
+
+def assertDeclaredFilesExist(outputPath):
+    for declarationFile in outputPath.glob("*_decl.txt"):
+        text = declarationFile.read_text(encoding="utf-8")
+        for name in re.findall(r'filename="([^"]+)"', text):
+            assert (outputPath / name).exists(), name
+
+
+def test_shards_split_facts_by_id(tmp_path):
+    (tmp_path / "p.csv").write_text(
+        "id:ID(Person)|name:STRING|:LABEL\n1|a|Student\n2|b|Teacher\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "k.csv").write_text(
+        ":START_ID(Person)|:END_ID(Person)\n1|2\n", encoding="utf-8"
+    )
+    outputPath = tmp_path / "out"
+    outputPath.mkdir()
+    for command, label, file in (("node", "P", "p.csv"), ("relation", "K", "k.csv")):
+        runKaeru(
+            command,
+            "-t",
+            "all",
+            "-l",
+            label,
+            "-f",
+            file,
+            "-d",
+            tmp_path,
+            "-o",
+            outputPath,
+            "--shards",
+            "3",
+        )
+
+    # each row lands in the shard of its id, relationships in that of their
+    # start id, and the other shards are declared over empty facts
+    for name, line in (("Student", "1\ta\n"), ("Teacher", "2\tb\n")):
+        shard = getShard(line, 3)
+        for k in range(3):
+            expected = line if k == shard else ""
+            assert readOutput(outputPath, f"{name}.{k}.facts") == expected
+    shard = getShard("1\t2\n", 3)
+    assert readOutput(outputPath, f"K.{shard}.facts") == "1\t2\n"
+    for k in range(3):
+        assert (outputPath / f"P.{k}_decl.txt").exists()
+    assertDeclaredFilesExist(outputPath)
+
+
+def test_cache_restores_only_lost_outputs(tmp_path):
+    (tmp_path / "p.csv").write_text(
+        "id:ID(Person)|:LABEL\n1|Student\n2|Teacher\n", encoding="utf-8"
+    )
+    outputPath = tmp_path / "out"
+    outputPath.mkdir()
+    argv = ["node", "-t", "all", "-l", "P", "-f", "p.csv", "-d", tmp_path]
+    argv += ["-o", outputPath, "--cache", tmp_path / "cache"]
+    runKaeru(*argv)
+    declaration = readOutput(outputPath, "P_decl.txt")
+
+    (outputPath / "Student.facts").unlink()
+    (outputPath / "P_decl.txt").unlink()
+    runKaeru(*argv)
+    runKaeru(*argv)
+
+    assert readOutput(outputPath, "Student.facts") == "1\n"
+    assert readOutput(outputPath, "Teacher.facts") == "2\n"
+    assert readOutput(outputPath, "P_decl.txt") == declaration
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_sqlite_backend_rows_and_indexes(tmp_path, jobs):
+    nodes = "".join(
+        f"{i}|n{i}|{'Student' if i % 2 else 'Teacher'}\n" for i in range(50)
+    )
+    (tmp_path / "p.csv").write_text("id:ID(P)|name:STRING|:LABEL\n" + nodes)
+    edges = "".join(f"{i}|{i + 1}|{i * 2}\n" for i in range(50))
+    (tmp_path / "k.csv").write_text(":START_ID(P)|:END_ID(P)|w:INT\n" + edges)
+
+    outputPath = tmp_path / "out"
+    outputPath.mkdir()
+    for command, label, file in (("node", "P", "p.csv"), ("relation", "K", "k.csv")):
+        runKaeru(
+            command,
+            "-t",
+            "all",
+            "-l",
+            label,
+            "-f",
+            file,
+            "-d",
+            tmp_path,
+            "-o",
+            outputPath,
+            "--backend",
+            "sqlite",
+            "-j",
+            jobs,
+        )
+
+    database = sqlite3.connect(outputPath / "kaeru.db")
+    students = database.execute('SELECT * FROM "Student"').fetchall()
+    edgeRows = database.execute('SELECT * FROM "K"').fetchall()
+    indexes = database.execute(
+        "SELECT tbl_name, sql FROM sqlite_master WHERE type = 'index'"
+    ).fetchall()
+    database.close()
+
+    assert sorted(students) == sorted((str(i), f"n{i}") for i in range(1, 50, 2))
+    assert sorted(edgeRows) == sorted(
+        (str(i), str(i + 1), str(i * 2)) for i in range(50)
+    )
+    indexed = {(table, sql.split("(")[-1].rstrip(")")) for table, sql in indexes}
+    assert indexed == {
+        ("Student", "c0"),
+        ("Teacher", "c0"),
+        ("K", "c0"),
+        ("K", "c1"),
+    }
+    assert ".input K(IO=sqlite" in readOutput(outputPath, "K_decl.txt")
+
+
+def test_all_adds_only_the_sidecar(tmp_path):
+    inputFile = tmp_path / "p.csv"
+    inputFile.write_text(
+        "id:ID(P)|name:STRING|age:INT|:LABEL\n1|a|3|Student\n2|b|4|Teacher\n",
+        encoding="utf-8",
+    )
+    outputPath = tmp_path / "out"
+    outputPath.mkdir()
+    runKaeru(
+        "node", "-t", "all", "-l", "P", "-f", "p.csv", "-d", tmp_path, "-o", outputPath
+    )
+
+    # declaration and facts are those of the schema and fact writers
+    with open(inputFile, encoding="utf-8") as f:
+        nodeSchema = createNodeSchema(f, "P")
+    declaration = io.StringIO()
+    writeRowBasedNodeDeclaration(nodeSchema, declaration)
+
+    assert sorted(os.listdir(outputPath)) == [
+        "P_decl.txt",
+        "P_schema.json",
+        "Student.facts",
+        "Teacher.facts",
+    ]
+    assert readOutput(outputPath, "P_decl.txt") == declaration.getvalue()
+    assert readOutput(outputPath, "Student.facts") == "1\ta\t3\n"
+    assert readOutput(outputPath, "Teacher.facts") == "2\tb\t4\n"
+
+    sidecar = readOutput(outputPath, "P_schema.json")
+    assert sidecar.endswith("}\n")
+    assert json.loads(sidecar)["subLabels"] == ["Student", "Teacher"]
+
+
+def readOutputs(outputPath):
+    return {name: readOutput(outputPath, name) for name in os.listdir(outputPath)}
+
+
+@pytest.mark.parametrize(
+    "command, header, options",
+    [
+        ("node", "id:ID(P)|name:STRING|:LABEL", []),
+        ("node", "id:ID(P)|name:STRING|:LABEL", ["-s", "col"]),
+        ("node", "id:ID(P)|name:STRING|:LABEL", ["--quote", '"']),
+        ("relation", ":START_ID(P)|:END_ID(P)|name:STRING", []),
+    ],
+)
+def test_all_matches_schema_then_fact(tmp_path, command, header, options):
+    rows = ["1|a|Student", "2|b|Teacher", "3||Student"]
+    (tmp_path / "p.csv").write_text("\n".join([header] + rows) + "\n")
+
+    outputs = []
+    for types in (["schema", "fact"], ["all"]):
+        outputPath = tmp_path / "-".join(types)
+        outputPath.mkdir()
+        for conversionType in types:
+            runKaeru(
+                command,
+                "-t",
+                conversionType,
+                "-l",
+                "P",
+                "-f",
+                "p.csv",
+                "-d",
+                tmp_path,
+                "-o",
+                outputPath,
+                *options,
+            )
+        outputs.append(readOutputs(outputPath))
+
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize("options", [[], ["--quote", '"'], ["-j", "2"]])
+def test_all_scans_input_once(tmp_path, monkeypatch, options):
+    (tmp_path / "p.csv").write_text(
+        "id:ID(P)|name:STRING|:LABEL\n1|a|Student\n2|c|Teacher\n"
+    )
+
+    # sub labels are collected while writing facts, never by a separate scan
+    def scanLabels(*args):
+        raise AssertionError("input scanned for sub labels")
+
+    def createNodeSchema(*args, scanSubLabels=True, **kwargs):
+        assert not scanSubLabels, "input scanned for sub labels"
+        return node.createNodeSchema(*args, scanSubLabels=False, **kwargs)
+
+    monkeypatch.setattr(cli_utils, "scanLabels", scanLabels)
+    monkeypatch.setattr(cli_utils, "createNodeSchema", createNodeSchema)
+    runKaeru(
+        "node",
+        "-t",
+        "all",
+        "-l",
+        "P",
+        "-f",
+        "p.csv",
+        "-d",
+        tmp_path,
+        "-o",
+        tmp_path,
+        *options,
+    )
+
+    assert "P(id, name):- Teacher(id, name)." in readOutput(tmp_path, "P_decl.txt")
+    assert readOutput(tmp_path, "Student.facts") == "1\ta\n"
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".bz2", ".xz"])
+def test_compressed_input_matches_plain(tmp_path, suffix):
+    data = "id:ID(P)|name:STRING|:LABEL\n1|a|Student\n2|b|Teacher\n"
+    (tmp_path / "p.csv").write_text(data, encoding="utf-8")
+    module = {".gz": gzip, ".bz2": bz2, ".xz": lzma}[suffix]
+    (tmp_path / f"p.csv{suffix}").write_bytes(module.compress(data.encode("utf-8")))
+
+    # compressed inputs are never split, so -j falls back to one process
+    outputs = []
+    for file, options in (("p.csv", []), (f"p.csv{suffix}", ["-j", "2"])):
+        outputPath = tmp_path / file.replace(".", "_")
+        outputPath.mkdir()
+        runKaeru(
+            "node",
+            "-t",
+            "all",
+            "-l",
+            "P",
+            "-f",
+            file,
+            "-d",
+            tmp_path,
+            "-o",
+            outputPath,
+            *options,
+        )
+        outputs.append(readOutputs(outputPath))
+
+    # sidecars differ in the input file they describe
+    for output in outputs:
+        assert output.pop("P_schema.json")
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize(
+    "command, header, options",
+    [
+        ("node", "id:ID(P)|name:STRING|:LABEL", []),
+        ("node", "id:ID(P)|name:STRING|:LABEL", ["-s", "col"]),
+        ("node", "id:ID(P)|name:STRING|:LABEL", ["-j", "2"]),
+        ("relation", ":START_ID(P)|:END_ID(P)|name:STRING", []),
+    ],
+)
+def test_compressed_facts_match_plain(tmp_path, command, header, options):
+    rows = ["1|a|Student", "2|b|Teacher", "3||Student"]
+    (tmp_path / "p.csv").write_text("\n".join([header] + rows) + "\n")
+
+    outputs = []
+    for compress in ([], ["--compress"]):
+        outputPath = tmp_path / f"out{len(compress)}"
+        outputPath.mkdir()
+        runKaeru(
+            command,
+            "-t",
+            "all",
+            "-l",
+            "P",
+            "-f",
+            "p.csv",
+            "-d",
+            tmp_path,
+            "-o",
+            outputPath,
+            *options,
+            *compress,
+        )
+        outputs.append(outputPath)
+
+    plain = readOutputs(outputs[0])
+    declaration = plain.pop("P_decl.txt")
+    assert readOutput(outputs[1], "P_decl.txt") == declaration.replace(
+        '.facts")', '.facts.gz", compress=true)'
+    )
+
+    names = [name for name in os.listdir(outputs[1]) if name.endswith(".gz")]
+    assert sorted(names) == sorted(name + ".gz" for name in plain if ".facts" in name)
+    for name in names:
+        with gzip.open(outputs[1] / name, "rt", encoding="utf-8") as inputFile:
+            assert inputFile.read() == plain[name[: -len(".gz")]]
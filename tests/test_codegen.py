@@ -0,0 +1,115 @@
+"""
+Testing generated row converters against the generic object conversion
+"""
+
+import io
+
+import pytest
+
+from kaeru.codegen import getNodeRowConverter, getRelationRowConverter
+from kaeru.fileio import InputFormat
+from kaeru.node import (
+    createNodeSchema,
+    iterNodes,
+    writeColumnBasedNodeIdentifierFacts,
+    writeColumnBasedNodePropertyFacts,
+    writeRowBasedNodeFacts,
+)
+from kaeru.relation import createRelationSchema, iterRelations, writeRelationFacts
+
+NODE_DATA = [
+    "id:ID(Person)|name:STRING|age:INT|:LABEL\n1|alice|30|Student\n2|||Teacher\n",
+    "name:STRING|id:ID(City)|population\nParis|7|2100000\n|8|\n",
+    "id:ID(Tag)\n1\n2\n",
+]
+
+RELATION_DATA = [
+    ":START_ID(Person)|:END_ID(City)|since:INT|note\n1|7|2001|x\n2|8||\n",
+    "weight:INT|:END_ID|:START_ID\n3|2|1\n|4|5\n",
+]
+
+
+def objectNodeLines(data, storage):
+    nodeSchema = createNodeSchema(io.StringIO(data), "Node")
+    result = []
+    for node in iterNodes(io.StringIO(data), nodeSchema):
+        outputFile = io.StringIO()
+        if storage == "row":
+            writeRowBasedNodeFacts(node, nodeSchema, outputFile)
+            result.append((node.getLabel(), outputFile.getvalue()))
+        else:
+            writeColumnBasedNodeIdentifierFacts(node, outputFile)
+            lines = [outputFile.getvalue()]
+            for propertyName in node.getPropertyNames():
+                outputFile = io.StringIO()
+                writeColumnBasedNodePropertyFacts(node, propertyName, outputFile)
+                lines.append(outputFile.getvalue())
+            result.append((node.getLabel(), tuple(lines)))
+
+    return result
+
+
+@pytest.mark.parametrize("data", NODE_DATA)
+@pytest.mark.parametrize("storage", ["row", "col"])
+def test_node_converter_matches_object_path(data, storage):
+    nodeSchema = createNodeSchema(io.StringIO(data), "Node")
+    convert = getNodeRowConverter(nodeSchema, storage)
+    rows = data.splitlines(keepends=True)[1:]
+
+    assert [convert(row) for row in rows] == objectNodeLines(data, storage)
+
+
+@pytest.mark.parametrize("data", RELATION_DATA)
+def test_relation_converter_matches_object_path(data):
+    relationSchema = createRelationSchema(io.StringIO(data), "Edge")
+    convert = getRelationRowConverter(relationSchema)
+    rows = data.splitlines(keepends=True)[1:]
+
+    expected = []
+    for relation in iterRelations(io.StringIO(data), relationSchema):
+        outputFile = io.StringIO()
+        writeRelationFacts(relation, outputFile)
+        expected.append(outputFile.getvalue())
+
+    assert [convert(row) for row in rows] == expected
+
+
+def test_converter_rejects_short_rows():
+    data = NODE_DATA[0]
+    nodeSchema = createNodeSchema(io.StringIO(data), "Node")
+
+    assert getNodeRowConverter(nodeSchema)("3|carol\n") is None
+
+
+def test_converter_is_cached_by_header():
+    first = createNodeSchema(io.StringIO(NODE_DATA[0]), "Node")
+    second = createNodeSchema(io.StringIO(NODE_DATA[0]), "Node")
+
+    assert getNodeRowConverter(first).__code__ is getNodeRowConverter(second).__code__
+
+
+def test_quoted_converter_matches_object_path():
+    inputFormat = InputFormat(delimiter=",", quote='"', arrayDelimiter="|")
+    data = 'id:ID(Person),name,tags:string[],:LABEL\n1,"Smith, J",a|b,Student\n2,,,X\n'
+    nodeSchema = createNodeSchema(io.StringIO(data), "Node", inputFormat=inputFormat)
+    convert = getNodeRowConverter(nodeSchema, inputFormat=inputFormat)
+    rows = list(inputFormat.iterRows(io.StringIO(data)))[1:]
+
+    expected = []
+    for node in iterNodes(io.StringIO(data), nodeSchema, inputFormat=inputFormat):
+        outputFile = io.StringIO()
+        writeRowBasedNodeFacts(node, nodeSchema, outputFile)
+        expected.append((node.getLabel(), outputFile.getvalue()))
+
+    assert [convert(row) for row in rows] == expected
+    assert expected[0][1] == "1\tSmith, J\ta;b\n"
+
+
+def test_converter_replaces_tabs_in_symbols():
+    data = "id:ID(Person)|name:STRING|age:INT\n1|a\tb|30\n"
+    nodeSchema = createNodeSchema(io.StringIO(data), "Node")
+    row = data.splitlines(keepends=True)[1]
+    convert = getNodeRowConverter(nodeSchema)
+
+    expected = objectNodeLines(data, "row")[0]
+    assert convert(row) == expected == ("Person", "1\ta b\t30\n")
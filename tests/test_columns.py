@@ -0,0 +1,159 @@
+"""
+Testing the columnar NodeTable and EdgeTable writers against the object path
+"""
+
+import io
+import os
+
+import pytest
+
+from kaeru.columns import Column
+from kaeru.node import (
+    createNodeSchema,
+    createNodeTable,
+    iterNodes,
+    writeColumnBasedNodeIdentifierFacts,
+    writeColumnBasedNodePropertyFacts,
+    writeColumnBasedNodeTableFacts,
+    writeRowBasedNodeFacts,
+    writeRowBasedNodeTableFacts,
+)
+from kaeru.relation import (
+    createEdgeTable,
+    createRelationSchema,
+    iterRelations,
+    writeRelationFacts,
+    writeRelationTableFacts,
+)
+
+NODE_DATA = (
+    "id:ID(Person)|name:STRING|age:INT|:LABEL\n"
+    "007|alice|30|Student\n"
+    "2|bob|+5|Teacher\n"
+    "3||1_000|Student\n"
+    "4|carol|abc|Teacher\n"
+)
+
+RELATION_DATA = ":START_ID(Person)|:END_ID(Person)|since:INT\n007|2|01\n2|3|5\n"
+
+
+def readFacts(outputPath):
+    return {
+        name: open(os.path.join(outputPath, name), encoding="utf-8").read()
+        for name in sorted(os.listdir(outputPath))
+    }
+
+
+def objectNodeFacts(storage):
+    nodeSchema = createNodeSchema(io.StringIO(NODE_DATA), None)
+    facts = {}
+    for node in iterNodes(io.StringIO(NODE_DATA), nodeSchema):
+        outputFile = io.StringIO()
+        if storage == "row":
+            writeRowBasedNodeFacts(node, nodeSchema, outputFile)
+            name = node.getLabel()
+            facts[name] = facts.get(name, "") + outputFile.getvalue()
+            continue
+
+        writeColumnBasedNodeIdentifierFacts(node, outputFile)
+        name = node.getLabel()
+        facts[name] = facts.get(name, "") + outputFile.getvalue()
+        for propertyName in node.getPropertyNames():
+            outputFile = io.StringIO()
+            writeColumnBasedNodePropertyFacts(node, propertyName, outputFile)
+            facts[propertyName] = facts.get(propertyName, "") + outputFile.getvalue()
+
+    return {f"{name}.facts": text for name, text in sorted(facts.items())}
+
+
+def test_unsigned_column_keeps_text():
+    column = Column("unsigned")
+    for value in ["1", "007", "+5", "1_000", "42"]:
+        column.append(value)
+
+    assert not column.isNumeric
+    assert list(column.iterText()) == ["1", "007", "+5", "1_000", "42"]
+
+
+def test_unsigned_column_stays_numeric():
+    column = Column("unsigned")
+    for value in ["0", "1", "18446744073709551615"]:
+        column.append(value)
+
+    assert column.isNumeric
+    assert list(column.iterText()) == ["0", "1", "18446744073709551615"]
+
+
+def test_column_texts_at_indexes():
+    numbers = Column("unsigned")
+    symbols = Column("symbol")
+    for value in ["3", "1", "4", "1"]:
+        numbers.append(value)
+        symbols.append(value)
+
+    assert numbers.getTexts(range(2)) == ["3", "1"]
+    assert numbers.getTexts([3, 0]) == ["1", "3"]
+    assert symbols.getTexts([2, 1]) == ["4", "1"]
+
+
+def test_node_table_matches_objects(tmp_path):
+    for storage, writeFacts in (
+        ("row", writeRowBasedNodeTableFacts),
+        ("col", writeColumnBasedNodeTableFacts),
+    ):
+        nodeSchema = createNodeSchema(io.StringIO(NODE_DATA), None)
+        nodeTable = createNodeTable(io.StringIO(NODE_DATA), nodeSchema)
+        outputPath = tmp_path / storage
+        outputPath.mkdir()
+        writeFacts(nodeTable, str(outputPath))
+
+        assert readFacts(outputPath) == objectNodeFacts(storage)
+
+
+def test_node_table_row_indexes():
+    nodeSchema = createNodeSchema(io.StringIO(NODE_DATA), None)
+    nodeTable = createNodeTable(io.StringIO(NODE_DATA), nodeSchema)
+
+    assert list(nodeTable.getRowIndexes("Student")) == [0, 2]
+    assert list(nodeTable.getRowIndexes("Teacher")) == [1, 3]
+
+    nodeTable.appendRow("5", "Student", ["dave", "1"])
+    assert list(nodeTable.getRowIndexes("Student")) == [0, 2, 4]
+
+
+def test_edge_table_matches_objects(tmp_path):
+    relationSchema = createRelationSchema(io.StringIO(RELATION_DATA), "Knows")
+    edgeTable = createEdgeTable(io.StringIO(RELATION_DATA), relationSchema)
+    writeRelationTableFacts(edgeTable, str(tmp_path))
+
+    outputFile = io.StringIO()
+    for relation in iterRelations(io.StringIO(RELATION_DATA), relationSchema):
+        writeRelationFacts(relation, outputFile)
+
+    assert readFacts(tmp_path) == {"Knows.facts": outputFile.getvalue()}
+
+
+@pytest.mark.parametrize("row", ["5|eve|Student", "5|eve|1|Student|x"])
+def test_node_paths_reject_bad_rows(row):
+    data = NODE_DATA + row + "\n"
+    nodeSchema = createNodeSchema(io.StringIO(data), None)
+
+    with pytest.raises(Exception) as tableError:
+        createNodeTable(io.StringIO(data), nodeSchema)
+    with pytest.raises(Exception) as objectError:
+        list(iterNodes(io.StringIO(data), nodeSchema))
+
+    assert str(tableError.value) == str(objectError.value)
+
+
+@pytest.mark.parametrize("row", ["3|007", "3|007|1|x"])
+def test_relation_paths_reject_bad_rows(row):
+    data = RELATION_DATA + row + "\n"
+    relationSchema = createRelationSchema(io.StringIO(data), "Knows")
+
+    with pytest.raises(Exception) as tableError:
+        createEdgeTable(io.StringIO(data), relationSchema)
+    with pytest.raises(Exception) as objectError:
+        list(iterRelations(io.StringIO(data), relationSchema))
+
+    assert str(tableError.value) == str(objectError.value)
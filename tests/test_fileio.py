@@ -0,0 +1,95 @@
+"""
+Testing the file handling helpers shared by node and relation conversion
+"""
+
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from kaeru.fileio import (
+    FactFormat,
+    WriterPool,
+    detectCompression,
+    openInput,
+    readHeader,
+)
+
+INPUT_DATA = "id:ID(P)|name:STRING\r\n1|\u00e9\n"
+
+
+def test_writer_pool_evicts_least_recently_used(tmp_path):
+    paths = [str(tmp_path / f"{name}.facts") for name in ("a", "b", "c")]
+
+    with WriterPool(maxOpenFiles=2) as writerPool:
+        writerPool.write(paths[0], "a1\n")
+        writerPool.write(paths[1], "b1\n")
+        writerPool.write(paths[0], "a2\n")
+        writerPool.write(paths[2], "c1\n")
+
+        # b was used least recently, so it was flushed and closed for c
+        assert list(writerPool.openFiles) == [paths[0], paths[2]]
+        assert open(paths[1], encoding="utf-8").read() == "b1\n"
+
+        writerPool.write(paths[1], "b2\n")
+        assert list(writerPool.openFiles) == [paths[2], paths[1]]
+
+    texts = [open(path, encoding="utf-8").read() for path in paths]
+    assert texts == ["a1\na2\n", "b1\nb2\n", "c1\n"]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_writer_pool_reopens_in_append_mode(tmp_path, compress):
+    opener = gzip.open if compress else open
+    paths = [str(tmp_path / "a.facts"), str(tmp_path / "b.facts")]
+    with opener(paths[0], "wt", encoding="utf-8") as outputFile:
+        outputFile.write("a0\n")
+
+    with WriterPool(maxOpenFiles=1, compress=compress) as writerPool:
+        for i in range(3):
+            for path in paths:
+                writerPool.write(path, f"{i}\n")
+        assert len(writerPool.openFiles) == 1
+
+    # every reopen of a compressed file adds a gzip member, which is read
+    # back as a single stream
+    texts = []
+    for path in paths:
+        with opener(path, "rt", encoding="utf-8") as inputFile:
+            texts.append(inputFile.read())
+    assert texts == ["a0\n0\n1\n2\n", "0\n1\n2\n"]
+
+
+def test_writer_pool_needs_an_open_file():
+    with pytest.raises(Exception, match="at least one open file"):
+        WriterPool(maxOpenFiles=0)
+
+
+@pytest.mark.parametrize("module", [None, gzip, bz2, lzma])
+def test_open_input_detects_compression(tmp_path, module):
+    # detected from the magic bytes, whatever the file is called
+    path = str(tmp_path / "p.csv")
+    data = INPUT_DATA.encode("utf-8")
+    with open(path, "wb") as outputFile:
+        outputFile.write(data if module is None else module.compress(data))
+
+    assert detectCompression(path) is module
+    with openInput(path) as inputFile:
+        assert inputFile.read() == INPUT_DATA.replace("\r\n", "\n")
+    with openInput(path) as inputFile:
+        assert readHeader(inputFile) == "id:ID(P)|name:STRING"
+        assert inputFile.read() == "1|\u00e9\n"
+
+
+def test_compressed_fact_format():
+    factFormat = FactFormat(compress=True)
+
+    assert factFormat.getFileName("Person") == "Person.facts.gz"
+    assert factFormat.getInputDirective("Person") == (
+        '.input Person(IO=file, filename="Person.facts.gz", compress=true)\n'
+    )
+    assert FactFormat(compress=True, shard=2).getFileName("P") == "P.2.facts.gz"
+
+    with pytest.raises(Exception, match="not supported by sqlite"):
+        FactFormat(compress=True, backend="sqlite")
@@ -0,0 +1,70 @@
+"""
+Testing the persistent mapping of Neo4j ids to dense unsigned ids
+"""
+
+import os
+
+import pytest
+
+from kaeru.idmap import MAGIC, IdMap
+
+
+def test_ids_dense_in_order_of_first_appearance(tmp_path):
+    idMap = IdMap(str(tmp_path / "ids.map"))
+
+    assert idMap.intern("Person", "b") == 0
+    assert idMap.intern("Person", "a") == 1
+    assert idMap.intern("Person", "b") == 0
+    # the same raw id in another group is another node
+    assert idMap.intern("City", "b") == 2
+    assert len(idMap) == 3
+
+
+def test_lookup_after_save(tmp_path):
+    idMap = IdMap(str(tmp_path / "ids.map"))
+    rawIds = [str(i * 7919 % 1000) for i in range(1000)]
+    expected = {rawId: idMap.intern("P", rawId) for rawId in rawIds}
+    idMap.save()
+
+    # stored pairs are found by binary search, new ones continue the count
+    for rawId, identifier in expected.items():
+        assert idMap.intern("P", rawId) == identifier
+    assert idMap.intern("P", "new") == 1000
+    assert idMap.intern("Q", "0") == 1001
+    idMap.close()
+
+
+def test_reopen_after_save(tmp_path):
+    path = str(tmp_path / "ids.map")
+    idMap = IdMap(path)
+    idMap.intern("P", "x")
+    idMap.intern("P", "y")
+    idMap.save()
+    idMap.intern("P", "z")
+    idMap.save()
+    idMap.close()
+
+    with open(path, "rb") as f:
+        assert f.read(len(MAGIC)) == MAGIC
+    assert not [name for name in os.listdir(tmp_path) if name != "ids.map"]
+
+    reopened = IdMap(path)
+    assert len(reopened) == 3
+    assert [reopened.intern("P", rawId) for rawId in "zyxw"] == [2, 1, 0, 3]
+    reopened.close()
+
+    # pairs interned but never saved are lost
+    idMap = IdMap(path)
+    idMap.intern("P", "lost")
+    idMap.close()
+    reopened = IdMap(path)
+    assert len(reopened) == 3
+    reopened.close()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "ids.map"
+    path.write_bytes(b"not an id map")
+
+    with pytest.raises(Exception, match="is not a kaeru id map file"):
+        IdMap(str(path))
@@ -0,0 +1,40 @@
+"""
+Testing the label column scan behind sub label discovery
+"""
+
+import io
+
+import pytest
+
+from kaeru import labelscan
+from kaeru.fileio import InputFormat
+from kaeru.labelscan import scanLabelBlock, scanLabels
+from kaeru.node import createNodeSchema
+
+
+def test_scan_label_block():
+    block = b"1|A|x\r\n2|B\n\n3\r4|C|y\n5|\xc3\xa9\n"
+
+    # line endings are those of the text readers, short rows hold no label
+    assert scanLabelBlock(block, 1, b"|") == {b"A", b"B", b"C", "é".encode()}
+    assert scanLabelBlock(block, 2, b"|") == {b"x", b"y"}
+
+
+@pytest.mark.parametrize("jobs", [1, 3])
+@pytest.mark.parametrize("delimiter", ["|", ","])
+def test_scan_labels_match_schema(tmp_path, monkeypatch, jobs, delimiter):
+    labels = ["Student", "Teacher", "Élève", "Staff"]
+    rows = [f"{i}{delimiter}{labels[i % 7 % 4]}\n" for i in range(500)]
+    data = f"id:ID(P){delimiter}:LABEL\n" + "".join(rows) + f"500{delimiter}Guest"
+    inputFile = tmp_path / "p.csv"
+    inputFile.write_text(data, encoding="utf-8")
+
+    inputFormat = InputFormat(delimiter=delimiter)
+    nodeSchema = createNodeSchema(io.StringIO(data), "P", inputFormat=inputFormat)
+    expected = nodeSchema.getNodeSubLabels()
+    assert len(expected) == 5
+
+    # small blocks check labels are not lost at block boundaries, while
+    # jobs above one scan byte ranges in other processes
+    monkeypatch.setattr(labelscan, "BLOCK_SIZE", 64)
+    assert scanLabels(str(inputFile), 1, delimiter, jobs) == expected
@@ -0,0 +1,29 @@
+"""
+Testing the byte range splitting of inputs converted in parallel
+"""
+
+from kaeru.fileio import openInput, readHeader
+from kaeru.parallel import iterLines, splitInput
+
+
+def test_split_input_strips_crlf_header(tmp_path):
+    inputFile = tmp_path / "q.csv"
+    inputFile.write_bytes(b"id:ID(Q)|:LABEL|a:INT\r\n1|A|3\r\n2|B|4\r\n")
+
+    header, ranges = splitInput(str(inputFile), 2)
+    assert header == "id:ID(Q)|:LABEL|a:INT"
+
+    lines = []
+    for start, end in ranges:
+        lines += iterLines(str(inputFile), start, end)
+    assert lines == ["1|A|3\n", "2|B|4\n"]
+
+
+def test_read_header_strips_line_ending(tmp_path):
+    inputFile = tmp_path / "q.csv"
+    inputFile.write_bytes(b"id:ID(Q)|a:INT\r\n1|3\r\n")
+
+    with openInput(str(inputFile)) as f:
+        assert readHeader(f) == "id:ID(Q)|a:INT"
+    with open(inputFile, "rb") as f:
+        assert readHeader(f) == "id:ID(Q)|a:INT"
@@ -0,0 +1,49 @@
+"""
+Testing the passthrough fast path against the row by row slow path
+"""
+
+import pytest
+
+from kaeru.node import createNodeSchema, iterNodes
+from kaeru.passthrough import isCleanBlock, passthroughFile
+
+HEADER = "id:ID(Q)|a:STRING|b:STRING\n"
+
+
+def test_clean_block_checks_every_row():
+    assert isCleanBlock(b"1|a|b\n2|c|d\n", 3)
+    assert isCleanBlock(b"1|a|b\n2|c|d", 3)
+
+    # the delimiter count of the block is right, but not that of its rows
+    assert not isCleanBlock(b"1|a|b|c\n2|d\n", 3)
+    assert not isCleanBlock(b"1|a\n2|b|c|d\n", 3)
+    assert not isCleanBlock(b"1||b\n", 3)
+
+
+@pytest.mark.parametrize("rows", ["1|a|b|c\n2|d\n", "1|a\n2|b|c|d\n"])
+def test_passthrough_rejects_rows_like_slow_path(tmp_path, rows):
+    inputFile = tmp_path / "q.csv"
+    inputFile.write_text(HEADER + rows, encoding="utf-8")
+    nodeSchema = createNodeSchema(open(inputFile, encoding="utf-8"), "Q")
+
+    def convert(lines):
+        # the slow path, fed with the lines of the dirty blocks
+        for _ in iterNodes(iter(lines), nodeSchema, skipHeader=False):
+            pass
+
+    with pytest.raises(Exception) as slowError:
+        with open(inputFile, encoding="utf-8") as f:
+            convert(f.readlines()[1:])
+
+    with pytest.raises(Exception) as fastError:
+        passthroughFile(
+            str(inputFile),
+            len(HEADER),
+            inputFile.stat().st_size,
+            str(tmp_path / "Q.facts"),
+            3,
+            convert,
+        )
+
+    assert str(fastError.value) == str(slowError.value)
+    assert not (tmp_path / "Q.facts").read_bytes()
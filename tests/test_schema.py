@@ -0,0 +1,97 @@
+"""
+Testing the per-schema field plans and property renaming of node and
+relation schemas
+"""
+
+import io
+
+from kaeru.fileio import InputFormat
+from kaeru.node import FieldPlan, NodeType, createNodeSchema, iterNodes
+from kaeru.relation import RelationType, createRelationSchema, iterRelations
+
+NODE_HEADER = "id:ID(P)|name:STRING|age:INT|:LABEL|tags:STRING[]|rank\n"
+RELATION_HEADER = ":START_ID(P)|since:LONG|:END_ID(P)|note\n"
+
+
+def test_node_row_plan():
+    nodeSchema = createNodeSchema(io.StringIO(NODE_HEADER), "P")
+    rowPlan = nodeSchema.getRowPlan()
+
+    assert rowPlan == (
+        FieldPlan(NodeType.ID, None, None, None),
+        FieldPlan(NodeType.PROPERTY, "name", "symbol", "NULL"),
+        FieldPlan(NodeType.PROPERTY, "age", "unsigned", "0"),
+        FieldPlan(NodeType.LABEL, None, None, None),
+        FieldPlan(NodeType.PROPERTY, "tags", "symbol", "NULL", True),
+        FieldPlan(NodeType.PROPERTY, "rank", "unsigned", "0"),
+    )
+    # built once per schema
+    assert nodeSchema.getRowPlan() is rowPlan
+
+
+def test_relation_row_plan():
+    relationSchema = createRelationSchema(io.StringIO(RELATION_HEADER), "Knows")
+    rowPlan = relationSchema.getRowPlan()
+
+    assert [(field.kind, field.name, field.nullValue) for field in rowPlan] == [
+        (RelationType.START_ID, None, None),
+        (RelationType.PROPERTY, "since", "0"),
+        (RelationType.END_ID, None, None),
+        (RelationType.PROPERTY, "note", "0"),
+    ]
+    assert relationSchema.getRowPlan() is rowPlan
+
+
+def test_node_rows_follow_row_plan():
+    data = NODE_HEADER + "1|a\tb||S|x,y|\n2||7|S||3\n"
+    nodeSchema = createNodeSchema(io.StringIO(data), "P")
+    inputFormat = InputFormat(arrayDelimiter=",")
+
+    nodes = iterNodes(io.StringIO(data), nodeSchema, inputFormat=inputFormat)
+    values = [list(node.getProperty().values()) for node in nodes]
+
+    # empty cells take the null value of their type, symbols lose tabs and
+    # array elements are separated by ;
+    assert values == [["a b", "0", "x;y", "0"], ["NULL", "7", "NULL", "3"]]
+
+
+def test_relation_rows_follow_row_plan():
+    data = RELATION_HEADER + "1||2|\n2|5|3|4\n"
+    relationSchema = createRelationSchema(io.StringIO(data), "Knows")
+
+    relations = list(iterRelations(io.StringIO(data), relationSchema))
+
+    assert [relation.getSourceId() for relation in relations] == ["1", "2"]
+    assert [relation.getTargetId() for relation in relations] == ["2", "3"]
+    assert [relation.getProperty() for relation in relations] == [
+        {"since": "0", "note": "0"},
+        {"since": "5", "note": "4"},
+    ]
+
+
+def test_renamed_property_names_are_cached():
+    nodeSchema = createNodeSchema(io.StringIO(NODE_HEADER), "P")
+
+    renamed = nodeSchema.getRenamedPropertyNames("Student")
+    assert renamed == ("StudentName", "StudentAge", "StudentTags", "StudentRank")
+    assert nodeSchema.getRenamedPropertyNames("Student") is renamed
+
+    # a new property drops the cached names, and only the first letter of a
+    # property is capitalised
+    nodeSchema.addProperty(6, "firstName", "symbol")
+    assert nodeSchema.getRenamedPropertyNames("Student")[-1] == "StudentFirstName"
+
+
+def test_sub_labels_rename_node_properties():
+    data = NODE_HEADER + "1|a|3|Student||\n2|b|4|Teacher||\n3|c|5|Student||\n"
+    nodeSchema = createNodeSchema(io.StringIO(NODE_HEADER), "P")
+
+    nodes = iterNodes(io.StringIO(data), nodeSchema, collectSubLabels=True)
+    names = [node.getPropertyNames() for node in nodes]
+
+    assert nodeSchema.getNodeSubLabels() == {"Student", "Teacher"}
+    assert set(nodeSchema.renamedProperties) == {"Student", "Teacher"}
+    assert names == [
+        list(nodeSchema.getRenamedPropertyNames(label))
+        for label in ("Student", "Teacher", "Student")
+    ]
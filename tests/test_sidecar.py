@@ -0,0 +1,59 @@
+"""
+Testing the schema sidecars kept next to declarations
+"""
+
+import os
+import stat
+
+from kaeru.fileio import getUmask
+from kaeru.sidecar import readSidecar, writeSidecar
+
+OPTIONS = {"command": "node", "label": "P", "delimiter": "|"}
+
+
+def writeInput(tmp_path, text):
+    inputFile = tmp_path / "p.csv"
+    inputFile.write_text(text, encoding="utf-8")
+
+    return str(inputFile)
+
+
+def test_sidecar_reused_while_input_unchanged(tmp_path):
+    inputFile = writeInput(tmp_path, "id:ID(P)|:LABEL\n1|A\n")
+    sidecarFile = str(tmp_path / "P_schema.json")
+    writeSidecar(sidecarFile, inputFile, "id:ID(P)|:LABEL", OPTIONS, {"A"})
+
+    sidecar = readSidecar(sidecarFile, inputFile, OPTIONS)
+    assert sidecar["header"] == "id:ID(P)|:LABEL"
+    assert sidecar["subLabels"] == ["A"]
+
+    # written like any other output, not owner-only
+    mode = stat.S_IMODE(os.stat(sidecarFile).st_mode)
+    assert mode == 0o666 & ~getUmask()
+
+
+def test_sidecar_invalidated(tmp_path):
+    inputFile = writeInput(tmp_path, "id:ID(P)|:LABEL\n1|A\n")
+    sidecarFile = str(tmp_path / "P_schema.json")
+    writeSidecar(sidecarFile, inputFile, "id:ID(P)|:LABEL", OPTIONS, {"A"})
+
+    # other options
+    assert readSidecar(sidecarFile, inputFile, {**OPTIONS, "delimiter": ","}) is None
+
+    # a rewritten header of the same size and mtime
+    times = os.stat(inputFile)
+    writeInput(tmp_path, "id:ID(Q)|:LABEL\n1|A\n")
+    os.utime(inputFile, ns=(times.st_atime_ns, times.st_mtime_ns))
+    assert readSidecar(sidecarFile, inputFile, OPTIONS) is None
+
+    # appended rows
+    writeSidecar(sidecarFile, inputFile, "id:ID(Q)|:LABEL", OPTIONS, {"A"})
+    assert readSidecar(sidecarFile, inputFile, OPTIONS) is not None
+    with open(inputFile, "a", encoding="utf-8") as f:
+        f.write("2|B\n")
+    assert readSidecar(sidecarFile, inputFile, OPTIONS) is None
+
+    # a missing or corrupt sidecar
+    assert readSidecar(str(tmp_path / "none.json"), inputFile, OPTIONS) is None
+    (tmp_path / "P_schema.json").write_text("{", encoding="utf-8")
+    assert readSidecar(sidecarFile, inputFile, OPTIONS) is None
@@ -0,0 +1,51 @@
+"""
+Testing that nodes and relations are converted lazily, one row at a time
+"""
+
+import io
+from itertools import count, islice
+
+from kaeru.node import createNodeSchema, iterNodes
+from kaeru.relation import createRelationSchema, iterRelations
+
+NODE_HEADER = "id:ID(Person)|name:STRING|:LABEL\n"
+RELATION_HEADER = ":START_ID(Person)|:END_ID(Person)|since:INT\n"
+
+
+def test_nodes_stream_from_endless_input():
+    nodeSchema = createNodeSchema(io.StringIO(NODE_HEADER), "Person")
+    lines = (f"{i}|name{i}|Student\n" for i in count())
+
+    # an endless input would never return if nodes were collected first
+    nodes = iterNodes(lines, nodeSchema, skipHeader=False)
+    assert [node.getId() for node in islice(nodes, 3)] == ["0", "1", "2"]
+
+    node = next(nodes)
+    assert node.getId() == "3"
+    assert node.getLabel() == "Student"
+    assert node.getProperty() == {"StudentName": "name3"}
+
+
+def test_nodes_stream_rows_before_bad_row():
+    data = NODE_HEADER + "1|a|Student\n2|b|Teacher\n3|c|Student|x\n"
+    nodeSchema = createNodeSchema(io.StringIO(NODE_HEADER), "Person")
+
+    # rows ahead of a malformed row are converted before it is read
+    nodes = iterNodes(io.StringIO(data), nodeSchema)
+    assert [node.getLabel() for node in islice(nodes, 2)] == ["Student", "Teacher"]
+
+
+def test_relations_stream_from_endless_input():
+    relationSchema = createRelationSchema(io.StringIO(RELATION_HEADER), "Knows")
+    lines = (f"{i}|{i + 1}|{i * 10}\n" for i in count())
+
+    relations = iterRelations(lines, relationSchema, skipHeader=False)
+    edges = [
+        (relation.getSourceId(), relation.getTargetId())
+        for relation in islice(relations, 3)
+    ]
+    assert edges == [("0", "1"), ("1", "2"), ("2", "3")]
+
+    relation = next(relations)
+    assert relation.getLabel() == "Knows"
+    assert relation.getProperty() == {"since": "30"}
@@ -0,0 +1,61 @@
+"""
+Testing the watermarks of incremental conversions
+"""
+
+import os
+
+from kaeru.watermark import Watermark, findCompleteEnd, hashHeader, readWatermark
+
+
+def test_find_complete_end(tmp_path):
+    inputFile = tmp_path / "p.csv"
+    inputFile.write_bytes(b"id\n1\n22")
+
+    # the trailing row has no newline yet
+    assert findCompleteEnd(str(inputFile), 0) == 5
+    assert findCompleteEnd(str(inputFile), 3) == 5
+    assert findCompleteEnd(str(inputFile), 5) == 5
+    assert findCompleteEnd(str(inputFile), 9) == 9
+
+    with open(inputFile, "ab") as f:
+        f.write(b"2\n")
+    assert findCompleteEnd(str(inputFile), 5) == 9
+
+
+def test_watermark_matches_unchanged_input(tmp_path):
+    inputFile = tmp_path / "p.csv"
+    inputFile.write_text("id:ID(P)\n1\n2\n")
+    headerHash = hashHeader("id:ID(P)")
+    inode = os.stat(inputFile).st_ino
+    watermark = Watermark(11, headerHash, inode, {"storage": "row"})
+
+    assert watermark.matches(str(inputFile), headerHash, {"storage": "row"})
+    assert not watermark.matches(str(inputFile), hashHeader("id"), {"storage": "row"})
+    assert not watermark.matches(str(inputFile), headerHash, {"storage": "col"})
+
+    # a replaced file has a new inode, even with the same contents
+    replacement = tmp_path / "q.csv"
+    replacement.write_text("id:ID(P)\n1\n2\n")
+    os.replace(replacement, inputFile)
+    assert not watermark.matches(str(inputFile), headerHash, {"storage": "row"})
+
+    # a truncated file no longer reaches the offset
+    watermark.inode = os.stat(inputFile).st_ino
+    assert watermark.matches(str(inputFile), headerHash, {"storage": "row"})
+    with open(inputFile, "r+") as f:
+        f.truncate(10)
+    assert not watermark.matches(str(inputFile), headerHash, {"storage": "row"})
+
+
+def test_watermark_round_trip(tmp_path):
+    path = str(tmp_path / "P.watermark.json")
+    assert readWatermark(path) is None
+
+    Watermark(7, "abc", 42, {"jobs": 1}, ["B", "A"], ["B.facts", "A.facts"]).save(path)
+    watermark = readWatermark(path)
+
+    assert open(path, encoding="utf-8").read().endswith("}\n")
+    assert (watermark.offset, watermark.headerHash, watermark.inode) == (7, "abc", 42)
+    assert watermark.options == {"jobs": 1}
+    assert watermark.subLabels == ["A", "B"]
+    assert watermark.outputs == ["A.facts", "B.facts"]